@@ -9,7 +9,20 @@ from pathlib import Path
 
 # 导入配置和模块化组件
 from config import load_config
-from modules import VoiceToTextModule, UnderstandingModule, SpecializedTaskModule
+from modules import (
+    VoiceToTextModule,
+    UnderstandingModule,
+    SpecializedTaskModule,
+    ASRWorkerPool,
+    SpeculativeRouter,
+)
+from modules.specialized_task import (
+    GENERAL_TASK_TYPE,
+    count_task_keywords,
+    task_type_from_counts,
+)
+from utils.http_session import configure_http_session, get_http_stats
+from utils.retry_policy import configure_retry_policy, get_retry_stats
 
 # 设置日志
 logging.basicConfig(
@@ -47,17 +60,91 @@ def validate_response_dict(response_dict, required_keys, context_msg="Stream"):
     return None  # 表示校验通过，调用者应继续处理原始 response_dict
 
 
+def create_voice_to_text(config):
+    """按配置创建语音转文字模块"""
+    return VoiceToTextModule(
+        model_dir=config.get("model_dir"),
+        device=config.get("device"),
+        intra_op_threads=config.get("intra_op_threads"),
+        inter_op_threads=config.get("inter_op_threads"),
+        cpu_affinity=config.get("cpu_affinity"),
+        transcription_cache_dir=config.get("transcription_cache_dir"),
+        transcription_cache_size=config.get("transcription_cache_size", 500),
+        feature_cache_mb=config.get("feature_cache_mb", 0),
+    )
+
+
+def create_asr_pool(config):
+    """按配置加载模型并 fork 语音识别工作池，未启用（asr_workers 为 0）时返回 None
+
+    必须在启动 Web 服务等后台线程之前调用，且每个进程只调用一次：在多线程进程中
+    fork 可能死锁。返回的工作池可传给多次创建的 SenseYourVoiceApp 重复使用，
+    由调用方负责 shutdown。
+    """
+    config = load_config(config)
+    if config.get("asr_workers", 0) <= 0:
+        return None
+    logger.info("启动语音识别工作池...")
+    # 模型加载完成后再 fork 转录进程，子进程以写时复制方式共享权重
+    # feature_cache_mb 是总上限，由主进程与各转录进程均分，避免每个进程各占一份
+    feature_cache_mb = config.get("feature_cache_mb", 0) / (config["asr_workers"] + 1)
+    voice_to_text = create_voice_to_text(dict(config, feature_cache_mb=feature_cache_mb))
+    if voice_to_text.model is None:
+        logger.error(f"语音模型加载失败，不启动工作池: {voice_to_text.init_error}")
+        return None
+    return ASRWorkerPool(
+        voice_to_text,
+        num_workers=config["asr_workers"],
+        threads_per_worker=config.get("asr_worker_threads", 1),
+    )
+
+
 class SenseYourVoiceApp:
-    def __init__(self, config=None):
-        """主应用类，整合三个模块"""
+    def __init__(self, config=None, asr_pool=None):
+        """主应用类，整合三个模块
+
+        Args:
+            config (dict, optional): 用户配置，与默认配置合并
+            asr_pool (ASRWorkerPool, optional): 由 create_asr_pool 预先创建的工作池。
+                其模型与 config 的 model_dir/device 一致时复用该工作池及其已加载的
+                语音转文字模块；应用不负责关闭它
+        """
         # 加载配置，合并用户配置和默认配置
         self.config = load_config(config)
         logger.info("加载应用配置完成")
 
+        self.asr_pool = None
+        if asr_pool is not None:
+            pool_vtt = asr_pool.voice_to_text
+            if (pool_vtt.model_dir, pool_vtt.device) == (
+                self.config.get("model_dir"),
+                self.config.get("device"),
+            ):
+                self.asr_pool = asr_pool
+            else:
+                logger.warning(
+                    f"语音识别工作池加载的模型 ({pool_vtt.model_dir}, {pool_vtt.device}) "
+                    "与当前配置不一致，改为在主进程内转录"
+                )
+
         # 初始化语音转文字模块
-        logger.info("初始化语音转文字模块...")
-        self.voice_to_text = VoiceToTextModule(
-            model_dir=self.config.get("model_dir"), device=self.config.get("device")
+        if self.asr_pool is not None:
+            self.voice_to_text = self.asr_pool.voice_to_text
+        else:
+            logger.info("初始化语音转文字模块...")
+            self.voice_to_text = create_voice_to_text(self.config)
+
+        configure_http_session(
+            pool_connections=self.config.get("http_pool_connections"),
+            pool_maxsize=self.config.get("http_pool_maxsize"),
+            connect_timeout=self.config.get("http_connect_timeout"),
+        )
+        configure_retry_policy(
+            max_attempts=self.config.get("llm_retry_max_attempts"),
+            base_delay=self.config.get("llm_retry_base_delay"),
+            max_delay=self.config.get("llm_retry_max_delay"),
+            failure_threshold=self.config.get("llm_circuit_failure_threshold"),
+            reset_timeout=self.config.get("llm_circuit_reset_seconds"),
         )
 
         # 初始化理解模块
@@ -76,14 +163,68 @@ class SenseYourVoiceApp:
             model=self.config.get("specialized_model"),
         )
 
+        if (
+            self.config.get("speculative_routing", False)
+            and self.config.get("specialized_input") != "user_input"
+        ):
+            logger.warning(
+                "speculative_routing 仅在 specialized_input 为 user_input 时生效，已忽略"
+            )
+
         logger.info("SenseYourVoice应用初始化完成")
 
+    def close(self):
+        """释放应用持有的资源；外部传入的语音识别工作池由创建者关闭"""
+        self.asr_pool = None
+
+    def get_specialized_content(self, user_input, understanding_response):
+        """按 specialized_input 配置返回专业任务处理的内容，与是否启用推测路由无关
+
+        Args:
+            user_input (str): 用户的原始输入（文本与语音转写）
+            understanding_response (str): 理解模块的完整回复
+        """
+        if self.config.get("specialized_input") == "user_input":
+            return user_input
+        return understanding_response
+
+    def create_speculative_router(self, content):
+        """按配置创建推测路由器，未启用时返回 None
+
+        推测请求在理解回复完成前发起，只能以用户的原始输入为内容，因此仅在
+        specialized_input 为 "user_input" 时启用。
+
+        Args:
+            content (str): 推测请求的专业任务内容（用户的原始输入）
+        """
+        if not self.config.get("speculative_routing", False):
+            return None
+        if self.config.get("specialized_input") != "user_input":
+            return None
+        return SpeculativeRouter(
+            self.specialized_task,
+            content,
+            min_hits=self.config.get("speculative_min_hits", 2),
+        )
+
+    def get_http_stats(self):
+        """返回 LLM 接口共享连接池的请求数、新建连接数与复用率"""
+        return get_http_stats()
+
+    def get_retry_stats(self):
+        """返回各 LLM 上游的重试次数、预算消耗与熔断器状态"""
+        return get_retry_stats()
+
     def process(self, audio_path, instruction="", context=""):
         """处理音频文件的完整流程，支持多轮对话"""
+        router = None
         try:
             # 步骤1: 语音转文字
             logger.info(f"正在处理音频文件: {audio_path}")
-            transcription_result = self.voice_to_text.transcribe(audio_path)
+            if self.asr_pool is not None and self.asr_pool.is_available():
+                transcription_result = self.asr_pool.transcribe(audio_path).result()
+            else:
+                transcription_result = self.voice_to_text.transcribe(audio_path)
 
             # --- 校验 VoiceToTextModule 输出 ---
             vtt_required_keys = [
@@ -128,6 +269,7 @@ class SenseYourVoiceApp:
             understanding_stream = self.understanding.analyze(
                 text, context=enhanced_context
             )
+            router = self.create_speculative_router(text)
 
             full_understanding_response = ""
             needs_specialized_task = False
@@ -162,6 +304,8 @@ class SenseYourVoiceApp:
 
                 if chunk_data.get("response_chunk"):
                     full_understanding_response += chunk_data["response_chunk"]
+                    if router is not None:
+                        router.feed(chunk_data["response_chunk"])
 
                 if chunk_data["is_final"]:
                     needs_specialized_task = chunk_data.get(
@@ -188,9 +332,16 @@ class SenseYourVoiceApp:
                 task_type = self._determine_task_type(response)
                 logger.info(f"确定任务类型: {task_type}")
 
-                specialized_task_stream = self.specialized_task.process_task(
-                    task_type, response
+                specialized_content = self.get_specialized_content(text, response)
+                specialized_task_stream = (
+                    router.resolve(True, task_type, specialized_content)
+                    if router is not None
+                    else None
                 )
+                if specialized_task_stream is None:
+                    specialized_task_stream = self.specialized_task.process_task(
+                        task_type, specialized_content
+                    )
 
                 full_specialized_result = ""
                 specialized_error = None
@@ -249,6 +400,8 @@ class SenseYourVoiceApp:
                 }
             else:
                 logger.info("无需专业任务处理")
+                if router is not None:
+                    router.resolve(False, None)
                 final_result = {
                     "success": True,
                     "transcription": text,
@@ -264,85 +417,21 @@ class SenseYourVoiceApp:
                 error_msg, exc_info=True
             )  # 添加 exc_info=True 获取更详细的traceback
             return {"success": False, "error": error_msg}
+        finally:
+            # 出错返回或发生异常时，停止仍在运行的推测请求
+            if router is not None:
+                router.cancel()
 
     def _determine_task_type(self, text):
         """根据文本内容确定专业任务类型"""
-        # 代码相关关键词
-        code_keywords = [
-            "代码",
-            "编程",
-            "程序",
-            "算法",
-            "函数",
-            "变量",
-            "类",
-            "对象",
-            "接口",
-            "API",
-            "库",
-            "框架",
-            "编译",
-            "调试",
-            "bug",
-            "错误",
-            "异常",
-            "开发",
-        ]
-
-        # 数学相关关键词
-        math_keywords = [
-            "数学",
-            "计算",
-            "方程",
-            "公式",
-            "数值",
-            "统计",
-            "概率",
-            "微积分",
-            "代数",
-            "几何",
-            "三角",
-            "矩阵",
-            "向量",
-            "函数式",
-            "导数",
-            "积分",
-        ]
-
-        # 搜索相关关键词
-        search_keywords = [
-            "搜索",
-            "查询",
-            "检索",
-            "查找",
-            "数据库",
-            "信息",
-            "资料",
-            "文献",
-            "调研",
-            "研究",
-            "探索",
-            "发现",
-        ]
-
-        # 计数各类关键词出现次数
-        code_count = sum(1 for keyword in code_keywords if keyword in text)
-        math_count = sum(1 for keyword in math_keywords if keyword in text)
-        search_count = sum(1 for keyword in search_keywords if keyword in text)
-
-        # 根据关键词出现频率确定任务类型
-        if code_count > math_count and code_count > search_count:
-            logger.info(f"检测到代码相关关键词 {code_count} 个")
-            return "代码处理"
-        elif math_count > code_count and math_count > search_count:
-            logger.info(f"检测到数学相关关键词 {math_count} 个")
-            return "数学问题"
-        elif search_count > code_count and search_count > math_count:
-            logger.info(f"检测到搜索相关关键词 {search_count} 个")
-            return "网络搜索"
-        else:
+        # 计数各类关键词出现次数，出现最多的类型胜出
+        counts = count_task_keywords(text)
+        task_type = task_type_from_counts(counts)
+        if task_type == GENERAL_TASK_TYPE:
             logger.info("未明确检测到专业任务类型，使用通用任务处理")
-            return "通用任务"
+        else:
+            logger.info(f"检测到{task_type}相关关键词 {counts[task_type]} 个")
+        return task_type
 
 
 def parse_args():
@@ -377,8 +466,11 @@ def main():
         "specialized_api_url": args.specialized_api_url,
     }
 
-    app = SenseYourVoiceApp(config)
+    asr_pool = create_asr_pool(config)
+    app = SenseYourVoiceApp(config, asr_pool=asr_pool)
     result = app.process(args.audio, args.instruction)
+    if asr_pool is not None:
+        asr_pool.shutdown()
 
     if result["success"]:
         print("\n===== 处理结果 =====")
@@ -27,6 +27,38 @@ DEFAULT_CONFIG = {
     "auto_init": False,  # 是否自动初始化应用
     "share": False,  # 是否创建公共链接分享界面
     "port": 7800,  # 服务端口
+    # 语音识别工作池，0 表示在主进程内串行转录
+    "asr_workers": 0,  # fork 出的转录进程数（仅 CPU）
+    "asr_worker_threads": 1,  # 每个转录进程的 torch 线程数
+    # torch 线程与核心绑定，None 表示使用 torch 默认值
+    "intra_op_threads": None,  # 单个算子内部的并行线程数
+    "inter_op_threads": None,  # 算子之间的并行线程数
+    "cpu_affinity": None,  # 绑定的核心列表，如 "0-7"；启用工作池时按进程划分
+    # 转录结果缓存，按音频内容哈希命中；填写目录（如 "transcription_cache"）开启，
+    # 空字符串表示关闭（None 会被 load_config 忽略，不能用来关闭）
+    "transcription_cache_dir": "",
+    "transcription_cache_size": 500,  # 最多保留的记录数，超出后按 LRU 淘汰
+    # 解码音频与 fbank 特征的内存缓存总上限（MB），0 关闭；启用工作池时由主进程与
+    # 各转录进程均分
+    "feature_cache_mb": 256,
+    # LLM 接口的共享 HTTP 连接池（理解模块与专业任务模块共用 keep-alive 连接）
+    "http_pool_connections": 4,  # 缓存连接池的主机数
+    "http_pool_maxsize": 32,  # 每个主机保持的最大连接数，应不小于并发请求数
+    "http_connect_timeout": 5,  # 建立连接的超时（秒）
+    # LLM 接口的重试与熔断（按上游主机共享）
+    "llm_retry_max_attempts": 3,  # 包含首次请求在内的最大尝试次数
+    "llm_retry_base_delay": 0.5,  # 指数退避的初始等待（秒），实际等待带随机抖动
+    "llm_retry_max_delay": 8.0,  # 单次等待上限（秒）
+    "llm_circuit_failure_threshold": 5,  # 连续失败多少次后熔断，熔断期间请求直接失败
+    "llm_circuit_reset_seconds": 30.0,  # 熔断后多久放行一个探测请求
+    # 专业任务模块处理的内容："understanding" 为理解模块的完整回复（默认），
+    # "user_input" 为用户的原始输入（文本与语音转写）
+    "specialized_input": "understanding",
+    # 推测路由：理解结果流式输出期间命中足够的任务关键词时提前发起专业任务请求，
+    # 最终判定不一致时取消。推测请求发起时理解回复尚不完整，因此只在
+    # specialized_input 为 "user_input" 时生效，不会改变专业任务看到的内容
+    "speculative_routing": False,
+    "speculative_min_hits": 2,  # 领先任务类型至少命中的关键词数
     # LLM 调用参数
     "llm_max_tokens": 4096,
     "llm_stop": None,
@@ -9,15 +9,20 @@ import gradio.themes as grt
 import time
 import logging  # 需要导入 logging 以便校验函数使用
 import json
+import atexit
+import asyncio
 import datetime
+import functools
 from pathlib import Path
 
 # 导入配置和主应用
 from config import load_config
-from app_new import SenseYourVoiceApp
+from app_new import SenseYourVoiceApp, create_asr_pool
 
 # 全局应用实例
 sense_app = None
+# 语音识别工作池，在启动 Web 服务之前创建一次，每次初始化应用时复用
+asr_pool = None
 
 # 保存目录配置
 SAVE_DIR = Path("saved_transcriptions")
@@ -547,6 +552,9 @@ def initialize_app(
     understanding_api_url,
     specialized_api_key,
     specialized_api_url,
+    intra_op_threads=None,
+    inter_op_threads=None,
+    cpu_affinity=None,
 ):
     """初始化应用实例"""
     global sense_app
@@ -559,13 +567,19 @@ def initialize_app(
         "understanding_api_url": understanding_api_url,
         "specialized_api_key": specialized_api_key,
         "specialized_api_url": specialized_api_url,
+        "intra_op_threads": intra_op_threads,
+        "inter_op_threads": inter_op_threads,
+        "cpu_affinity": cpu_affinity,
     }
 
     # 使用load_config函数加载配置，合并用户配置和默认配置
     config = load_config(user_config)
 
     try:
-        sense_app = SenseYourVoiceApp(config)
+        # 重新初始化时复用启动时创建的转录进程，不在运行中的服务里再次 fork
+        if sense_app is not None:
+            sense_app.close()
+        sense_app = SenseYourVoiceApp(config, asr_pool=asr_pool)
         return (
             "应用初始化成功！",
             gr.update(visible=False),
@@ -631,10 +645,66 @@ def process_audio(audio_file, chat_history, audio_text):
         yield chat_history, None, f"处理过程发生错误: {str(e)}", audio_text, gr.update(visible=False)
 
 
-def process_text(
+def start_live_transcription():
+    """开始录音时打开流式识别会话"""
+    global sense_app
+
+    if sense_app is None:
+        return None, "应用尚未初始化，请先初始化应用。"
+
+    session = sense_app.voice_to_text.open_stream()
+    if session is None:
+        return None, "流式识别会话打开失败，请检查语音模型是否初始化成功。"
+    return session, ""
+
+
+def stream_live_audio(audio_chunk, session):
+    """接收麦克风音频块，返回部分识别结果"""
+    if session is None or audio_chunk is None:
+        return session, gr.update()
+
+    result = session.feed(audio_chunk)
+    if not result["success"]:
+        return session, result["error"]
+    return session, result["text"]
+
+
+def finish_live_transcription(session, audio_text):
+    """停止录音时结束流式会话，最终结果作为后续对话的语音内容"""
+    if session is None:
+        return None, gr.update(), audio_text
+
+    result = session.finalize()
+    if not result["success"]:
+        return None, result["error"], audio_text
+    return None, result["text"], result["text"]
+
+
+async def _iterate_in_thread(iterator):
+    """在线程池中逐项读取同步迭代器（如专业任务的流式响应），不阻塞事件循环"""
+    iterator = iter(iterator)
+    done = object()
+    try:
+        while True:
+            item = await asyncio.to_thread(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        # 提前结束时关闭生成器，使其释放持有的流式连接
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+async def process_text(
     text_input, chat_history, audio_text, max_tokens, temperature, top_p, top_k, audio_weight
 ):
-    """处理用户输入的文本并逐步更新对话历史"""
+    """处理用户输入的文本并逐步更新对话历史
+
+    异步生成器：理解模块经 analyze_async 在事件循环上流式读取，等待 LLM 响应时
+    不占用 Gradio 的工作线程。
+    """
     global sense_app
 
     if sense_app is None:
@@ -645,6 +715,7 @@ def process_text(
         yield chat_history, None, "请输入文本内容。", audio_text
         return
 
+    router = None
     try:
         # 构建完整的对话上下文，包括音频内容
         context = ""
@@ -715,14 +786,21 @@ def process_text(
         needs_specialized_task = False
         specialized_result_output = None  # 用于存储专业任务的最终结果或流式块
 
+        # 用户的原始输入；specialized_input 为 user_input 时专业任务处理它，此时
+        # 推测路由在理解结果流式输出期间检测任务关键词，结论可信时提前发起专业任务请求
+        user_content = text_input
+        if audio_text and audio_text.strip():
+            user_content = f"{audio_text}\n\n{text_input}"
+        router = sense_app.create_speculative_router(user_content)
+
         # 处理理解模块的流式输出
-        understanding_stream = sense_app.understanding.analyze(
+        understanding_stream = sense_app.understanding.analyze_async(
             text_input, context=context, llm_params=llm_params
         )
         # --- 定义理解模块流式输出期望的关键字段 ---
         understanding_chunk_required_keys = ["success", "is_final"]
 
-        for chunk_data in understanding_stream:
+        async for chunk_data in understanding_stream:
             # --- 校验 UnderstandingModule 流式块 ---
             validation_error = validate_response_dict(
                 chunk_data,
@@ -755,6 +833,8 @@ def process_text(
             response_chunk = chunk_data.get("response_chunk", "")
             if response_chunk:
                 full_response += response_chunk
+                if router is not None:
+                    router.feed(response_chunk)
                 new_chat_history[-1] = (text_input, full_response)
                 yield new_chat_history, specialized_result_output, None, audio_text
 
@@ -763,16 +843,26 @@ def process_text(
             task_type = sense_app._determine_task_type(
                 full_response
             )  # 使用完整响应判断任务类型
-            specialized_task_stream = sense_app.specialized_task.process_task(
-                task_type, full_response
+            specialized_content = sense_app.get_specialized_content(
+                user_content, full_response
             )
+            # 推测请求与最终判定一致时直接沿用，它已与理解输出并行运行了一段时间
+            specialized_task_stream = (
+                router.resolve(True, task_type, specialized_content)
+                if router is not None
+                else None
+            )
+            if specialized_task_stream is None:
+                specialized_task_stream = sense_app.specialized_task.process_task(
+                    task_type, specialized_content
+                )
 
             full_specialized_result = ""  # 用于累积专业任务的流式结果
             specialized_result_output = ""  # 初始化专业任务输出为空字符串
             # --- 定义专业任务模块流式输出期望的关键字段 ---
             specialized_chunk_required_keys = ["success", "is_final"]
 
-            for specialized_chunk_data in specialized_task_stream:
+            async for specialized_chunk_data in _iterate_in_thread(specialized_task_stream):
                 # --- 校验 SpecializedTaskModule 流式块 ---
                 validation_error = validate_response_dict(
                     specialized_chunk_data,
@@ -808,11 +898,18 @@ def process_text(
             # 专业任务流结束后，确保最终的专业结果被传递
             specialized_result_output = full_specialized_result
 
+        elif router is not None:
+            router.resolve(False, None)
+
         # 确保最终状态被传递
         yield new_chat_history, specialized_result_output, None, audio_text
 
     except Exception as e:
         yield chat_history, None, f"处理过程发生错误: {str(e)}", audio_text
+    finally:
+        # 出错返回或界面中途放弃生成器时，停止仍在运行的推测请求
+        if router is not None:
+            router.cancel()
 
 def update_header_style(bg_color):
     style_html = f"""
@@ -886,8 +983,55 @@ def main():
     parser.add_argument(
         "--port", type=int, default=default_config["port"], help="服务端口"
     )
+    parser.add_argument(
+        "--asr_workers",
+        type=int,
+        default=default_config["asr_workers"],
+        help="语音识别工作进程数（仅 CPU），0 表示在主进程内转录",
+    )
+    parser.add_argument(
+        "--asr_worker_threads",
+        type=int,
+        default=default_config["asr_worker_threads"],
+        help="每个语音识别工作进程的 torch 线程数",
+    )
+    parser.add_argument(
+        "--intra_op_threads",
+        type=int,
+        default=default_config["intra_op_threads"],
+        help="torch 单个算子内部的并行线程数",
+    )
+    parser.add_argument(
+        "--inter_op_threads",
+        type=int,
+        default=default_config["inter_op_threads"],
+        help="torch 算子之间的并行线程数",
+    )
+    parser.add_argument(
+        "--cpu_affinity",
+        type=str,
+        default=default_config["cpu_affinity"],
+        help="绑定的 CPU 核心列表，如 0-7；启用工作池时按进程划分",
+    )
     args = parser.parse_args()
 
+    # 在启动 Web 服务（及其线程）之前加载模型并 fork 语音识别工作池：
+    # 在多线程进程中 fork 可能死锁，因此整个进程只创建这一次
+    global asr_pool
+    asr_pool = create_asr_pool(
+        {
+            "model_dir": args.model_dir,
+            "device": args.device,
+            "asr_workers": args.asr_workers,
+            "asr_worker_threads": args.asr_worker_threads,
+            "intra_op_threads": args.intra_op_threads,
+            "inter_op_threads": args.inter_op_threads,
+            "cpu_affinity": args.cpu_affinity,
+        }
+    )
+    if asr_pool is not None:
+        atexit.register(asr_pool.shutdown)
+
     # 创建Gradio界面
     with gr.Blocks(
         title="SenseYourVoice - 语音理解与处理", theme=grt.Citrus(), css=CUSTOM_CSS
@@ -983,7 +1127,12 @@ def main():
 
             # ... click 事件不变 ...
             init_btn.click(
-                fn=initialize_app,
+                fn=functools.partial(
+                    initialize_app,
+                    intra_op_threads=args.intra_op_threads,
+                    inter_op_threads=args.inter_op_threads,
+                    cpu_affinity=args.cpu_affinity,
+                ),
                 inputs=[
                     model_dir,
                     device,
@@ -1015,6 +1164,7 @@ def main():
             # 添加State组件存储对话历史和音频文本
             chat_history = gr.State([])
             audio_text = gr.State("")
+            live_session = gr.State(None)
 
             # 主界面布局
             with gr.Row():
@@ -1024,6 +1174,13 @@ def main():
                         gr.HTML('<div class="custom-header">音频处理</div>', elem_classes=["custom-header"])
                         audio_input = gr.Audio(label="上传音频文件", type="filepath")
                         process_audio_btn = gr.Button("处理音频")
+                        live_audio = gr.Audio(
+                            label="实时语音输入",
+                            sources=["microphone"],
+                            type="numpy",
+                            streaming=True,
+                        )
+                        live_text = gr.Textbox(label="实时识别结果", interactive=False)
 
                     with gr.Group():
                         gr.HTML('<div class="custom-header">提问与参数设置</div>', elem_classes=["custom-header"])
@@ -1219,7 +1376,7 @@ def main():
                 gr.update(visible=True)  # 保持语音状态显示
                 )
 
-            def process_text_and_update(
+            async def process_text_and_update(
                 text, history, audio_text, max_tokens, temperature, top_p, top_k, audio_weight
             ):
                 """处理文本并逐步更新界面"""
@@ -1231,7 +1388,7 @@ def main():
                 specialized_result_output = None  # 初始化变量
                 new_audio_text = audio_text  # 初始化变量
                 
-                for new_history, specialized_result_output, error, new_audio_text in process_text(
+                async for new_history, specialized_result_output, error, new_audio_text in process_text(
                     text, history, audio_text, max_tokens, temperature, top_p, top_k, audio_weight
                 ):
                     if error:
@@ -1425,6 +1582,24 @@ def main():
                 ],
             )
 
+            # 实时语音输入事件：开始录音打开会话，录音中持续返回部分结果，停止后写入语音内容
+            live_audio.start_recording(
+                fn=start_live_transcription,
+                inputs=[],
+                outputs=[live_session, live_text],
+            )
+            live_audio.stream(
+                fn=stream_live_audio,
+                inputs=[live_audio, live_session],
+                outputs=[live_session, live_text],
+                stream_every=0.3,
+            )
+            live_audio.stop_recording(
+                fn=finish_live_transcription,
+                inputs=[live_session, audio_text],
+                outputs=[live_session, live_text, audio_text],
+            )
+
             # 处理文本按钮事件
             process_text_btn.click(
                 fn=process_text_and_update,
@@ -1511,6 +1686,7 @@ def main():
         1. 在"应用设置"标签页中配置参数并初始化应用。
         2. 在"语音处理"标签页中：
            - **上传音频**：上传音频文件，点击"处理音频"，系统会解读并反馈。
+           - **实时语音**：在"实时语音输入"中开始录音，识别结果会边说边显示，停止录音后可直接提问。
            - **提问**：在文本框中输入问题，点击"继续对话"进行互动。
            - **语音内容权重**：调整"语音内容权重"滑块(1-5)，数值越高AI越重视语音内容：
            - **语音状态指示器**：实时显示当前语音内容的状态、长度和权重设置。
@@ -1532,6 +1708,9 @@ def main():
             args.understanding_api_url,
             args.specialized_api_key,
             args.specialized_api_url,
+            intra_op_threads=args.intra_op_threads,
+            inter_op_threads=args.inter_op_threads,
+            cpu_affinity=args.cpu_affinity,
         )
         print(f"自动初始化结果: {init_result}")
 
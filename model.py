@@ -1,3 +1,4 @@
+import os
 import time
 import torch
 from torch import nn
@@ -16,10 +17,16 @@ from utils.ctc_alignment import ctc_forced_align
 
 
 class SinusoidalPositionEncoder(torch.nn.Module):
-    """ """
+    """Sinusoidal position encoding with a lazily grown per-(device, dtype) table."""
 
-    def __int__(self, d_model=80, dropout_rate=0.1):
-        pass
+    # longest cached table (~8 minutes of 60 ms frames); positions beyond it,
+    # e.g. late chunks of a long stream, are encoded on the fly
+    max_cached_len = 8192
+
+    def __init__(self, d_model=80, dropout_rate=0.1):
+        super().__init__()
+        # (device, dtype, depth) -> (1, max_len, depth) table for positions 1..max_len
+        self._tables = {}
 
     def encode(
         self,
@@ -44,10 +51,43 @@ class SinusoidalPositionEncoder(torch.nn.Module):
         encoding = torch.cat([torch.sin(scaled_time), torch.cos(scaled_time)], dim=2)
         return encoding.type(dtype)
 
+    def table(self, start_idx, length, depth, device, dtype):
+        """Return the encoding of positions start_idx+1..start_idx+length, shape (1, length, depth).
+
+        The cached table only computes the missing positions when a longer
+        sequence arrives and at least doubles in size, so streaming chunks
+        rarely extend it.
+        """
+        end = start_idx + length
+        if end > self.max_cached_len or torch.jit.is_tracing():
+            # a traced graph must not bake in a cached table of fixed length
+            positions = torch.arange(start_idx + 1, end + 1, device=device)[None, :]
+            return self.encode(positions, depth).to(dtype)
+        key = (device, dtype, depth)
+        table = self._tables.get(key)
+        cached = 0 if table is None else table.size(1)
+        if cached < end:
+            new_length = min(max(end, 2 * cached), self.max_cached_len)
+            positions = torch.arange(cached + 1, new_length + 1, device=device)[None, :]
+            # positions are not exactly representable in half precision, so the
+            # table is always computed in float32 and cast afterwards
+            extension = self.encode(positions, depth).to(dtype)
+            table = extension if table is None else torch.cat((table, extension), dim=1)
+            self._tables[key] = table
+        return table[:, start_idx:end]
+
     def forward(self, x):
         batch_size, timesteps, input_dim = x.size()
-        positions = torch.arange(1, timesteps + 1, device=x.device)[None, :]
-        position_encoding = self.encode(positions, input_dim, x.dtype).to(x.device)
+        position_encoding = self.table(0, timesteps, input_dim, x.device, x.dtype)
+
+        return x + position_encoding
+
+    def forward_chunk(self, x, start_idx=0):
+        """Add position encoding for a chunk whose first frame is at absolute index start_idx."""
+        batch_size, timesteps, input_dim = x.size()
+        position_encoding = self.table(
+            start_idx, timesteps, input_dim, x.device, x.dtype
+        )
 
         return x + position_encoding
 
@@ -97,12 +137,15 @@ class MultiHeadedAttentionSANM(nn.Module):
         lora_rank=8,
         lora_alpha=16,
         lora_dropout=0.1,
+        attention_backend="eager",
     ):
         """Construct an MultiHeadedAttention object."""
         super().__init__()
         assert n_feat % n_head == 0
+        assert attention_backend in ("eager", "sdpa")
         self.d_k = n_feat // n_head
         self.h = n_head
+        self.attention_backend = attention_backend
         # self.linear_q = nn.Linear(n_feat, n_feat)
         # self.linear_k = nn.Linear(n_feat, n_feat)
         # self.linear_v = nn.Linear(n_feat, n_feat)
@@ -140,6 +183,44 @@ class MultiHeadedAttentionSANM(nn.Module):
             x = x * mask
         return x
 
+    def forward_fsmn_chunk(self, inputs, fsmn_cache=None, stride=None):
+        """FSMN memory for one streaming chunk.
+
+        The depthwise convolution sees the last left_padding committed frames of
+        the previous chunks instead of zero padding, so committed frames match
+        the offline output as long as the chunk carries at least right_padding
+        look-ahead frames.
+
+        Args:
+            inputs (torch.Tensor): Value tensor of the chunk (#batch, time, size).
+            fsmn_cache (torch.Tensor): Left context (#batch, left_padding, size) or None.
+            stride (int): Number of committed (non look-ahead) frames in the chunk.
+
+        Returns:
+            torch.Tensor: FSMN memory (#batch, time, size).
+            torch.Tensor: Updated left context (#batch, left_padding, size).
+
+        """
+        b, t, d = inputs.size()
+        left_padding, right_padding = self.pad_fn.padding
+        if stride is None:
+            stride = t
+        if fsmn_cache is None:
+            fsmn_cache = inputs.new_zeros(b, left_padding, d)
+
+        x = torch.cat((fsmn_cache, inputs), dim=1).transpose(1, 2)
+        x = F.pad(x, (0, right_padding))
+        x = self.fsmn_block(x)
+        x = x.transpose(1, 2)
+        x += inputs
+        x = self.dropout(x)
+
+        if left_padding > 0:
+            fsmn_cache = torch.cat((fsmn_cache, inputs[:, :stride]), dim=1)[
+                :, -left_padding:
+            ]
+        return x, fsmn_cache
+
     def forward_qkv(self, x):
         """Transform query, key and value.
 
@@ -207,6 +288,41 @@ class MultiHeadedAttentionSANM(nn.Module):
 
         return self.linear_out(x)  # (batch, time1, d_model)
 
+    def forward_sdpa(self, query, key, value, mask, mask_att_chunk_encoder=None):
+        """Attention context through F.scaled_dot_product_attention.
+
+        Matches scaling + forward_attention without materializing the
+        (#batch, n_head, time1, time2) scores tensor when a fused kernel is
+        available. Rows whose keys are all masked yield zeros as in the eager path.
+
+        Args:
+            query (torch.Tensor): Unscaled query (#batch, n_head, time1, d_k).
+            key (torch.Tensor): Key (#batch, n_head, time2, d_k).
+            value (torch.Tensor): Value (#batch, n_head, time2, d_k).
+            mask (torch.Tensor): Mask (#batch, 1, time2) or (#batch, time1, time2).
+
+        Returns:
+            torch.Tensor: Output tensor (#batch, time1, d_model).
+
+        """
+        n_batch = value.size(0)
+        attn_mask = None
+        if mask is not None:
+            if mask_att_chunk_encoder is not None:
+                mask = mask * mask_att_chunk_encoder
+            attn_mask = mask.unsqueeze(1).ne(0)  # (batch, 1, *, time2)
+        x = F.scaled_dot_product_attention(
+            query,
+            key,
+            value,
+            attn_mask=attn_mask,
+            dropout_p=self.dropout.p if self.training else 0.0,
+        )  # (batch, head, time1, d_k)
+        if attn_mask is not None:
+            x = x.masked_fill(~attn_mask.any(dim=-1, keepdim=True), 0.0)
+        x = x.transpose(1, 2).reshape(n_batch, -1, self.h * self.d_k)
+        return self.linear_out(x)  # (batch, time1, d_model)
+
     def forward(self, x, mask, mask_shfit_chunk=None, mask_att_chunk_encoder=None):
         """Compute scaled dot product attention.
 
@@ -223,6 +339,9 @@ class MultiHeadedAttentionSANM(nn.Module):
         """
         q_h, k_h, v_h, v = self.forward_qkv(x)
         fsmn_memory = self.forward_fsmn(v, mask, mask_shfit_chunk)
+        if self.attention_backend == "sdpa":
+            att_outs = self.forward_sdpa(q_h, k_h, v_h, mask, mask_att_chunk_encoder)
+            return att_outs + fsmn_memory
         q_h = q_h * self.d_k ** (-0.5)
         scores = torch.matmul(q_h, k_h.transpose(-2, -1))
         att_outs = self.forward_attention(v_h, scores, mask, mask_att_chunk_encoder)
@@ -243,36 +362,136 @@ class MultiHeadedAttentionSANM(nn.Module):
 
         """
         q_h, k_h, v_h, v = self.forward_qkv(x)
-        if chunk_size is not None and look_back > 0 or look_back == -1:
-            if cache is not None:
-                k_h_stride = k_h[:, :, : -(chunk_size[2]), :]
-                v_h_stride = v_h[:, :, : -(chunk_size[2]), :]
+        if cache is None:
+            cache = {}
+        # the trailing chunk_size[2] frames are look-ahead and are not cached
+        stride = k_h.size(2) - chunk_size[2] if chunk_size is not None else k_h.size(2)
+        k_h_stride = k_h[:, :, :stride, :]
+        v_h_stride = v_h[:, :, :stride, :]
+        mask = None
+        if chunk_size is not None and look_back > 0:
+            # bounded history: preallocated ring buffer, the first "pin" frames
+            # (e.g. the query prefix) never expire
+            if "kv" not in cache:
+                cache["kv"] = RingKVCache(
+                    k_h, cache.get("pin", 0), look_back * chunk_size[1], k_h.size(2)
+                )
+            k_h, v_h, mask = cache["kv"].extend(k_h, v_h)
+        elif look_back == -1:
+            # unbounded history keeps growing the cache
+            if "k" in cache:
                 k_h = torch.cat((cache["k"], k_h), dim=2)
                 v_h = torch.cat((cache["v"], v_h), dim=2)
-
                 cache["k"] = torch.cat((cache["k"], k_h_stride), dim=2)
                 cache["v"] = torch.cat((cache["v"], v_h_stride), dim=2)
-                if look_back != -1:
-                    cache["k"] = cache["k"][:, :, -(look_back * chunk_size[1]) :, :]
-                    cache["v"] = cache["v"][:, :, -(look_back * chunk_size[1]) :, :]
             else:
-                cache_tmp = {
-                    "k": k_h[:, :, : -(chunk_size[2]), :],
-                    "v": v_h[:, :, : -(chunk_size[2]), :],
-                }
-                cache = cache_tmp
-        fsmn_memory = self.forward_fsmn(v, None)
-        q_h = q_h * self.d_k ** (-0.5)
-        scores = torch.matmul(q_h, k_h.transpose(-2, -1))
-        att_outs = self.forward_attention(v_h, scores, None)
+                cache["k"] = k_h_stride
+                cache["v"] = v_h_stride
+        fsmn_memory, cache["fsmn"] = self.forward_fsmn_chunk(
+            v, cache.get("fsmn"), stride
+        )
+        if self.attention_backend == "sdpa":
+            att_outs = self.forward_sdpa(q_h, k_h, v_h, mask)
+        else:
+            q_h = q_h * self.d_k ** (-0.5)
+            scores = torch.matmul(q_h, k_h.transpose(-2, -1))
+            att_outs = self.forward_attention(v_h, scores, mask)
+        if mask is not None:
+            cache["kv"].commit(k_h_stride, v_h_stride)
         return att_outs + fsmn_memory, cache
 
 
+class RingKVCache:
+    """Fixed-size k/v cache used by MultiHeadedAttentionSANM.forward_chunk.
+
+    Slots are laid out as [pinned prefix | ring of look_back frames | current
+    chunk]. The current chunk is written into the tail slots and attention runs
+    on a view of the buffer with a validity mask; since attention scores carry
+    no positional term the ring order does not matter. After attention only the
+    committed stride is written into the ring, overwriting the oldest frames.
+
+    Args:
+        k_h (torch.Tensor): Key tensor of the first chunk (#batch, n_head, time, d_k).
+        pin (int): Number of leading committed frames that never expire.
+        window (int): Number of ring slots (look_back * chunk_size[1]).
+        chunk_capacity (int): Number of tail slots for the current chunk.
+
+    """
+
+    def __init__(self, k_h, pin, window, chunk_capacity):
+        b, h, _, d_k = k_h.size()
+        self.pin = pin
+        self.window = window
+        self.tail = pin + window
+        self.k = k_h.new_zeros(b, h, self.tail + chunk_capacity, d_k)
+        self.v = k_h.new_zeros(b, h, self.tail + chunk_capacity, d_k)
+        self.mask = k_h.new_zeros(b, 1, self.tail + chunk_capacity)
+        self.num_pinned = 0
+        self.ring_pos = 0
+
+    @property
+    def nbytes(self):
+        return sum(t.numel() * t.element_size() for t in (self.k, self.v, self.mask))
+
+    def extend(self, k_h, v_h):
+        """Write the current chunk into the tail slots.
+
+        Returns:
+            torch.Tensor: Key view (#batch, n_head, slots, d_k).
+            torch.Tensor: Value view (#batch, n_head, slots, d_k).
+            torch.Tensor: Mask view (#batch, 1, slots), 1 for valid slots.
+
+        """
+        t = k_h.size(2)
+        end = self.tail + t
+        if end > self.k.size(2):
+            # only reached when a chunk is longer than the first one
+            extra = end - self.k.size(2)
+            self.k = F.pad(self.k, (0, 0, 0, extra))
+            self.v = F.pad(self.v, (0, 0, 0, extra))
+            self.mask = F.pad(self.mask, (0, extra))
+        self.k[:, :, self.tail : end] = k_h
+        self.v[:, :, self.tail : end] = v_h
+        self.mask[:, :, self.tail : end] = 1.0
+        return self.k[:, :, :end], self.v[:, :, :end], self.mask[:, :, :end]
+
+    def commit(self, k_stride, v_stride):
+        """Move the committed frames of the current chunk into the pinned/ring slots."""
+        self.mask[:, :, self.tail :] = 0.0
+        n = k_stride.size(2)
+        start = 0
+        if self.num_pinned < self.pin:
+            m = min(self.pin - self.num_pinned, n)
+            dst = self.num_pinned
+            self.k[:, :, dst : dst + m] = k_stride[:, :, :m]
+            self.v[:, :, dst : dst + m] = v_stride[:, :, :m]
+            self.mask[:, :, dst : dst + m] = 1.0
+            self.num_pinned += m
+            start = m
+        if self.window <= 0:
+            return
+        start = max(start, n - self.window)
+        while start < n:
+            m = min(n - start, self.window - self.ring_pos)
+            dst = self.pin + self.ring_pos
+            self.k[:, :, dst : dst + m] = k_stride[:, :, start : start + m]
+            self.v[:, :, dst : dst + m] = v_stride[:, :, start : start + m]
+            self.mask[:, :, dst : dst + m] = 1.0
+            self.ring_pos = (self.ring_pos + m) % self.window
+            start += m
+
+
 class LayerNorm(nn.LayerNorm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def forward(self, input):
+        if self.weight is None or input.dtype == self.weight.dtype:
+            # the native kernels accumulate half/bfloat16 in float32 already,
+            # so the explicit round trip is only needed for mixed dtypes
+            return F.layer_norm(
+                input, self.normalized_shape, self.weight, self.bias, self.eps
+            )
         output = F.layer_norm(
             input.float(),
             self.normalized_shape,
@@ -283,10 +502,28 @@ class LayerNorm(nn.LayerNorm):
         return output.type_as(input)
 
 
+# device -> arange(0, n) reused by sequence_mask, grown on demand
+_ARANGE_CACHE = {}
+
+
+def cached_arange(length, device):
+    """Return arange(0, length) on device as a view of a cached, grown-on-demand tensor."""
+    row_vector = _ARANGE_CACHE.get(device)
+    if row_vector is None or row_vector.size(0) < length:
+        cached = 0 if row_vector is None else row_vector.size(0)
+        row_vector = torch.arange(0, max(length, 2 * cached), 1, device=device)
+        _ARANGE_CACHE[device] = row_vector
+    return row_vector[:length]
+
+
 def sequence_mask(lengths, maxlen=None, dtype=torch.float32, device=None):
     if maxlen is None:
         maxlen = lengths.max()
-    row_vector = torch.arange(0, maxlen, 1).to(lengths.device)
+    if torch.jit.is_tracing():
+        # keep maxlen symbolic so exported graphs accept any length
+        row_vector = torch.arange(0, maxlen, 1).to(lengths.device)
+    else:
+        row_vector = cached_arange(int(maxlen), lengths.device)
     matrix = torch.unsqueeze(lengths, dim=-1)
     mask = row_vector < matrix
     mask = mask.detach()
@@ -469,6 +706,7 @@ class SenseVoiceEncoderSmall(nn.Module):
         kernel_size: int = 11,
         sanm_shfit: int = 0,
         selfattention_layer_type: str = "sanm",
+        attention_backend: str = "eager",
         **kwargs,
     ):
         super().__init__()
@@ -544,17 +782,33 @@ class SenseVoiceEncoderSmall(nn.Module):
         self.after_norm = LayerNorm(output_size)
 
         self.tp_norm = LayerNorm(output_size)
+        self.set_attention_backend(attention_backend)
 
     def output_size(self) -> int:
         return self._output_size
 
+    def set_attention_backend(self, backend: str = "eager"):
+        """Select the self-attention kernel of every layer.
+
+        Args:
+            backend: "eager" (explicit scores + softmax, reference) or "sdpa"
+                (torch.nn.functional.scaled_dot_product_attention).
+        """
+        if backend not in ("eager", "sdpa"):
+            raise ValueError(f"unsupported attention backend: {backend}")
+        for module in self.modules():
+            if isinstance(module, MultiHeadedAttentionSANM):
+                module.attention_backend = backend
+
     def forward(
         self,
         xs_pad: torch.Tensor,
         ilens: torch.Tensor,
     ):
         """Embed positions in tensor."""
-        masks = sequence_mask(ilens, device=ilens.device)[:, None, :]
+        masks = sequence_mask(ilens, dtype=xs_pad.dtype, device=ilens.device)[
+            :, None, :
+        ]
 
         xs_pad *= self.output_size() ** 0.5
 
@@ -572,7 +826,7 @@ class SenseVoiceEncoderSmall(nn.Module):
         xs_pad = self.after_norm(xs_pad)
 
         # forward encoder2
-        olens = masks.squeeze(1).sum(1).int()
+        olens = masks.squeeze(1).ne(0).sum(1).int()
 
         for layer_idx, encoder_layer in enumerate(self.tp_encoders):
             encoder_outs = encoder_layer(xs_pad, masks)
@@ -581,6 +835,105 @@ class SenseVoiceEncoderSmall(nn.Module):
         xs_pad = self.tp_norm(xs_pad)
         return xs_pad, olens
 
+    def init_cache(self, pin=0):
+        """Create an empty streaming cache.
+
+        Args:
+            pin (int): number of leading frames that stay in every layer's k/v
+                cache regardless of look_back (e.g. the query prefix).
+        """
+        num_layers = len(self.encoders0) + len(self.encoders) + len(self.tp_encoders)
+        return {
+            "start_idx": 0,
+            "pin": pin,
+            "layers": [{"pin": pin} for _ in range(num_layers)],
+        }
+
+    @staticmethod
+    def cache_nbytes(cache):
+        """Bytes held by the k/v ring buffers of a streaming cache."""
+        return sum(
+            layer["kv"].nbytes for layer in cache["layers"] if "kv" in layer
+        )
+
+    def forward_chunk(
+        self,
+        xs_pad: torch.Tensor,
+        cache: dict,
+        chunk_size: list,
+        look_back: int = 0,
+    ):
+        """Encode one chunk with the per-layer k/v cache.
+
+        Args:
+            xs_pad: (1, T, D) chunk whose last chunk_size[2] frames are look-ahead.
+            cache: cache from init_cache, updated in place.
+            chunk_size: [left, center, right] chunk configuration.
+            look_back: number of center chunks kept as left context, -1 for all.
+
+        Returns:
+            torch.Tensor: (1, T, D) encoder output for every frame of the chunk.
+        """
+        xs_pad = xs_pad * self.output_size() ** 0.5
+        xs_pad = self.embed.forward_chunk(xs_pad, cache["start_idx"])
+
+        layers = cache["layers"]
+        encoder_layers = list(self.encoders0) + list(self.encoders)
+        for layer_idx, encoder_layer in enumerate(encoder_layers):
+            xs_pad, layers[layer_idx] = encoder_layer.forward_chunk(
+                xs_pad, layers[layer_idx], chunk_size, look_back
+            )
+
+        xs_pad = self.after_norm(xs_pad)
+
+        for tp_idx, encoder_layer in enumerate(self.tp_encoders):
+            layer_idx = len(encoder_layers) + tp_idx
+            xs_pad, layers[layer_idx] = encoder_layer.forward_chunk(
+                xs_pad, layers[layer_idx], chunk_size, look_back
+            )
+
+        xs_pad = self.tp_norm(xs_pad)
+        cache["start_idx"] += xs_pad.size(1) - chunk_size[2]
+        return xs_pad
+
+
+class SenseVoiceExport(nn.Module):
+    """Encoder + CTC graph of SenseVoiceSmall for ONNX export.
+
+    Takes the LFR+CMVN features and the language/textnorm query ids and returns
+    CTC log-probabilities for the 4 query frames followed by the speech frames.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.embed = model.embed
+        self.encoder = model.encoder
+        self.ctc_lo = model.ctc.ctc_lo
+
+    def forward(self, speech, speech_lengths, language, textnorm):
+        """
+        Args:
+            speech: (Batch, Length, Dim) float32 features.
+            speech_lengths: (Batch,) int32 valid lengths.
+            language: (Batch,) int64 lid_dict ids.
+            textnorm: (Batch,) int64 textnorm_dict ids.
+
+        Returns:
+            torch.Tensor: (Batch, Length + 4, Vocab) CTC log-probabilities.
+            torch.Tensor: (Batch,) int32 valid lengths including the queries.
+        """
+        language_query = self.embed(language).unsqueeze(1)
+        textnorm_query = self.embed(textnorm).unsqueeze(1)
+        event_emo_query = self.embed(
+            torch.arange(1, 3, device=speech.device)
+        ).expand(speech.size(0), -1, -1)
+        speech = torch.cat(
+            (language_query, event_emo_query, textnorm_query, speech), dim=1
+        )
+        encoder_out, encoder_out_lens = self.encoder(speech, speech_lengths + 4)
+        ctc_logits = F.log_softmax(self.ctc_lo(encoder_out), dim=-1)
+        return ctc_logits, encoder_out_lens
+
 
 @tables.register("model_classes", "SenseVoiceSmall")
 class SenseVoiceSmall(nn.Module):
@@ -606,6 +959,12 @@ class SenseVoiceSmall(nn.Module):
     ):
 
         super().__init__()
+        # (language, textnorm, device, dtype) -> (1, 4, D) query prefix for inference
+        self._query_cache = {}
+        # onnxruntime session running SenseVoiceExport, see set_onnx_session
+        self.onnx_session = None
+        # decoded audio / fbank cache shared across inference calls, see set_feature_cache
+        self.feature_cache = None
 
         if specaug is not None:
             specaug_class = tables.specaug_classes.get(specaug)
@@ -826,6 +1185,326 @@ class SenseVoiceSmall(nn.Module):
 
         return loss_rich, acc_rich
 
+    def _build_query(self, language, textnorm, device):
+        """Embed the [language, event, emotion, textnorm] query prefix, shape (1, 4, D)."""
+        language_query = self.embed(
+            torch.LongTensor(
+                [[self.lid_dict[language] if language in self.lid_dict else 0]]
+            ).to(device)
+        )
+        event_emo_query = self.embed(torch.LongTensor([[1, 2]]).to(device))
+        textnorm_query = self.embed(
+            torch.LongTensor([[self.textnorm_dict[textnorm]]]).to(device)
+        )
+        return torch.cat((language_query, event_emo_query, textnorm_query), dim=1)
+
+    def _query_prefix(self, language, textnorm, device):
+        """Cached _build_query for inference; training always rebuilds the prefix."""
+        if self.training:
+            return self._build_query(language, textnorm, device)
+        key = (language, textnorm, device, self.embed.weight.dtype)
+        query = self._query_cache.get(key)
+        if query is None:
+            query = self._build_query(language, textnorm, device).detach()
+            self._query_cache[key] = query
+        return query
+
+    def clear_inference_cache(self):
+        """Drop cached query prefixes, mask aranges and position tables."""
+        self._query_cache.clear()
+        _ARANGE_CACHE.clear()
+        for module in self.modules():
+            if isinstance(module, SinusoidalPositionEncoder):
+                module._tables.clear()
+
+    def _apply(self, fn, *args, **kwargs):
+        # .to()/.cuda()/.half() move the weights, cached tensors must follow
+        self.clear_inference_cache()
+        return super()._apply(fn, *args, **kwargs)
+
+    def train(self, mode: bool = True):
+        # the query embedding may have been updated while training
+        self.clear_inference_cache()
+        return super().train(mode)
+
+    export_name = "sensevoice_encoder_ctc.onnx"
+
+    def export(self, output_dir: str = ".", opset_version: int = 14, **kwargs):
+        """Export the encoder + CTC graph (SenseVoiceExport) to ONNX.
+
+        Batch and time axes are dynamic. Attention is exported with the eager
+        backend; the model's own backend is restored afterwards.
+
+        Args:
+            output_dir: directory the graph is written to as export_name.
+            opset_version: ONNX opset.
+
+        Returns:
+            str: path of the exported file.
+        """
+        export_path = os.path.join(output_dir, self.export_name)
+        backends = {
+            module: module.attention_backend
+            for module in self.modules()
+            if isinstance(module, MultiHeadedAttentionSANM)
+        }
+        was_training = self.training
+        self.eval()
+        try:
+            for module in backends:
+                module.attention_backend = "eager"
+            device = self.ctc.ctc_lo.weight.device
+            dummy_inputs = (
+                torch.randn(2, 30, self.embed.embedding_dim, device=device),
+                torch.tensor([30, 20], dtype=torch.int32, device=device),
+                torch.tensor([0, 0], dtype=torch.int64, device=device),
+                torch.tensor([15, 15], dtype=torch.int64, device=device),
+            )
+            with torch.no_grad():
+                torch.onnx.export(
+                    SenseVoiceExport(self),
+                    dummy_inputs,
+                    export_path,
+                    input_names=["speech", "speech_lengths", "language", "textnorm"],
+                    output_names=["ctc_logits", "encoder_out_lens"],
+                    dynamic_axes={
+                        "speech": {0: "batch_size", 1: "feats_length"},
+                        "speech_lengths": {0: "batch_size"},
+                        "language": {0: "batch_size"},
+                        "textnorm": {0: "batch_size"},
+                        "ctc_logits": {0: "batch_size", 1: "logits_length"},
+                        "encoder_out_lens": {0: "batch_size"},
+                    },
+                    opset_version=opset_version,
+                )
+        finally:
+            for module, backend in backends.items():
+                module.attention_backend = backend
+            self.train(was_training)
+        return export_path
+
+    def set_onnx_session(self, session=None):
+        """Run inference through an onnxruntime session of the exported graph.
+
+        Args:
+            session: onnxruntime.InferenceSession created from export(), or
+                None to go back to the torch encoder.
+        """
+        self.onnx_session = session
+
+    def _forward_torch(self, speech, speech_lengths, language, textnorm):
+        """Encoder + CTC in torch, same outputs as _forward_onnx.
+
+        speech_lengths is bumped in place by the 4 query frames.
+
+        Returns:
+            torch.Tensor: (Batch, Length + 4, Vocab) float32 CTC log-probabilities.
+            torch.Tensor: (Batch,) valid lengths including the queries.
+        """
+        input_query = self._query_prefix(language, textnorm, speech.device).expand(
+            speech.size(0), -1, -1
+        )
+        speech = torch.cat((input_query, speech), dim=1)
+        speech_lengths += 4
+
+        # Encoder
+        encoder_out, encoder_out_lens = self.encoder(speech, speech_lengths)
+        if isinstance(encoder_out, tuple):
+            encoder_out = encoder_out[0]
+
+        # normalize in float32 so half/bfloat16 models keep full-precision scores
+        ctc_logits = F.log_softmax(self.ctc.ctc_lo(encoder_out).float(), dim=-1)
+        return ctc_logits, encoder_out_lens
+
+    def _forward_onnx(self, speech, speech_lengths, language, textnorm):
+        """Encoder + CTC through onnx_session, returns torch tensors on speech.device."""
+        b = speech.size(0)
+        inputs = {
+            "speech": speech.float().cpu().numpy(),
+            "speech_lengths": speech_lengths.int().cpu().numpy(),
+            "language": torch.full(
+                (b,), self.lid_dict.get(language, 0), dtype=torch.int64
+            ).numpy(),
+            "textnorm": torch.full(
+                (b,), self.textnorm_dict[textnorm], dtype=torch.int64
+            ).numpy(),
+        }
+        ctc_logits, encoder_out_lens = self.onnx_session.run(
+            ["ctc_logits", "encoder_out_lens"], inputs
+        )
+        return (
+            torch.from_numpy(ctc_logits).to(speech.device),
+            torch.from_numpy(encoder_out_lens).to(speech.device),
+        )
+
+    def set_feature_cache(self, cache=None):
+        """Reuse decoded audio and fbank features of identical inputs in inference.
+
+        With VAD enabled, AutoModel decodes the file itself and only passes the
+        segment tensors here, so only their fbank (keyed by content hash) is
+        cached; callers decode the file through the same cache before VAD (see
+        VoiceToTextModule._load_audio) to skip the decode as well.
+
+        Args:
+            cache: utils.feature_cache.AudioFeatureCache, or None to disable.
+        """
+        self.feature_cache = cache
+
+    def _extract_feats(self, data_in, frontend, tokenizer, meta_data, **kwargs):
+        """Decode and extract fbank, going through feature_cache when attached."""
+        data_type = kwargs.get("data_type", "sound")
+        audio_fs = kwargs.get("fs", 16000)
+        audio_id = None
+        if self.feature_cache is not None and data_type == "sound":
+            audio_id = self.feature_cache.identify(data_in)
+
+        time1 = time.perf_counter()
+        if audio_id is not None:
+            feats = self.feature_cache.get(("fbank", audio_id, frontend.fs, audio_fs))
+            if feats is not None:
+                meta_data["load_data"] = "0.000"
+                meta_data["extract_feat"] = f"{time.perf_counter() - time1:0.3f}"
+                # inference bumps speech_lengths in place
+                return feats[0], feats[1].clone()
+
+        audio_sample_list = None
+        pcm_key = ("pcm", audio_id, frontend.fs, audio_fs)
+        if audio_id is not None and audio_id[0] != "sha256":
+            audio_sample_list = self.feature_cache.get(pcm_key)
+        if audio_sample_list is None:
+            audio_sample_list = load_audio_text_image_video(
+                data_in,
+                fs=frontend.fs,
+                audio_fs=audio_fs,
+                data_type=data_type,
+                tokenizer=tokenizer,
+            )
+            if audio_id is not None and audio_id[0] != "sha256":
+                self.feature_cache.put(pcm_key, audio_sample_list)
+        time2 = time.perf_counter()
+        meta_data["load_data"] = f"{time2 - time1:0.3f}"
+        speech, speech_lengths = extract_fbank(
+            audio_sample_list,
+            data_type=data_type,
+            frontend=frontend,
+        )
+        time3 = time.perf_counter()
+        meta_data["extract_feat"] = f"{time3 - time2:0.3f}"
+        if audio_id is not None:
+            self.feature_cache.put(
+                ("fbank", audio_id, frontend.fs, audio_fs),
+                (speech, speech_lengths.clone()),
+            )
+        return speech, speech_lengths
+
+    def ctc_greedy_search(
+        self, ctc_logits: torch.Tensor, encoder_out_lens: torch.Tensor
+    ):
+        """Batched CTC greedy search.
+
+        Collapses repeats and drops blanks for the whole batch in one tensor
+        pass, then moves the surviving token ids to the host in a single transfer.
+
+        Args:
+            ctc_logits: (Batch, Length, Vocab) CTC log-probabilities.
+            encoder_out_lens: (Batch,) valid lengths.
+
+        Returns:
+            list: token id list per utterance.
+        """
+        yseq = ctc_logits.argmax(dim=-1)
+        keep = yseq != self.blank_id
+        keep[:, 1:] &= yseq[:, 1:] != yseq[:, :-1]
+        keep &= sequence_mask(
+            encoder_out_lens, maxlen=yseq.size(1), dtype=torch.bool
+        )
+        counts = keep.sum(dim=1)
+        flat = torch.cat((counts, yseq[keep])).tolist()
+        b = yseq.size(0)
+        token_int_list, offset = [], b
+        for count in flat[:b]:
+            token_int_list.append(flat[offset : offset + count])
+            offset += count
+        return token_int_list
+
+    def ctc_timestamps(
+        self,
+        ctc_logits: torch.Tensor,
+        encoder_out_lens: torch.Tensor,
+        token_int_list: list,
+        text_list: list,
+        tokenizer=None,
+        checkpoint_frames: int = 1000,
+        align_backend: str = "python",
+    ):
+        """Token timestamps for a whole batch via one CTC forced alignment.
+
+        The probabilities are derived once from the batch log-probabilities,
+        targets are padded with ignore_id and every utterance uses its own
+        input/target length.
+
+        Args:
+            ctc_logits: (Batch, Length, Vocab) CTC log-probabilities.
+            encoder_out_lens: (Batch,) valid lengths including the 4 query frames.
+            token_int_list: decoded token ids per utterance.
+            text_list: decoded text per utterance.
+            checkpoint_frames: inputs longer than this are aligned with
+                checkpointed backpointers (interval ~sqrt(T)); 0 disables.
+            align_backend: "python" (reference) or "jit" (TorchScript-compiled
+                Viterbi recursion, used when checkpointing is off).
+
+        Returns:
+            list: [[token, start_s, end_s], ...] per utterance.
+        """
+        from itertools import groupby
+
+        # the first 4 frames are the language/event/emotion/textnorm queries
+        probs = ctc_logits[:, 4:, :].exp()
+        pred = probs.argmax(-1)
+        probs[:, :, self.blank_id].masked_fill_(pred == self.blank_id, 0)
+
+        speech_lens = (encoder_out_lens - 4).long()
+        targets = torch.nn.utils.rnn.pad_sequence(
+            [torch.LongTensor(token_int[4:]) for token_int in token_int_list],
+            batch_first=True,
+            padding_value=self.ignore_id,
+        ).to(probs.device)
+        target_lens = torch.LongTensor(
+            [max(len(token_int) - 4, 0) for token_int in token_int_list]
+        ).to(probs.device)
+        if targets.size(1) == 0:
+            targets = targets.new_full((targets.size(0), 1), self.ignore_id)
+        checkpoint_interval = 0
+        if 0 < checkpoint_frames < probs.size(1):
+            checkpoint_interval = int(probs.size(1) ** 0.5)
+
+        align = ctc_forced_align(
+            probs.float(),
+            targets,
+            speech_lens,
+            target_lens,
+            ignore_id=self.ignore_id,
+            checkpoint_interval=checkpoint_interval,
+            backend=align_backend,
+        ).tolist()
+
+        timestamp_list = []
+        for i, ts_max in enumerate(speech_lens.tolist()):
+            timestamp = []
+            tokens = tokenizer.text2tokens(text_list[i])[4:]
+            _start = 0
+            token_id = 0
+            for pred_token, pred_frame in groupby(align[i][:ts_max]):
+                _end = _start + len(list(pred_frame))
+                if pred_token != 0:
+                    ts_left = max((_start * 60 - 30) / 1000, 0)
+                    ts_right = min((_end * 60 - 30) / 1000, (ts_max * 60 - 30) / 1000)
+                    timestamp.append([tokens[token_id], ts_left, ts_right])
+                    token_id += 1
+                _start = _end
+            timestamp_list.append(timestamp)
+        return timestamp_list
+
     def inference(
         self,
         data_in,
@@ -848,23 +1527,9 @@ class SenseVoiceSmall(nn.Module):
                 speech_lengths = speech.shape[1]
         else:
             # extract fbank feats
-            time1 = time.perf_counter()
-            audio_sample_list = load_audio_text_image_video(
-                data_in,
-                fs=frontend.fs,
-                audio_fs=kwargs.get("fs", 16000),
-                data_type=kwargs.get("data_type", "sound"),
-                tokenizer=tokenizer,
-            )
-            time2 = time.perf_counter()
-            meta_data["load_data"] = f"{time2 - time1:0.3f}"
-            speech, speech_lengths = extract_fbank(
-                audio_sample_list,
-                data_type=kwargs.get("data_type", "sound"),
-                frontend=frontend,
+            speech, speech_lengths = self._extract_feats(
+                data_in, frontend, tokenizer, meta_data, **kwargs
             )
-            time3 = time.perf_counter()
-            meta_data["extract_feat"] = f"{time3 - time2:0.3f}"
             meta_data["batch_data_time"] = (
                 speech_lengths.sum().item()
                 * frontend.frame_shift
@@ -872,123 +1537,189 @@ class SenseVoiceSmall(nn.Module):
                 / 1000
             )
 
-        speech = speech.to(device=kwargs["device"])
+        # features come from the float32 frontend; follow the model precision
+        speech = speech.to(device=kwargs["device"], dtype=self.ctc.ctc_lo.weight.dtype)
         speech_lengths = speech_lengths.to(device=kwargs["device"])
 
         language = kwargs.get("language", "auto")
-        language_query = self.embed(
-            torch.LongTensor(
-                [[self.lid_dict[language] if language in self.lid_dict else 0]]
-            ).to(speech.device)
-        ).repeat(speech.size(0), 1, 1)
-
         use_itn = kwargs.get("use_itn", False)
         output_timestamp = kwargs.get("output_timestamp", False)
 
         textnorm = kwargs.get("text_norm", None)
         if textnorm is None:
             textnorm = "withitn" if use_itn else "woitn"
-        textnorm_query = self.embed(
-            torch.LongTensor([[self.textnorm_dict[textnorm]]]).to(speech.device)
-        ).repeat(speech.size(0), 1, 1)
-        speech = torch.cat((textnorm_query, speech), dim=1)
-        speech_lengths += 1
-
-        event_emo_query = self.embed(
-            torch.LongTensor([[1, 2]]).to(speech.device)
-        ).repeat(speech.size(0), 1, 1)
-        input_query = torch.cat((language_query, event_emo_query), dim=1)
-        speech = torch.cat((input_query, speech), dim=1)
-        speech_lengths += 3
-
-        # Encoder
-        encoder_out, encoder_out_lens = self.encoder(speech, speech_lengths)
-        if isinstance(encoder_out, tuple):
-            encoder_out = encoder_out[0]
-
-        # c. Passed the encoder result and the beam search
-        ctc_logits = self.ctc.log_softmax(encoder_out)
+        if self.onnx_session is not None:
+            ctc_logits, encoder_out_lens = self._forward_onnx(
+                speech, speech_lengths, language, textnorm
+            )
+        else:
+            ctc_logits, encoder_out_lens = self._forward_torch(
+                speech, speech_lengths, language, textnorm
+            )
         if kwargs.get("ban_emo_unk", False):
             ctc_logits[:, :, self.emo_dict["unk"]] = -float("inf")
 
         results = []
-        b, n, d = encoder_out.size()
+        b = ctc_logits.size(0)
         if isinstance(key[0], (list, tuple)):
             key = key[0]
         if len(key) < b:
             key = key * b
-        for i in range(b):
-            x = ctc_logits[i, : encoder_out_lens[i].item(), :]
-            yseq = x.argmax(dim=-1)
-            yseq = torch.unique_consecutive(yseq, dim=-1)
+        token_int_list = self.ctc_greedy_search(ctc_logits, encoder_out_lens)
+        # Change integer-ids to tokens
+        text_list = [tokenizer.decode(token_int) for token_int in token_int_list]
+        if output_timestamp:
+            timestamp_list = self.ctc_timestamps(
+                ctc_logits,
+                encoder_out_lens,
+                token_int_list,
+                text_list,
+                tokenizer,
+                align_backend=kwargs.get("align_backend", "python"),
+            )
 
+        for i in range(b):
             ibest_writer = None
             if kwargs.get("output_dir") is not None:
                 if not hasattr(self, "writer"):
                     self.writer = DatadirWriter(kwargs.get("output_dir"))
                 ibest_writer = self.writer[f"1best_recog"]
 
-            mask = yseq != self.blank_id
-            token_int = yseq[mask].tolist()
-
-            # Change integer-ids to tokens
-            text = tokenizer.decode(token_int)
+            text = text_list[i]
             if ibest_writer is not None:
                 ibest_writer["text"][key[i]] = text
 
             if output_timestamp:
-                from itertools import groupby
-
-                timestamp = []
-                tokens = tokenizer.text2tokens(text)[4:]
-
-                logits_speech = self.ctc.softmax(encoder_out)[
-                    i, 4 : encoder_out_lens[i].item(), :
-                ]
-
-                pred = logits_speech.argmax(-1).cpu()
-                logits_speech[pred == self.blank_id, self.blank_id] = 0
-
-                align = ctc_forced_align(
-                    logits_speech.unsqueeze(0).float(),
-                    torch.Tensor(token_int[4:])
-                    .unsqueeze(0)
-                    .long()
-                    .to(logits_speech.device),
-                    (encoder_out_lens - 4).long(),
-                    torch.tensor(len(token_int) - 4)
-                    .unsqueeze(0)
-                    .long()
-                    .to(logits_speech.device),
-                    ignore_id=self.ignore_id,
-                )
-
-                pred = groupby(align[0, : encoder_out_lens[0]])
-                _start = 0
-                token_id = 0
-                ts_max = encoder_out_lens[i] - 4
-                for pred_token, pred_frame in pred:
-                    _end = _start + len(list(pred_frame))
-                    if pred_token != 0:
-                        ts_left = max((_start * 60 - 30) / 1000, 0)
-                        ts_right = min(
-                            (_end * 60 - 30) / 1000, (ts_max * 60 - 30) / 1000
-                        )
-                        timestamp.append([tokens[token_id], ts_left, ts_right])
-                        token_id += 1
-                    _start = _end
-
-                result_i = {"key": key[i], "text": text, "timestamp": timestamp}
+                result_i = {"key": key[i], "text": text, "timestamp": timestamp_list[i]}
                 results.append(result_i)
             else:
                 result_i = {"key": key[i], "text": text}
                 results.append(result_i)
         return results, meta_data
 
-    # def export(self, **kwargs):
-    #     from export_meta import export_rebuild_model
+    def init_stream_cache(
+        self,
+        language: str = "auto",
+        use_itn: bool = False,
+        chunk_size: list = (0, 10, 5),
+        look_back: int = 8,
+        **kwargs,
+    ):
+        """Create the state of a streaming recognition session.
+
+        Args:
+            language: language code, same as inference.
+            use_itn: whether to request inverse text normalization.
+            chunk_size: [left, center, right] in LFR frames (60 ms each); every
+                encoder call commits `center` frames and looks `right` frames ahead.
+                With right >= the FSMN right padding (5 for kernel_size 11) the
+                FSMN memory of committed frames equals the offline one.
+            look_back: number of committed chunks kept as attention context,
+                -1 keeps the whole history.
+        """
+        textnorm = kwargs.get("text_norm", None)
+        if textnorm is None:
+            textnorm = "withitn" if use_itn else "woitn"
+        return {
+            "language": language,
+            "textnorm": textnorm,
+            "chunk_size": list(chunk_size),
+            "look_back": look_back,
+            "feats": None,
+            "encoder": self.encoder.init_cache(pin=4),
+            "prefix_done": False,
+            "token_int": [],
+            "last_id": None,
+            "lookahead_int": [],
+        }
+
+    def inference_chunk(
+        self,
+        speech: torch.Tensor,
+        cache: dict,
+        tokenizer=None,
+        is_final: bool = False,
+        **kwargs,
+    ):
+        """Streaming inference: feed new fbank frames and decode the committed part.
 
-    #     if "max_seq_len" not in kwargs:
-    #         kwargs["max_seq_len"] = 512
-    #     models = export_rebuild_model(model=self, **kwargs)
-    #     return models
+        Args:
+            speech: (T, D) or (1, T, D) new LFR+CMVN feature frames, may be empty.
+            cache: state from init_stream_cache, updated in place.
+            tokenizer: tokenizer used to turn token ids into text.
+            is_final: flush all buffered frames without look-ahead.
+
+        Returns:
+            dict: "text" is the hypothesis so far (committed plus look-ahead
+            tokens), "stable_text" only contains committed tokens.
+        """
+        device = kwargs.get("device", None) or next(self.parameters()).device
+        if speech is not None and speech.numel() > 0:
+            if len(speech.shape) < 3:
+                speech = speech[None, :, :]
+            speech = speech.to(device)
+            if cache["feats"] is None:
+                cache["feats"] = speech
+            else:
+                cache["feats"] = torch.cat((cache["feats"], speech), dim=1)
+
+        center, right = cache["chunk_size"][1], cache["chunk_size"][2]
+        while cache["feats"] is not None and cache["feats"].size(1) >= center + right:
+            self._forward_stream_chunk(
+                cache["feats"][:, : center + right], center, cache, **kwargs
+            )
+            cache["feats"] = cache["feats"][:, center:]
+        if is_final:
+            feats = cache["feats"]
+            if feats is None:
+                feats = torch.zeros(1, 0, self.embed.embedding_dim, device=device)
+            if feats.size(1) > 0 or not cache["prefix_done"]:
+                self._forward_stream_chunk(feats, feats.size(1), cache, **kwargs)
+            cache["feats"] = None
+            cache["lookahead_int"] = []
+
+        token_int = cache["token_int"]
+        if not is_final:
+            token_int = token_int + cache["lookahead_int"]
+        return {
+            "text": tokenizer.decode(token_int),
+            "stable_text": tokenizer.decode(cache["token_int"]),
+            "is_final": is_final,
+        }
+
+    def _forward_stream_chunk(self, feats, num_commit, cache, **kwargs):
+        """Run one encoder chunk, append committed tokens and keep look-ahead tokens."""
+        feats = feats.to(dtype=self.ctc.ctc_lo.weight.dtype)
+        if not cache["prefix_done"]:
+            query = self._query_prefix(cache["language"], cache["textnorm"], feats.device)
+            feats = torch.cat((query, feats), dim=1)
+            num_commit += 4
+            cache["prefix_done"] = True
+        chunk_size = [
+            cache["chunk_size"][0],
+            cache["chunk_size"][1],
+            feats.size(1) - num_commit,
+        ]
+        encoder_out = self.encoder.forward_chunk(
+            feats, cache["encoder"], chunk_size, cache["look_back"]
+        )
+
+        ctc_logits = self.ctc.log_softmax(encoder_out)
+        if kwargs.get("ban_emo_unk", False):
+            ctc_logits[:, :, self.emo_dict["unk"]] = -float("inf")
+        yseq = ctc_logits[0].argmax(dim=-1).tolist()
+
+        # greedy CTC: collapse repeats across chunk boundaries, then drop blanks
+        last_id = cache["last_id"]
+        for token in yseq[:num_commit]:
+            if token != last_id and token != self.blank_id:
+                cache["token_int"].append(token)
+            last_id = token
+        cache["last_id"] = last_id
+
+        lookahead_int = []
+        for token in yseq[num_commit:]:
+            if token != last_id and token != self.blank_id:
+                lookahead_int.append(token)
+            last_id = token
+        cache["lookahead_int"] = lookahead_int
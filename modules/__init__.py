@@ -3,5 +3,13 @@
 from .voice_to_text import VoiceToTextModule
 from .understanding import UnderstandingModule
 from .specialized_task import SpecializedTaskModule
+from .asr_worker_pool import ASRWorkerPool
+from .speculative_routing import SpeculativeRouter
 
-__all__ = ['VoiceToTextModule', 'UnderstandingModule', 'SpecializedTaskModule']
\ No newline at end of file
+__all__ = [
+    'VoiceToTextModule',
+    'UnderstandingModule',
+    'SpecializedTaskModule',
+    'ASRWorkerPool',
+    'SpeculativeRouter',
+]
\ No newline at end of file
@@ -0,0 +1,226 @@
+# -*- encoding: utf-8 -*-
+
+import itertools
+import threading
+import logging
+import queue
+import multiprocessing as mp
+from concurrent.futures import Future
+
+import torch
+
+from utils.threads import apply_thread_settings, parse_cpu_list
+
+logger = logging.getLogger('ASRWorkerPool')
+
+# fork 之后由子进程读取，父进程已加载的 VoiceToTextModule
+_worker_voice_to_text = None
+
+
+def _worker_loop(worker_idx, job_queue, result_queue, num_threads, cpus):
+    """子进程主循环：从自己的任务队列取出任务，调用 VoiceToTextModule 的方法，回传结果"""
+    apply_thread_settings(num_threads, cpu_affinity=cpus)
+    voice_to_text = _worker_voice_to_text
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_id, method, args, kwargs = job
+        try:
+            with torch.no_grad():
+                result = getattr(voice_to_text, method)(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"ASR 工作进程 {worker_idx} 处理任务失败: {e}", exc_info=True)
+            result = {"success": False, "error": f"ASR 工作进程处理失败: {str(e)}"}
+        result_queue.put((worker_idx, job_id, result))
+
+
+class ASRWorkerPool:
+    """多进程 ASR 工作池：在模型加载完成后 fork 出 N 个工作进程
+
+    子进程通过 fork 继承父进程中已加载的模型，权重以写时复制方式共享，
+    不会为每个进程重复加载。每个进程固定 torch 线程数，避免 N 个进程
+    同时占满全部核心。每个进程有自己的任务队列，父进程按在途任务数分发，
+    因此始终知道任务由哪个进程负责。submit 返回 concurrent.futures.Future，
+    结果格式与 VoiceToTextModule 对应方法的返回值一致。
+
+    在多线程进程中 fork 可能让子进程继承被其他线程持有的锁而死锁，因此工作池
+    应在启动 Web 服务等后台线程之前创建一次，之后重复使用（见 app_new.create_asr_pool）。
+    同理，工作进程意外退出时，分配给它的任务以 RuntimeError 结束，且不会重新 fork。
+    所有进程都退出后工作池失效，submit 抛出 RuntimeError，调用方应改为在主进程内
+    转录（见 is_available）。
+
+    Args:
+        voice_to_text: 已初始化的 VoiceToTextModule，需运行在 CPU 上
+        num_workers (int): 工作进程数
+        threads_per_worker (int): 每个工作进程的 torch intra-op 线程数
+        cpu_affinity (list or str, optional): 供工作进程使用的核心列表，按顺序
+            为每个进程划分 threads_per_worker 个核心（不足时循环复用）；
+            默认沿用 voice_to_text.cpu_affinity，均未设置时不绑定核心
+    """
+
+    def __init__(
+        self, voice_to_text, num_workers=2, threads_per_worker=1, cpu_affinity=None
+    ):
+        if voice_to_text.model is None:
+            raise RuntimeError(f"模型未初始化: {voice_to_text.init_error}")
+        if voice_to_text.device != "cpu":
+            # CUDA 上下文无法在 fork 后的子进程中使用
+            raise ValueError("ASR 工作池仅支持 device=\"cpu\"")
+        if "fork" not in mp.get_all_start_methods():
+            raise RuntimeError("当前平台不支持 fork，无法共享模型权重")
+
+        global _worker_voice_to_text
+        _worker_voice_to_text = voice_to_text
+
+        self.voice_to_text = voice_to_text
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.cpu_affinity = parse_cpu_list(cpu_affinity) or voice_to_text.cpu_affinity
+        self._ctx = mp.get_context("fork")
+        self._job_queues = [self._ctx.Queue() for _ in range(num_workers)]
+        self._result_queue = self._ctx.Queue()
+        self._futures = {}
+        # 工作进程序号 -> 分配给它、尚未完成的任务 id 集合
+        self._assigned = {i: set() for i in range(num_workers)}
+        self._dead = set()
+        self._job_ids = itertools.count()
+        # 保护 _futures、_assigned、_dead 与 stats，提交线程与收集线程都会修改
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "worker_deaths": 0}
+
+        # 在启动收集线程之前 fork，此后不再 fork
+        self._workers = [self._spawn(i) for i in range(num_workers)]
+        self._collector = threading.Thread(
+            target=self._collect, name="ASRWorkerPool-collector", daemon=True
+        )
+        self._collector.start()
+        logger.info(
+            f"ASR 工作池已启动: {num_workers} 个进程，每进程 {threads_per_worker} 线程"
+        )
+
+    def _spawn(self, worker_idx):
+        process = self._ctx.Process(
+            target=_worker_loop,
+            args=(
+                worker_idx,
+                self._job_queues[worker_idx],
+                self._result_queue,
+                self.threads_per_worker,
+                self._worker_cpus(worker_idx),
+            ),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _worker_cpus(self, worker_idx):
+        if not self.cpu_affinity:
+            return None
+        n = len(self.cpu_affinity)
+        start = worker_idx * self.threads_per_worker
+        return sorted(
+            {self.cpu_affinity[(start + i) % n] for i in range(self.threads_per_worker)}
+        )
+
+    def _resolve(self, job_id, result=None, error=None):
+        with self._lock:
+            future = self._futures.pop(job_id, None)
+            if future is None:
+                return
+            self.stats["failed" if error is not None else "completed"] += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _collect(self):
+        """后台线程：把子进程回传的结果写入 Future，并清理意外退出的进程"""
+        while not self._closed:
+            try:
+                worker_idx, job_id, result = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                self._assigned[worker_idx].discard(job_id)
+            self._resolve(job_id, result)
+            self._check_workers()
+
+    def _check_workers(self):
+        for worker_idx, process in enumerate(self._workers):
+            if self._closed or worker_idx in self._dead or process.is_alive():
+                continue
+            logger.error(
+                f"ASR 工作进程 {worker_idx} 意外退出 (exitcode={process.exitcode})，不再向其分发任务"
+            )
+            with self._lock:
+                self._dead.add(worker_idx)
+                orphaned = list(self._assigned[worker_idx])
+                self._assigned[worker_idx].clear()
+                self.stats["worker_deaths"] += 1
+            for job_id in orphaned:
+                self._resolve(
+                    job_id, error=RuntimeError("ASR 工作进程在处理任务时意外退出")
+                )
+        if not self._closed and len(self._dead) == len(self._workers):
+            logger.error("所有 ASR 工作进程均已退出，工作池失效")
+
+    def is_available(self):
+        """工作池未关闭且至少有一个工作进程存活时返回 True"""
+        return not self._closed and len(self._dead) < len(self._workers)
+
+    def submit(self, method, *args, **kwargs):
+        """提交一个任务，在工作进程中调用 VoiceToTextModule.<method>(*args, **kwargs)
+
+        Returns:
+            concurrent.futures.Future: 任务结果
+        """
+        if self._closed:
+            raise RuntimeError("ASR 工作池已关闭")
+        future = Future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            alive = [i for i in self._assigned if i not in self._dead]
+            if not alive:
+                raise RuntimeError("ASR 工作池已失效：所有工作进程均已退出")
+            # 分给在途任务最少的存活进程
+            worker_idx = min(alive, key=lambda i: len(self._assigned[i]))
+            self._assigned[worker_idx].add(job_id)
+            self._futures[job_id] = future
+            self.stats["submitted"] += 1
+        self._job_queues[worker_idx].put((job_id, method, args, kwargs))
+        return future
+
+    def transcribe(self, audio_path, language="auto"):
+        """提交一条转录任务，参数与 VoiceToTextModule.transcribe 相同"""
+        return self.submit("transcribe", audio_path, language=language)
+
+    def get_stats(self):
+        """返回累计统计与当前排队中的任务数"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["pending"] = len(self._futures)
+            stats["workers"] = len(self._workers) - len(self._dead)
+        return stats
+
+    def shutdown(self, timeout=5.0):
+        """停止所有工作进程，尚未完成的任务以 RuntimeError 结束"""
+        if self._closed:
+            return
+        self._closed = True
+        for job_queue in self._job_queues:
+            job_queue.put(None)
+        for process in self._workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        with self._lock:
+            pending = list(self._futures.items())
+            self._futures.clear()
+        for _, future in pending:
+            future.set_exception(RuntimeError("ASR 工作池已关闭"))
+        logger.info(f"ASR 工作池已关闭，统计: {self.get_stats()}")
@@ -5,16 +5,88 @@ import logging
 import json
 import time
 
+from utils.http_session import get_http_session, http_timeout, release_response
+from utils.retry_policy import get_retry_policy
+from utils.sse import iter_response_bytes, iter_sse_content
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger('SpecializedTaskModule')
 
-# --- 重试配置 ---
-MAX_RETRIES = 3
-RETRY_DELAY_SECONDS = 2
-# --- 重试配置结束 ---
+# 专业任务类型 -> 判断该类型的关键词，顺序与 task_handlers 一致
+TASK_TYPE_KEYWORDS = {
+    "代码处理": [
+        "代码",
+        "编程",
+        "程序",
+        "算法",
+        "函数",
+        "变量",
+        "类",
+        "对象",
+        "接口",
+        "API",
+        "库",
+        "框架",
+        "编译",
+        "调试",
+        "bug",
+        "错误",
+        "异常",
+        "开发",
+    ],
+    "数学问题": [
+        "数学",
+        "计算",
+        "方程",
+        "公式",
+        "数值",
+        "统计",
+        "概率",
+        "微积分",
+        "代数",
+        "几何",
+        "三角",
+        "矩阵",
+        "向量",
+        "函数式",
+        "导数",
+        "积分",
+    ],
+    "网络搜索": [
+        "搜索",
+        "查询",
+        "检索",
+        "查找",
+        "数据库",
+        "信息",
+        "资料",
+        "文献",
+        "调研",
+        "研究",
+        "探索",
+        "发现",
+    ],
+}
+GENERAL_TASK_TYPE = "通用任务"
+
+
+def count_task_keywords(text):
+    """统计文本中各任务类型出现的关键词个数（每个关键词只计一次）"""
+    return {
+        task_type: sum(1 for keyword in keywords if keyword in text)
+        for task_type, keywords in TASK_TYPE_KEYWORDS.items()
+    }
+
+
+def task_type_from_counts(counts):
+    """关键词个数严格多于其他所有类型的任务类型胜出，否则为通用任务"""
+    for task_type, count in counts.items():
+        if all(count > other for t, other in counts.items() if t != task_type):
+            return task_type
+    return GENERAL_TASK_TYPE
 
 
 class SpecializedTaskModule:
@@ -132,48 +204,65 @@ class SpecializedTaskModule:
 
             logger.debug(f"API请求: {json.dumps(payload, ensure_ascii=False)}")
 
+            policy = get_retry_policy(self.api_url)
             response = None
             last_exception = None
-            for attempt in range(MAX_RETRIES):
+            for attempt in range(policy.max_attempts):
+                if not policy.allow_request():
+                    # 熔断器打开：上游故障期间直接失败，不占用线程等待
+                    last_exception = RuntimeError(f"上游 {policy.name} 熔断中，请稍后重试")
+                    break
                 try:
-                    response = requests.post(
+                    response = get_http_session().post(
                         self.api_url,
                         headers=headers,
                         json=payload,
-                        timeout=60,
+                        timeout=http_timeout(60),
                         stream=True,
                     )
-                    if response.status_code >= 500 and response.status_code < 600:
-                        logger.warning(
-                            f"Specialized API调用收到服务器错误 {response.status_code}. 尝试次数 {attempt + 1}/{MAX_RETRIES}. 将在 {RETRY_DELAY_SECONDS} 秒后重试."
-                        )
+                    if policy.is_retryable_status(response.status_code):
+                        policy.record_failure()
                         last_exception = requests.exceptions.HTTPError(
                             f"Server Error: {response.status_code}", response=response
                         )
-                        time.sleep(RETRY_DELAY_SECONDS)  # 确保 time 已导入
+                        response.content  # 读完错误响应体，连接回到连接池
+                        delay = policy.next_delay(
+                            attempt,
+                            response.status_code,
+                            response.headers.get("Retry-After"),
+                        )
+                        if delay is None:
+                            break
+                        logger.warning(
+                            f"Specialized API调用收到可重试错误 {response.status_code}. 尝试次数 {attempt + 1}/{policy.max_attempts}. 将在 {delay:.2f} 秒后重试."
+                        )
+                        time.sleep(delay)
                         continue
 
-                    response.raise_for_status()  # 处理 4xx 等错误
-                    break  # 成功或不可重试错误
-                except requests.exceptions.Timeout as e:
-                    logger.warning(
-                        f"Specialized API请求超时. 尝试次数 {attempt + 1}/{MAX_RETRIES}. 将在 {RETRY_DELAY_SECONDS} 秒后重试."
-                    )
+                    policy.record_success()  # 4xx 也说明上游可用，只是请求本身有误
+                    response.raise_for_status()  # 4xx 等客户端错误直接抛出，不重试
+                    break  # 成功 (2xx) 或不可重试的错误，跳出循环
+                except (
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ConnectionError,
+                ) as e:
+                    policy.record_failure()
                     last_exception = e
-                    time.sleep(RETRY_DELAY_SECONDS)
-                except requests.exceptions.ConnectionError as e:
+                    delay = policy.next_delay(attempt)
+                    if delay is None:
+                        break
+                    kind = "超时" if isinstance(e, requests.exceptions.Timeout) else "连接错误"
                     logger.warning(
-                        f"Specialized API连接错误. 尝试次数 {attempt + 1}/{MAX_RETRIES}. 将在 {RETRY_DELAY_SECONDS} 秒后重试."
+                        f"Specialized API请求{kind}. 尝试次数 {attempt + 1}/{policy.max_attempts}. 将在 {delay:.2f} 秒后重试."
                     )
-                    last_exception = e
-                    time.sleep(RETRY_DELAY_SECONDS)
+                    time.sleep(delay)
                 except requests.exceptions.RequestException as e:
                     logger.error(f"Specialized API请求发生无法重试的错误: {e}")
                     last_exception = e
                     break
 
             if response is None or not response.ok:
-                error_msg = f"Specialized API调用在 {MAX_RETRIES} 次尝试后失败. 最后错误: {str(last_exception)}"
+                error_msg = f"Specialized API调用在 {attempt + 1} 次尝试后失败. 最后错误: {str(last_exception)}"
                 logger.error(error_msg)
                 if last_exception is None:
                     last_exception = Exception("未知Specialized API错误")
@@ -190,47 +279,23 @@ class SpecializedTaskModule:
 
             # 原有的成功处理逻辑
             logger.info("API调用成功，开始接收流式响应")
-            full_result_text = ""
-            for chunk in response.iter_lines():
-                if chunk:
-                    chunk_str = chunk.decode('utf-8').strip()
-                    if chunk_str.startswith('data: '):
-                        chunk_str = chunk_str[len('data: ') :]
-                    if chunk_str == "[DONE]":
-                        break
-                    try:
-                        chunk_data = json.loads(chunk_str)
-                        delta = chunk_data['choices'][0].get('delta', {})
-                        content_chunk = delta.get('content', '')
-                        if content_chunk:
-                            full_result_text += content_chunk
-                            yield {
-                                "success": True,
-                                "result_chunk": content_chunk,
-                                "is_final": False,
-                            }
-                    except json.JSONDecodeError as e:
-                        logger.error(
-                            f"无法解析Specialized API响应流中的JSON块: '{chunk_str[:100]}...'. 错误: {e}"
-                        )
-                        logger.warning(
-                            f"跳过无法解析的Specialized API响应块: {chunk_str[:100]}..."
-                        )
-                    except KeyError as e:
-                        logger.error(
-                            f"Specialized API响应JSON块结构错误: '{chunk_str[:100]}...'. 缺少键: {e}"
-                        )
-                        logger.warning(
-                            f"跳过结构错误的Specialized API响应块: {chunk_str[:100]}..."
-                        )
-                    except Exception as e:
-                        logger.error(
-                            f"处理Specialized API响应流中的块时发生未知错误: '{chunk_str[:100]}...'. 错误: {e}",
-                            exc_info=True,
-                        )
-                        logger.warning(
-                            f"跳过处理时发生未知错误的Specialized API响应块: {chunk_str[:100]}..."
-                        )
+            result_parts = []
+            completed = False
+            try:
+                for content_chunk in iter_sse_content(
+                    iter_response_bytes(response), logger
+                ):
+                    result_parts.append(content_chunk)
+                    yield {
+                        "success": True,
+                        "result_chunk": content_chunk,
+                        "is_final": False,
+                    }
+                completed = True
+            finally:
+                # 消费方中途放弃时直接断开，不等上游生成完剩余内容
+                release_response(response, drain=completed)
+            full_result_text = "".join(result_parts)
 
             # 流结束后标记
             yield {
@@ -0,0 +1,219 @@
+# -*- encoding: utf-8 -*-
+
+import queue
+import logging
+import threading
+
+from .understanding import SPECIALIZED_TASK_KEYWORDS
+from .specialized_task import (
+    GENERAL_TASK_TYPE,
+    TASK_TYPE_KEYWORDS,
+    task_type_from_counts,
+)
+
+logger = logging.getLogger('SpeculativeRouter')
+
+# 推测请求流结束的标记
+_END = object()
+
+# 全部推测路由的累计统计
+_stats = {"started": 0, "hits": 0, "cancelled": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_speculation_stats():
+    """返回推测请求的启动、命中与取消次数及命中率"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["hit_rate"] = stats["hits"] / stats["started"] if stats["started"] else 0.0
+    return stats
+
+
+class IncrementalRouteDetector:
+    """在理解模块的流式输出上增量地检测路由关键词
+
+    与 UnderstandingModule._check_if_needs_specialized_task 和
+    SenseYourVoiceApp._determine_task_type 使用同一套关键词与判定规则，但每个块只扫描
+    新到达的文本（加上可能跨块的关键词前缀），已命中的关键词不再检查。
+    是否需要专业任务一旦命中即不会改变；任务类型在领先类型的关键词数达到
+    min_hits 且领先第二名至少 min_margin 个时视为可信。
+
+    Args:
+        min_hits (int): 领先类型至少命中的关键词数
+        min_margin (int): 领先类型比第二名多出的关键词数
+    """
+
+    def __init__(self, min_hits=2, min_margin=1):
+        self.min_hits = min_hits
+        self.min_margin = min_margin
+        self.needs_specialized_task = False
+        self.counts = {task_type: 0 for task_type in TASK_TYPE_KEYWORDS}
+        self._pending = {
+            task_type: list(keywords) for task_type, keywords in TASK_TYPE_KEYWORDS.items()
+        }
+        self._overlap = (
+            max(
+                len(keyword)
+                for keywords in [SPECIALIZED_TASK_KEYWORDS, *TASK_TYPE_KEYWORDS.values()]
+                for keyword in keywords
+            )
+            - 1
+        )
+        self._tail = ""
+
+    def feed(self, chunk):
+        """喂入一个理解结果增量"""
+        if not chunk:
+            return
+        window = self._tail + chunk
+        self._tail = window[-self._overlap :] if self._overlap else ""
+        if not self.needs_specialized_task:
+            self.needs_specialized_task = any(
+                keyword in window for keyword in SPECIALIZED_TASK_KEYWORDS
+            )
+        for task_type, keywords in self._pending.items():
+            found = [keyword for keyword in keywords if keyword in window]
+            if found:
+                self.counts[task_type] += len(found)
+                self._pending[task_type] = [k for k in keywords if k not in found]
+
+    @property
+    def task_type(self):
+        """按目前为止的文本判定的任务类型"""
+        return task_type_from_counts(self.counts)
+
+    def confident_task_type(self):
+        """路由结论可信时返回任务类型，否则返回 None"""
+        if not self.needs_specialized_task:
+            return None
+        ranked = sorted(self.counts.values(), reverse=True)
+        if ranked[0] < self.min_hits or ranked[0] - ranked[1] < self.min_margin:
+            return None
+        task_type = self.task_type
+        return None if task_type == GENERAL_TASK_TYPE else task_type
+
+
+class SpeculativeSpecializedTask:
+    """在后台线程中运行 SpecializedTaskModule.process_task，结果块暂存在队列中
+
+    迭代本对象按顺序取出结果块，格式与 process_task 相同；cancel 后后台线程在
+    下一个块到达时停止，并直接断开与上游的连接。
+    """
+
+    def __init__(self, specialized_task, task_type, content):
+        self.task_type = task_type
+        self._queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(specialized_task, task_type, content),
+            name="SpeculativeSpecializedTask",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self, specialized_task, task_type, content):
+        stream = specialized_task.process_task(task_type, content)
+        try:
+            for chunk in stream:
+                if self._cancelled.is_set():
+                    break
+                self._queue.put(chunk)
+                if chunk.get("is_final") or not chunk.get("success", False):
+                    break
+        except Exception as e:
+            logger.error(f"推测专业任务请求出错: {e}", exc_info=True)
+            self._queue.put(
+                {"success": False, "error": f"专业任务处理过程发生错误: {str(e)}", "is_final": True}
+            )
+        finally:
+            stream.close()
+            self._queue.put(_END)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __iter__(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is _END:
+                return
+            yield chunk
+
+
+class SpeculativeRouter:
+    """理解结果流式输出期间提前发起专业任务请求
+
+    feed 每收到一个理解增量就更新 IncrementalRouteDetector，路由结论可信时立即在
+    后台发起专业任务请求，与理解模块的剩余输出并行。理解流结束后用 resolve 传入
+    最终判定：与推测一致时返回已在进行中的结果流，否则取消推测请求并返回 None，
+    由调用方按原流程发起请求。
+
+    推测请求发起时理解结果尚不完整，因此以用户的原始输入（content）作为
+    专业任务内容，而不是理解模块的回复。resolve 只在最终路由要发送的内容与
+    content 完全相同时才采用推测结果，调用方启用推测路由时应在最终路由中
+    同样使用 content，使命中与未命中时专业任务看到的输入一致。
+
+    Args:
+        specialized_task: SpecializedTaskModule 实例
+        content (str): 推测请求的专业任务内容
+        min_hits (int): 见 IncrementalRouteDetector
+        min_margin (int): 见 IncrementalRouteDetector
+    """
+
+    def __init__(self, specialized_task, content, min_hits=2, min_margin=1):
+        self.specialized_task = specialized_task
+        self.content = content
+        self.detector = IncrementalRouteDetector(min_hits=min_hits, min_margin=min_margin)
+        self.task = None
+        self._adopted = None
+
+    def feed(self, chunk):
+        """喂入一个理解结果增量，必要时发起推测请求"""
+        self.detector.feed(chunk)
+        if self.task is not None or self._adopted is not None:
+            return
+        task_type = self.detector.confident_task_type()
+        if task_type is not None:
+            logger.info(f"理解结果尚未结束，提前发起专业任务请求，类型: {task_type}")
+            self.task = SpeculativeSpecializedTask(
+                self.specialized_task, task_type, self.content
+            )
+            _count("started")
+
+    def resolve(self, needs_specialized_task, task_type, content=None):
+        """传入最终的路由判定与最终要发送的专业任务内容
+
+        推测请求的任务类型与内容都与最终路由一致时返回其结果流，否则取消推测请求
+        并返回 None。
+        """
+        if self.task is None:
+            return None
+        if (
+            needs_specialized_task
+            and task_type == self.task.task_type
+            and content == self.content
+        ):
+            _count("hits")
+            self._adopted, self.task = self.task, None
+            return self._adopted
+        logger.info(
+            f"最终路由（需要专业任务={needs_specialized_task}, 类型={task_type}）与推测"
+            f"（{self.task.task_type}）的类型或内容不一致，取消推测请求"
+        )
+        self.cancel()
+        return None
+
+    def cancel(self):
+        """取消推测请求；调用方中途放弃已采用的结果流时同样应调用"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+            _count("cancelled")
+        if self._adopted is not None:
+            self._adopted.cancel()
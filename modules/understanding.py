@@ -4,6 +4,17 @@ import requests
 import logging
 import json
 import time
+import asyncio
+import weakref
+
+from utils.http_session import (
+    get_http_session,
+    get_http_settings,
+    http_timeout,
+    release_response,
+)
+from utils.retry_policy import get_retry_policy
+from utils.sse import aiter_sse_content, iter_response_bytes, iter_sse_content
 
 # 设置日志
 logging.basicConfig(
@@ -11,10 +22,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger('UnderstandingModule')
 
-# --- 重试配置 ---
-MAX_RETRIES = 3
-RETRY_DELAY_SECONDS = 2
-# --- 重试配置结束 ---
+# 理解结果中出现这些关键词时转交专业任务模块处理
+SPECIALIZED_TASK_KEYWORDS = [
+    "代码",
+    "编程",
+    "程序",
+    "算法",
+    "函数",
+    "变量",
+    "类",
+    "对象",
+    "数学问题",
+    "计算",
+    "方程",
+    "公式",
+    "数值",
+    "统计",
+    "搜索",
+    "查询",
+    "检索",
+    "查找",
+    "数据库",
+    "专业分析",
+    "深度解析",
+    "技术细节",
+]
+
+# 事件循环 -> (共享的 httpx.AsyncClient, 创建时的连接池设置)；AsyncClient 不能跨事件循环使用
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_client():
+    """返回当前事件循环共享的 httpx.AsyncClient，所有异步流式会话共用一个连接池
+
+    连接池大小取自 configure_http_session 的共享设置，与同步会话一致：每个主机
+    保持 pool_maxsize 个 keep-alive 连接，超出的并发请求另建连接、用完即断开。
+    设置变化后创建新客户端；旧客户端不主动关闭，其上的流式响应可以正常读完。
+    """
+    import httpx
+
+    settings = get_http_settings()
+    pool = (settings["pool_connections"], settings["pool_maxsize"])
+    loop = asyncio.get_running_loop()
+    client, client_pool = _async_clients.get(loop, (None, None))
+    if client is None or client.is_closed or client_pool != pool:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=pool[0] * pool[1],
+            ),
+        )
+        _async_clients[loop] = (client, pool)
+    return client
+
+
+async def aclose_async_client():
+    """关闭当前事件循环的共享异步客户端，在事件循环退出前调用"""
+    client, _ = _async_clients.pop(asyncio.get_running_loop(), (None, None))
+    if client is not None:
+        await client.aclose()
 
 
 class UnderstandingModule:
@@ -38,94 +104,61 @@ class UnderstandingModule:
                 }
                 return
 
-            system_prompt = """你是一个友善、耐心的语音内容分析助手！我叫小智，很高兴为您服务。✨
-
-我的主要任务是：
-🎯 仔细分析您提供的语音转文字内容
-💬 根据您的问题提供贴心、详细的分析和解答
-🔗 保持对话的自然连贯，就像朋友间的交流一样
-
-我会用亲切、易懂的语言与您对话，并尽量让我的回答既专业又温暖。如果有什么不清楚的地方，请随时告诉我，我会很乐意为您详细解释！
-
-请注意：虽然我很乐意帮助您，但我只能专注于分析语音内容相关的问题。如果您想聊其他话题，我会礼貌地引导您回到语音分析的主题上来，希望您能理解～ 🥰"""
-            messages = [{"role": "system", "content": system_prompt}]
-
-            if context:
-                logger.info("添加对话历史上下文")
-                messages.append(
-                    {"role": "user", "content": f"以下是之前的对话历史:\n{context}"}
-                )
-                messages.append(
-                    {
-                        "role": "assistant",
-                        "content": "好的，我已经了解了我们之前的对话内容，有什么新的问题需要我帮助您分析吗？😊",
-                    }
-                )
-
-            messages.append({"role": "user", "content": text})
-
-            logger.info(f"准备调用API分析文本，文本长度: {len(text)}字符")
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "Accept": "text/event-stream",
-            }
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "stream": True,  # 启用流式输出
-            }
-
-            if llm_params:
-                valid_llm_params = {
-                    k: v for k, v in llm_params.items() if v is not None
-                }
-                if 'stop' in valid_llm_params and not valid_llm_params['stop']:
-                    del valid_llm_params['stop']
-                payload.update(valid_llm_params)
-                logger.info(f"使用自定义LLM参数: {valid_llm_params}")
-            else:
-                payload["temperature"] = 0.7
-                logger.info("使用默认LLM参数")
-
-            logger.debug(f"API请求: {json.dumps(payload, ensure_ascii=False)}")
+            headers, payload = self._build_request(text, context, llm_params)
 
+            policy = get_retry_policy(self.api_url)
             response = None
             last_exception = None
-            for attempt in range(MAX_RETRIES):
+            for attempt in range(policy.max_attempts):
+                if not policy.allow_request():
+                    # 熔断器打开：上游故障期间直接失败，不占用线程等待
+                    last_exception = RuntimeError(f"上游 {policy.name} 熔断中，请稍后重试")
+                    break
                 try:
-                    response = requests.post(
+                    response = get_http_session().post(
                         self.api_url,
                         headers=headers,
                         json=payload,
-                        timeout=30,
+                        timeout=http_timeout(30),
                         stream=True,
                     )
-                    # 检查是否是可重试的服务器错误
-                    if response.status_code >= 500 and response.status_code < 600:
-                        logger.warning(
-                            f"API调用收到服务器错误 {response.status_code}. 尝试次数 {attempt + 1}/{MAX_RETRIES}. 将在 {RETRY_DELAY_SECONDS} 秒后重试."
-                        )
+                    # 检查是否是可重试的错误（限流、网关错误、服务暂不可用）
+                    if policy.is_retryable_status(response.status_code):
+                        policy.record_failure()
                         last_exception = requests.exceptions.HTTPError(
                             f"Server Error: {response.status_code}", response=response
                         )
-                        time.sleep(RETRY_DELAY_SECONDS)  # 导入 time 模块
-                        continue  # 继续下一次尝试
+                        response.content  # 读完错误响应体，连接回到连接池
+                        delay = policy.next_delay(
+                            attempt,
+                            response.status_code,
+                            response.headers.get("Retry-After"),
+                        )
+                        if delay is None:
+                            break
+                        logger.warning(
+                            f"API调用收到可重试错误 {response.status_code}. 尝试次数 {attempt + 1}/{policy.max_attempts}. 将在 {delay:.2f} 秒后重试."
+                        )
+                        time.sleep(delay)
+                        continue
 
-                    response.raise_for_status()  # 对于4xx等客户端错误，会直接抛出异常，不会重试
-                    break  # 如果成功 (2xx) 或遇到不可重试的错误 (如4xx)，则跳出循环
-                except requests.exceptions.Timeout as e:
-                    logger.warning(
-                        f"API请求超时. 尝试次数 {attempt + 1}/{MAX_RETRIES}. 将在 {RETRY_DELAY_SECONDS} 秒后重试."
-                    )
+                    policy.record_success()  # 4xx 也说明上游可用，只是请求本身有误
+                    response.raise_for_status()  # 4xx 等客户端错误直接抛出，不重试
+                    break  # 成功 (2xx) 或不可重试的错误，跳出循环
+                except (
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ConnectionError,
+                ) as e:
+                    policy.record_failure()
                     last_exception = e
-                    time.sleep(RETRY_DELAY_SECONDS)
-                except requests.exceptions.ConnectionError as e:
+                    delay = policy.next_delay(attempt)
+                    if delay is None:
+                        break
+                    kind = "超时" if isinstance(e, requests.exceptions.Timeout) else "连接错误"
                     logger.warning(
-                        f"API连接错误. 尝试次数 {attempt + 1}/{MAX_RETRIES}. 将在 {RETRY_DELAY_SECONDS} 秒后重试."
+                        f"API请求{kind}. 尝试次数 {attempt + 1}/{policy.max_attempts}. 将在 {delay:.2f} 秒后重试."
                     )
-                    last_exception = e
-                    time.sleep(RETRY_DELAY_SECONDS)
+                    time.sleep(delay)
                 except requests.exceptions.RequestException as e:  # 更通用的请求异常
                     logger.error(f"API请求发生无法重试的错误: {e}")
                     last_exception = e  # 记录异常，但可能不重试，除非它是HTTPError且被上面的5xx逻辑捕获
@@ -136,7 +169,7 @@ class UnderstandingModule:
             if (
                 response is None or not response.ok
             ):  # 如果所有尝试都失败了，或者最后一次尝试失败
-                error_msg = f"API调用在 {MAX_RETRIES} 次尝试后失败. 最后错误: {str(last_exception)}"
+                error_msg = f"API调用在 {attempt + 1} 次尝试后失败. 最后错误: {str(last_exception)}"
                 logger.error(error_msg)
                 # 确保 last_exception 不是 None，如果循环从未成功进入过 try 块的 response 部分
                 if last_exception is None:
@@ -155,52 +188,24 @@ class UnderstandingModule:
 
             # 原有的成功处理逻辑 (response.status_code == 200)
             logger.info("API调用成功，开始接收流式响应")
-            full_response_text = ""
-            for chunk in response.iter_lines():
-                if chunk:
-                    chunk_str = chunk.decode('utf-8').strip()
-                    if chunk_str.startswith('data: '):
-                        chunk_str = chunk_str[len('data: ') :]
-                    if chunk_str == "[DONE]":
-                        break
-                    try:
-                        chunk_data = json.loads(chunk_str)
-                        delta = chunk_data['choices'][0].get('delta', {})
-                        content_chunk = delta.get('content', '')
-                        if content_chunk:
-                            full_response_text += content_chunk
-                            yield {
-                                "success": True,
-                                "response_chunk": content_chunk,
-                                "needs_specialized_task": False,
-                                "is_final": False,
-                            }
-                    except json.JSONDecodeError as e:
-                        logger.error(
-                            f"无法解析API响应流中的JSON块: '{chunk_str[:100]}...'. 错误: {e}"
-                        )  # 记录部分块内容
-                        # 决定是否要因为单个块解析失败而终止整个流，或者只是跳过这个坏块
-                        # 当前选择: 跳过这个损坏的块，并记录警告，而不是完全失败。
-                        # 如果一个损坏的块意味着整个响应不可信，则应该 yield 一个错误并 return/break。
-                        logger.warning(f"跳过无法解析的API响应块: {chunk_str[:100]}...")
-                        # continue # 如果选择跳过并继续处理流中其他块
-                    except (
-                        KeyError
-                    ) as e:  # 如果 chunk_data 结构不符合预期 (例如缺少 'choices')
-                        logger.error(
-                            f"API响应JSON块结构错误: '{chunk_str[:100]}...'. 缺少键: {e}"
-                        )
-                        logger.warning(f"跳过结构错误的API响应块: {chunk_str[:100]}...")
-                        # continue
-                    except Exception as e:  # 捕获其他在块处理中可能发生的未知错误
-                        logger.error(
-                            f"处理API响应流中的块时发生未知错误: '{chunk_str[:100]}...'. 错误: {e}",
-                            exc_info=True,
-                        )
-                        logger.warning(
-                            f"跳过处理时发生未知错误的API响应块: {chunk_str[:100]}..."
-                        )
-                        # continue
+            response_parts = []
+            completed = False
+            try:
+                for content_chunk in iter_sse_content(
+                    iter_response_bytes(response), logger
+                ):
+                    response_parts.append(content_chunk)
+                    yield {
+                        "success": True,
+                        "response_chunk": content_chunk,
+                        "needs_specialized_task": False,
+                        "is_final": False,
+                    }
+                completed = True
+            finally:
+                # 消费方中途放弃时直接断开，不等上游生成完剩余内容
+                release_response(response, drain=completed)
+            full_response_text = "".join(response_parts)
 
             # 流结束后，进行最终判断
             needs_specialized = self._check_if_needs_specialized_task(
@@ -233,33 +238,191 @@ class UnderstandingModule:
             logger.error(error_msg)
             yield {"success": False, "error": error_msg, "is_final": True}
 
+    async def analyze_async(self, text, context="", llm_params=None):
+        """analyze 的 asyncio 版本，以异步生成器产出与 analyze 相同格式的块字典
+
+        所有会话共用当前事件循环的 httpx.AsyncClient 连接池，等待 LLM 响应时
+        不占用线程，一个事件循环即可承载大量并发的流式对话。
+        """
+        import httpx
+
+        try:
+            if not self.api_url or not self.api_key:
+                logger.warning("未配置API，返回模拟响应流")
+                yield {
+                    "success": True,
+                    "response_chunk": f"模拟分析结果: 已收到文本，长度为{len(text)}字符。请配置真实的LLM API以获取实际分析结果。",
+                    "needs_specialized_task": False,
+                    "is_final": True,
+                }
+                return
+
+            headers, payload = self._build_request(text, context, llm_params)
+            client = _get_async_client()
+            connect_timeout, read_timeout = http_timeout(30)
+            timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+            policy = get_retry_policy(self.api_url)
+            last_exception = None
+            for attempt in range(policy.max_attempts):
+                if not policy.allow_request():
+                    # 熔断器打开：上游故障期间直接失败
+                    last_exception = f"上游 {policy.name} 熔断中，请稍后重试"
+                    break
+                streamed = False
+                retry_delay = None
+                try:
+                    async with client.stream(
+                        "POST", self.api_url, headers=headers, json=payload, timeout=timeout
+                    ) as response:
+                        # 检查是否是可重试的错误（限流、网关错误、服务暂不可用）
+                        if policy.is_retryable_status(response.status_code):
+                            policy.record_failure()
+                            last_exception = f"Server Error: {response.status_code}"
+                            delay = policy.next_delay(
+                                attempt,
+                                response.status_code,
+                                response.headers.get("Retry-After"),
+                            )
+                            if delay is None:
+                                break
+                            logger.warning(
+                                f"API调用收到可重试错误 {response.status_code}. 尝试次数 {attempt + 1}/{policy.max_attempts}. 将在 {delay:.2f} 秒后重试."
+                            )
+                            await response.aread()  # 读完错误响应体，连接回到连接池
+                            retry_delay = delay
+                        else:
+                            policy.record_success()
+                            if response.status_code >= 400:
+                                # 4xx 等客户端错误不重试
+                                body = (await response.aread()).decode("utf-8", "replace")
+                                error_msg = f"API调用失败: {response.status_code} - {body}"
+                                logger.error(error_msg)
+                                yield {"success": False, "error": error_msg, "is_final": True}
+                                return
+
+                            logger.info("API调用成功，开始接收流式响应")
+                            response_parts = []
+                            async for content_chunk in aiter_sse_content(
+                                response.aiter_bytes(), logger
+                            ):
+                                streamed = True
+                                response_parts.append(content_chunk)
+                                yield {
+                                    "success": True,
+                                    "response_chunk": content_chunk,
+                                    "needs_specialized_task": False,
+                                    "is_final": False,
+                                }
+
+                    if retry_delay is not None:
+                        # 退出 stream 上下文后再等待，退避期间不占用连接
+                        await asyncio.sleep(retry_delay)
+                        continue
+
+                    full_response_text = "".join(response_parts)
+                    # 流结束后，进行最终判断
+                    needs_specialized = self._check_if_needs_specialized_task(
+                        full_response_text
+                    )
+                    if needs_specialized:
+                        logger.info("检测到需要专业任务处理")
+                    yield {
+                        "success": True,
+                        "response_chunk": None,  # 标记流结束
+                        "needs_specialized_task": needs_specialized,
+                        "is_final": True,
+                        "full_response": full_response_text,
+                    }
+                    return
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if streamed:
+                        # 已经输出过部分内容，重试会重复输出，直接报错
+                        error_msg = f"API流式响应中断: {str(e)}"
+                        logger.error(error_msg)
+                        yield {"success": False, "error": error_msg, "is_final": True}
+                        return
+                    policy.record_failure()
+                    last_exception = e
+                    delay = policy.next_delay(attempt)
+                    if delay is None:
+                        break
+                    logger.warning(
+                        f"API请求超时或连接错误. 尝试次数 {attempt + 1}/{policy.max_attempts}. 将在 {delay:.2f} 秒后重试."
+                    )
+                    await asyncio.sleep(delay)
+                except httpx.HTTPError as e:
+                    logger.error(f"API请求发生无法重试的错误: {e}")
+                    last_exception = e
+                    break
+
+            error_msg = f"API调用在 {attempt + 1} 次尝试后失败. 最后错误: {str(last_exception)}"
+            logger.error(error_msg)
+            yield {"success": False, "error": error_msg, "is_final": True}
+        except Exception as e:
+            error_msg = f"分析过程发生错误: {str(e)}"
+            logger.error(error_msg)
+            yield {"success": False, "error": error_msg, "is_final": True}
+
+    def _build_request(self, text, context="", llm_params=None):
+        """构造 chat/completions 流式请求的请求头与请求体，analyze 与 analyze_async 共用"""
+        system_prompt = """你是一个友善、耐心的语音内容分析助手！我叫小智，很高兴为您服务。✨
+
+我的主要任务是：
+🎯 仔细分析您提供的语音转文字内容
+💬 根据您的问题提供贴心、详细的分析和解答
+🔗 保持对话的自然连贯，就像朋友间的交流一样
+
+我会用亲切、易懂的语言与您对话，并尽量让我的回答既专业又温暖。如果有什么不清楚的地方，请随时告诉我，我会很乐意为您详细解释！
+
+请注意：虽然我很乐意帮助您，但我只能专注于分析语音内容相关的问题。如果您想聊其他话题，我会礼貌地引导您回到语音分析的主题上来，希望您能理解～ 🥰"""
+        messages = [{"role": "system", "content": system_prompt}]
+
+        if context:
+            logger.info("添加对话历史上下文")
+            messages.append(
+                {"role": "user", "content": f"以下是之前的对话历史:\n{context}"}
+            )
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": "好的，我已经了解了我们之前的对话内容，有什么新的问题需要我帮助您分析吗？😊",
+                }
+            )
+
+        messages.append({"role": "user", "content": text})
+
+        logger.info(f"准备调用API分析文本，文本长度: {len(text)}字符")
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+        }
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,  # 启用流式输出
+        }
+
+        if llm_params:
+            valid_llm_params = {
+                k: v for k, v in llm_params.items() if v is not None
+            }
+            if 'stop' in valid_llm_params and not valid_llm_params['stop']:
+                del valid_llm_params['stop']
+            payload.update(valid_llm_params)
+            logger.info(f"使用自定义LLM参数: {valid_llm_params}")
+        else:
+            payload["temperature"] = 0.7
+            logger.info("使用默认LLM参数")
+
+        logger.debug(f"API请求: {json.dumps(payload, ensure_ascii=False)}")
+
+        return headers, payload
+
     def _check_if_needs_specialized_task(self, response):
         """检查是否需要专业任务处理"""
-        keywords = [
-            "代码",
-            "编程",
-            "程序",
-            "算法",
-            "函数",
-            "变量",
-            "类",
-            "对象",
-            "数学问题",
-            "计算",
-            "方程",
-            "公式",
-            "数值",
-            "统计",
-            "搜索",
-            "查询",
-            "检索",
-            "查找",
-            "数据库",
-            "专业分析",
-            "深度解析",
-            "技术细节",
-        ]
-        for keyword in keywords:
+        for keyword in SPECIALIZED_TASK_KEYWORDS:
             if keyword in response:
                 logger.debug(f"检测到专业任务关键词: {keyword}")
                 return True
@@ -2,11 +2,29 @@
 
 import os
 import sys
+import time
 import torch
 import logging
 import numpy as np
 from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
+from funasr.utils.load_utils import load_audio_text_image_video, extract_fbank
+from utils.batch_scheduler import LengthBucketScheduler
+from utils.online_frontend import OnlineFbankExtractor, StreamingResampler
+from utils.quantization import (
+    QUANTIZED_CACHE_PREFIX,
+    quantize_encoder,
+    quantized_cache_path,
+)
+from utils.checkpoint import (
+    checkpoint_file,
+    checkpoint_fingerprint,
+    remove_stale_artifacts,
+)
+from utils.onnx_backend import create_onnx_session
+from utils.threads import apply_thread_settings, parse_cpu_list
+from utils.transcription_cache import TranscriptionCache
+from utils.feature_cache import AudioFeatureCache
 
 # 设置日志
 logging.basicConfig(
@@ -20,15 +38,82 @@ class VoiceToTextModule:
         self,
         model_dir="iic/SenseVoiceSmall",
         device="cuda:0" if torch.cuda.is_available() else "cpu",
+        batch_max_frames=1000,
+        batch_max_padding_ratio=0.2,
+        attention_backend="eager",
+        dtype="float32",
+        quantize=None,
+        backend="torch",
+        onnx_intra_op_threads=0,
+        onnx_inter_op_threads=0,
+        intra_op_threads=None,
+        inter_op_threads=None,
+        cpu_affinity=None,
+        transcription_cache_dir=None,
+        transcription_cache_size=500,
+        feature_cache_mb=0,
     ):
         self.model_dir = model_dir
         self.device = device
+        # 推理精度："float32"、"bfloat16" 或 "float16"。低精度时整个 SenseVoiceSmall
+        # 以该精度运行，VAD 模型与 fbank 前端仍为 float32
+        if dtype not in ("float32", "bfloat16", "float16"):
+            raise ValueError(f"不支持的推理精度: {dtype}")
+        self.dtype = dtype
+        # 量化模式：None 或 "int8"。int8 对编码器的 Linear 层做动态量化，仅支持
+        # float32 的 CPU 推理，量化结果缓存在模型目录下，后续启动直接加载
+        if quantize not in (None, "int8"):
+            raise ValueError(f"不支持的量化模式: {quantize}")
+        if quantize is not None and (device != "cpu" or dtype != "float32"):
+            raise ValueError("int8 量化仅支持 device=\"cpu\" 且 dtype=\"float32\"")
+        self.quantize = quantize
+        # 编码器 + CTC 的推理后端："torch" 或 "onnx"。onnx 在首次使用时把图导出到
+        # 模型目录，再由 onnxruntime 的 CPU 执行器运行；VAD、前端与解码仍走 torch
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"不支持的推理后端: {backend}")
+        if backend == "onnx" and (dtype != "float32" or quantize is not None):
+            raise ValueError("onnx 后端仅支持 dtype=\"float32\" 且不做 int8 量化")
+        self.backend = backend
+        self.onnx_intra_op_threads = onnx_intra_op_threads
+        self.onnx_inter_op_threads = onnx_inter_op_threads
+        # torch 线程数与 CPU 亲和性，None 表示使用默认值；同一主机运行多个实例时
+        # 应为每个实例分配互不重叠的核心，避免线程超额订阅
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.cpu_affinity = parse_cpu_list(cpu_affinity)
+        # 转录结果缓存：以解码后 PCM 的内容哈希为键，重复上传的音频直接返回结果；
+        # transcription_cache_dir 为空（None 或 ""）时不启用
+        self.transcription_cache = (
+            TranscriptionCache(transcription_cache_dir, transcription_cache_size)
+            if transcription_cache_dir
+            else None
+        )
+        # 解码后 PCM 与 fbank 特征的内存缓存（MB），同一音频切换语言/ITN 重新
+        # 识别时跳过前端；0 表示不启用
+        self.feature_cache = (
+            AudioFeatureCache(int(feature_cache_mb * 1024 * 1024))
+            if feature_cache_mb
+            else None
+        )
+        # 参与缓存键计算，换模型或改变推理方式后不会命中旧结果；
+        # 模型加载后还会追加权重文件标识，见 initialize_model
+        self.model_version = f"{model_dir}|{dtype}|{quantize}|{backend}"
+        # 编码器自注意力实现："eager" 为显式计算注意力矩阵，
+        # "sdpa" 使用 scaled_dot_product_attention，长音频批次的峰值内存更低
+        self.attention_backend = attention_backend
         self.model = None
         self.init_error = None
+        # 批量转录的组批调度器，1000 帧约对应补零后 60 秒音频
+        self.batch_scheduler = LengthBucketScheduler(
+            max_frames=batch_max_frames, max_padding_ratio=batch_max_padding_ratio
+        )
         self.initialize_model()
 
     def initialize_model(self):
         try:
+            apply_thread_settings(
+                self.intra_op_threads, self.inter_op_threads, self.cpu_affinity
+            )
             self.model = AutoModel(
                 model=self.model_dir,
                 trust_remote_code=True,
@@ -37,7 +122,37 @@ class VoiceToTextModule:
                 vad_kwargs={"max_single_segment_time": 30000},
                 device=self.device,
             )
-            logger.info(f"语音转文字模块初始化成功，使用设备: {self.device}")
+            self.model.model.encoder.set_attention_backend(self.attention_backend)
+            # 同一目录下的权重被替换或微调后，旧的转录缓存不再命中
+            model_path = self.model.kwargs.get("model_path", self.model_dir)
+            weights = checkpoint_fingerprint(
+                checkpoint_file(model_path, self.model.kwargs.get("init_param"))
+            )
+            self.model_version = (
+                f"{self.model_dir}|{self.dtype}|{self.quantize}|{self.backend}|{weights}"
+            )
+            if self.dtype != "float32":
+                self.model.model.to(getattr(torch, self.dtype))
+            if self.quantize == "int8":
+                self._quantize_encoder()
+            self.model.model.set_feature_cache(self.feature_cache)
+            if self.backend == "onnx":
+                self.model.model.set_onnx_session(
+                    create_onnx_session(
+                        self.model.model,
+                        model_path,
+                        self.onnx_intra_op_threads,
+                        self.onnx_inter_op_threads,
+                        init_param=self.model.kwargs.get("init_param"),
+                    )
+                )
+            logger.info(
+                f"语音转文字模块初始化成功，使用设备: {self.device}，"
+                f"注意力实现: {self.attention_backend}，推理精度: {self.dtype}，"
+                f"量化模式: {self.quantize}，推理后端: {self.backend}，"
+                f"intra-op 线程: {torch.get_num_threads()}，"
+                f"inter-op 线程: {torch.get_num_interop_threads()}"
+            )
         except FileNotFoundError as e:
             error_msg = f"模型文件或其依赖项缺失: {self.model_dir}. 错误: {e}"
             logger.error(error_msg)
@@ -55,6 +170,26 @@ class VoiceToTextModule:
             logger.error(error_msg, exc_info=True)
             self.init_error = error_msg
 
+    def _quantize_encoder(self):
+        """对编码器做动态 int8 量化，优先从模型目录下的缓存文件加载"""
+        model_path = self.model.kwargs.get("model_path", self.model_dir)
+        cache_path = quantized_cache_path(
+            model_path, self.model.kwargs.get("init_param")
+        )
+        start = time.perf_counter()
+        self.model.model.encoder, hit = quantize_encoder(
+            self.model.model.encoder, cache_path
+        )
+        if not hit:
+            # 权重或 torch 版本变化后，旧的量化缓存不会再被使用
+            remove_stale_artifacts(
+                os.path.join(model_path, f"{QUANTIZED_CACHE_PREFIX}*.pt"), cache_path
+            )
+        logger.info(
+            f"编码器 int8 量化完成 ({'读取缓存' if hit else '重新量化'})，"
+            f"耗时 {time.perf_counter() - start:.2f}s，缓存文件: {cache_path}"
+        )
+
     emoji_dict = {
         "<|nospeech|><|Event_UNK|>": "❓",
         "<|zh|>": "",
@@ -173,12 +308,95 @@ class VoiceToTextModule:
         new_s = new_s.replace("The.", " ")
         return new_s.strip()
 
-    def transcribe(self, audio_path, language="auto"):
+    def _prepare_input(self, audio_path):
+        """将不同类型的音频输入整理为模型可接受的输入
+
+        Args:
+            audio_path: 音频文件路径，或来自麦克风的 (采样率, 音频数据) 元组
+
+        Returns:
+            tuple: (input_data, error)，出错时 input_data 为 None，error 为错误结果字典
+        """
+        # 处理不同类型的输入，与webui.py保持一致
+        if isinstance(audio_path, str):
+            if not os.path.exists(audio_path):
+                return None, {"success": False, "error": f"音频文件不存在: {audio_path}"}
+            return audio_path, None
+        elif isinstance(audio_path, tuple):
+            # 处理来自麦克风的输入，格式为(采样率, 音频数据)
+            fs, audio_data = audio_path
+            audio_data = self._mic_samples(audio_data)
+            if fs != 16000:
+                logger.info(f"重采样音频从 {fs}Hz 到 16000Hz")
+                try:
+                    import torchaudio
+
+                    resampler = torchaudio.transforms.Resample(fs, 16000)
+                    audio_data_t = torch.from_numpy(audio_data).to(torch.float32)
+                    audio_data = resampler(audio_data_t[None, :])[0, :].numpy()
+                except ImportError:
+                    logger.error("torchaudio 未安装，无法进行音频重采样。")
+                    return None, {
+                        "success": False,
+                        "error": "需要安装torchaudio以支持音频重采样",
+                    }
+                except Exception as e:
+                    logger.error(f"音频重采样失败: {e}", exc_info=True)
+                    return None, {"success": False, "error": f"音频重采样失败: {str(e)}"}
+            return audio_data, None
+        else:
+            return None, {
+                "success": False,
+                "error": f"不支持的音频输入类型: {type(audio_path)}",
+            }
+
+    @staticmethod
+    def _mic_samples(audio_data):
+        """把麦克风的 int16 音频数据转为 [-1, 1] 的单声道浮点波形"""
+        audio_data = audio_data.astype(np.float32) / np.iinfo(np.int16).max
+        if len(audio_data.shape) > 1:
+            audio_data = audio_data.mean(-1)  # 转为单声道
+        return audio_data
+
+    def _load_audio(self, input_data):
+        """把输入解码为 16kHz 波形，启用 feature_cache 时复用已解码的文件"""
+        fs = self.model.kwargs["frontend"].fs
+        audio_id = None
+        if self.feature_cache is not None and isinstance(input_data, str):
+            audio_id = self.feature_cache.identify(input_data)
+        # 键的格式与 SenseVoiceSmall._extract_feats 一致，两处共用解码结果
+        key = ("pcm", audio_id, fs, 16000)
+        if audio_id is not None:
+            waveform = self.feature_cache.get(key)
+            if waveform is not None:
+                return waveform
+        waveform = load_audio_text_image_video(input_data, fs=fs)
+        if audio_id is not None:
+            self.feature_cache.put(key, waveform)
+        return waveform
+
+    def _format_result(self, raw_text):
+        """由模型输出的原始文本构造转录结果字典"""
+        # 使用rich_transcription_postprocess处理文本
+        basic_text = rich_transcription_postprocess(raw_text)
+
+        # 使用format_str_v3进一步格式化文本，添加表情符号和事件标记
+        formatted_text = self.format_str_v3(raw_text)
+
+        return {
+            "success": True,
+            "text": formatted_text,
+            "raw_text": raw_text,
+            "basic_text": basic_text,
+        }
+
+    def transcribe(self, audio_path, language="auto", use_itn=True):
         """将音频转换为文本
 
         Args:
             audio_path: 音频文件路径或音频数据
             language: 语言代码，可选值："auto", "zh", "en", "yue", "ja", "ko", "nospeech"
+            use_itn: 是否做逆文本正则化（输出标点与阿拉伯数字）
 
         Returns:
             dict: 包含转录结果或错误信息的字典
@@ -189,46 +407,37 @@ class VoiceToTextModule:
                 error_msg = getattr(self, 'init_error', '未知错误')
                 return {"success": False, "error": f"模型未初始化: {error_msg}"}
 
-            # 处理不同类型的输入，与webui.py保持一致
-            if isinstance(audio_path, str):
-                if not os.path.exists(audio_path):
-                    return {"success": False, "error": f"音频文件不存在: {audio_path}"}
-                input_data = audio_path
-            elif isinstance(audio_path, tuple):
-                # 处理来自麦克风的输入，格式为(采样率, 音频数据)
-                fs, audio_data = audio_path
-                audio_data = audio_data.astype(np.float32) / np.iinfo(np.int16).max
-                if len(audio_data.shape) > 1:
-                    audio_data = audio_data.mean(-1)  # 转为单声道
-                if fs != 16000:
-                    logger.info(f"重采样音频从 {fs}Hz 到 16000Hz")
-                    try:
-                        import torchaudio
-
-                        resampler = torchaudio.transforms.Resample(fs, 16000)
-                        audio_data_t = torch.from_numpy(audio_data).to(torch.float32)
-                        audio_data = resampler(audio_data_t[None, :])[0, :].numpy()
-                    except ImportError:
-                        logger.error("torchaudio 未安装，无法进行音频重采样。")
-                        return {
-                            "success": False,
-                            "error": "需要安装torchaudio以支持音频重采样",
-                        }
-                    except Exception as e:
-                        logger.error(f"音频重采样失败: {e}", exc_info=True)
-                        return {"success": False, "error": f"音频重采样失败: {str(e)}"}
-                input_data = audio_data
-            else:
-                return {
-                    "success": False,
-                    "error": f"不支持的音频输入类型: {type(audio_path)}",
-                }
+            input_data, error = self._prepare_input(audio_path)
+            if error:
+                return error
+
+            if isinstance(input_data, str) and (
+                self.transcription_cache is not None or self.feature_cache is not None
+            ):
+                # 在 VAD 之前解码：generate 内的 VAD 会自行解码文件，模型侧的
+                # feature_cache 只能看到切分后的片段，命中不了文件的解码结果。
+                # 哈希、VAD 与推理共用同一份 PCM
+                input_data = self._load_audio(input_data)
+                if isinstance(input_data, torch.Tensor):
+                    input_data = input_data.numpy()
+
+            cache_key = None
+            if self.transcription_cache is not None:
+                cache_key = self.transcription_cache.make_key(
+                    input_data,
+                    language=language,
+                    use_itn=use_itn,
+                    model_version=self.model_version,
+                )
+                cached = self.transcription_cache.get(cache_key)
+                if cached is not None:
+                    return cached
 
             res = self.model.generate(
                 input=input_data,
                 cache={},
                 language=language,  # "zh", "en", "yue", "ja", "ko", "nospeech"
-                use_itn=True,
+                use_itn=use_itn,
                 batch_size_s=60,
                 merge_vad=True,
                 merge_length_s=15,
@@ -240,18 +449,10 @@ class VoiceToTextModule:
             # 获取原始文本
             raw_text = res[0]["text"]
 
-            # 使用rich_transcription_postprocess处理文本
-            basic_text = rich_transcription_postprocess(raw_text)
-
-            # 使用format_str_v3进一步格式化文本，添加表情符号和事件标记
-            formatted_text = self.format_str_v3(raw_text)
-
-            return {
-                "success": True,
-                "text": formatted_text,
-                "raw_text": raw_text,
-                "basic_text": basic_text,
-            }
+            result = self._format_result(raw_text)
+            if cache_key is not None:
+                self.transcription_cache.put(cache_key, result)
+            return result
         except RuntimeError as e:
             logger.error(
                 f"FunASR 模型推理 (generate) 时发生运行时错误: {str(e)}", exc_info=True
@@ -260,3 +461,267 @@ class VoiceToTextModule:
         except Exception as e:
             logger.error(f"转录过程发生未知错误: {str(e)}", exc_info=True)
             return {"success": False, "error": f"转录过程发生未知错误: {str(e)}"}
+
+    def transcribe_batch(
+        self,
+        audio_list,
+        language="auto",
+        max_segment_s=30,
+        output_timestamp=False,
+        use_itn=True,
+    ):
+        """批量将多段音频转换为文本
+
+        先为每条音频提取 fbank 特征，再由 batch_scheduler 按帧长分桶组成补零
+        批次，直接送入 SenseVoiceSmall.inference 做一次前向，避免逐条调用
+        generate 的开销。超过 max_segment_s 的长音频仍走 transcribe 的 VAD 切分流程。
+
+        Args:
+            audio_list: 音频文件路径或 (采样率, 音频数据) 元组组成的列表
+            language: 语言代码，同 transcribe
+            max_segment_s: 直接批量推理的单条音频时长上限（秒）
+            output_timestamp: 是否输出字级时间戳。为 True 时每个批次只做一次
+                CTC 强制对齐，结果中增加 "timestamp" 字段，格式为
+                [[token, 开始秒, 结束秒], ...]；走 VAD 切分的长音频不含该字段
+            use_itn: 是否做逆文本正则化，同 transcribe
+
+        Returns:
+            list: 与输入顺序一致的结果字典列表，每项格式同 transcribe 的返回值
+        """
+        results = [None] * len(audio_list)
+        if self.model is None:
+            error_msg = getattr(self, 'init_error', '未知错误')
+            return [
+                {"success": False, "error": f"模型未初始化: {error_msg}"}
+                for _ in audio_list
+            ]
+
+        # 解码所有输入为 16kHz 波形并提取 fbank，帧长用于分桶
+        frontend = self.model.kwargs["frontend"]
+        indices, feats = [], []
+        for idx, audio_path in enumerate(audio_list):
+            input_data, error = self._prepare_input(audio_path)
+            if error:
+                results[idx] = error
+                continue
+            try:
+                waveform = self._load_audio(input_data)
+                if len(waveform) / frontend.fs > max_segment_s:
+                    # 长音频需要 VAD 切分，回退到逐条转录
+                    results[idx] = self.transcribe(
+                        audio_path, language=language, use_itn=use_itn
+                    )
+                    continue
+                speech, _ = extract_fbank(
+                    waveform, data_type="sound", frontend=frontend
+                )
+            except Exception as e:
+                logger.error(f"读取音频或提取特征失败: {e}", exc_info=True)
+                results[idx] = {
+                    "success": False,
+                    "error": f"读取音频或提取特征失败: {str(e)}",
+                }
+                continue
+            indices.append(idx)
+            feats.append(speech[0])
+
+        batches = self.batch_scheduler.schedule([f.size(0) for f in feats])
+        for batch in batches:
+            batch_indices = [indices[i] for i in batch]
+            try:
+                speech, speech_lengths = self.batch_scheduler.collate(feats, batch)
+                outputs = self._inference_batch(
+                    speech,
+                    speech_lengths,
+                    [f"batch_item_{idx}" for idx in batch_indices],
+                    language=language,
+                    use_itn=use_itn,
+                    output_timestamp=output_timestamp,
+                )
+                for idx, output in zip(batch_indices, outputs):
+                    results[idx] = self._format_result(output["text"])
+                    if output_timestamp:
+                        results[idx]["timestamp"] = output["timestamp"]
+            except RuntimeError as e:
+                logger.error(
+                    f"FunASR 模型批量推理时发生运行时错误: {str(e)}", exc_info=True
+                )
+                for idx in batch_indices:
+                    results[idx] = {
+                        "success": False,
+                        "error": f"语音识别模型推理错误: {str(e)}",
+                    }
+            except Exception as e:
+                logger.error(f"批量转录过程发生未知错误: {str(e)}", exc_info=True)
+                for idx in batch_indices:
+                    results[idx] = {
+                        "success": False,
+                        "error": f"批量转录过程发生未知错误: {str(e)}",
+                    }
+
+        logger.info(
+            f"批量转录完成，共 {len(audio_list)} 条，{len(batches)} 个批次，"
+            f"累计调度统计: {self.batch_scheduler.get_stats()}"
+        )
+        return results
+
+    def _inference_batch(
+        self,
+        speech,
+        speech_lengths,
+        keys,
+        language="auto",
+        use_itn=True,
+        output_timestamp=False,
+    ):
+        """对一个补零后的 fbank 批次调用 SenseVoiceSmall.inference，返回逐条结果字典列表"""
+        kwargs = dict(self.model.kwargs)
+        kwargs.update(
+            {
+                "language": language,
+                "use_itn": use_itn,
+                "data_type": "fbank",
+                "output_timestamp": output_timestamp,
+            }
+        )
+        with torch.no_grad():
+            res, _ = self.model.model.inference(
+                data_in=speech, data_lengths=speech_lengths, key=keys, **kwargs
+            )
+        return res
+
+    def get_cache_stats(self):
+        """返回转录缓存的命中/未命中/淘汰统计，未启用缓存时返回 None"""
+        if self.transcription_cache is None:
+            return None
+        return self.transcription_cache.get_stats()
+
+    def get_feature_cache_stats(self):
+        """返回 PCM/fbank 缓存的命中统计与占用字节数，未启用时返回 None"""
+        if self.feature_cache is None:
+            return None
+        return self.feature_cache.get_stats()
+
+    def get_batch_stats(self):
+        """返回批量转录调度器的累计统计（批次数、补零比例等）"""
+        return self.batch_scheduler.get_stats()
+
+    def open_stream(self, language="auto", chunk_size=(0, 10, 5), look_back=8):
+        """打开一个流式识别会话
+
+        Args:
+            language: 语言代码，同 transcribe
+            chunk_size: [左, 中, 右] 分块配置，单位为 60ms 的 LFR 帧；
+                默认每 600ms 提交一次结果，并向后看 300ms
+            look_back: 作为注意力上下文保留的历史分块数，-1 表示保留全部历史
+
+        Returns:
+            StreamingSession: 流式会话，模型未初始化时返回 None
+        """
+        if self.model is None:
+            logger.error(f"模型未初始化，无法打开流式会话: {self.init_error}")
+            return None
+        return StreamingSession(self, language, chunk_size, look_back)
+
+
+class StreamingSession:
+    """流式识别会话：open_stream -> feed -> partial -> finalize
+
+    麦克风采样率不是 16kHz 时，每个会话保留一个 StreamingResampler，块与块之间
+    延续滤波上下文。每次 feed 的 PCM 先经 OnlineFbankExtractor 增量提取特征，再由
+    SenseVoiceSmall.inference_chunk 以 forward_chunk 驱动编码器，编码器各层的
+    k/v 缓存在会话内持续保留，因此每块音频只需计算新到达的帧。
+    """
+
+    def __init__(self, voice_to_text, language, chunk_size, look_back):
+        self.voice_to_text = voice_to_text
+        self.model = voice_to_text.model.model
+        self.kwargs = voice_to_text.model.kwargs
+        self.frontend = OnlineFbankExtractor(self.kwargs["frontend"])
+        self.resampler = None
+        self.cache = self.model.init_stream_cache(
+            language=language, use_itn=True, chunk_size=chunk_size, look_back=look_back
+        )
+        self.raw_text = ""
+        self.finished = False
+
+    def feed(self, audio_chunk):
+        """送入一块音频并返回当前的部分识别结果
+
+        Args:
+            audio_chunk: 来自麦克风的 (采样率, 音频数据) 元组，或 16kHz 浮点波形
+
+        Returns:
+            dict: 部分识别结果，格式同 partial
+        """
+        if self.finished:
+            return {"success": False, "error": "流式会话已结束"}
+        if isinstance(audio_chunk, np.ndarray):
+            samples = audio_chunk.astype(np.float32)
+        elif isinstance(audio_chunk, tuple):
+            fs, audio_data = audio_chunk
+            samples = self.voice_to_text._mic_samples(audio_data)
+        else:
+            return {
+                "success": False,
+                "error": f"不支持的音频输入类型: {type(audio_chunk)}",
+            }
+        try:
+            if isinstance(audio_chunk, tuple):
+                samples = self._resample(fs, samples)
+            feats = self.frontend.accept(samples)
+            self._decode(feats, is_final=False)
+        except Exception as e:
+            logger.error(f"流式识别过程发生错误: {str(e)}", exc_info=True)
+            return {"success": False, "error": f"流式识别过程发生错误: {str(e)}"}
+        return self.partial()
+
+    def partial(self):
+        """返回当前的部分识别结果（包含尚未稳定的前瞻部分）"""
+        return {
+            "success": True,
+            "text": self.voice_to_text.format_str_v3(self.raw_text),
+            "raw_text": self.raw_text,
+            "is_final": False,
+        }
+
+    def finalize(self):
+        """冲刷剩余音频并返回最终结果，格式同 transcribe 的返回值"""
+        if not self.finished:
+            try:
+                tail = self.resampler.accept(None, is_final=True) if self.resampler else None
+                feats = self.frontend.accept(tail, is_final=True)
+                self._decode(feats, is_final=True)
+            except Exception as e:
+                logger.error(f"流式识别收尾时发生错误: {str(e)}", exc_info=True)
+                return {"success": False, "error": f"流式识别收尾时发生错误: {str(e)}"}
+            self.finished = True
+        return self.voice_to_text._format_result(self.raw_text)
+
+    def _resample(self, fs, samples):
+        """把 fs 采样率的一块波形增量重采样到 16kHz"""
+        if self.resampler is not None and self.resampler.orig_freq != fs:
+            # 采样率在会话中途改变：先冲刷旧重采样器的剩余样本
+            head = self.resampler.accept(None, is_final=True)
+            self.resampler = None
+        else:
+            head = None
+        if fs != 16000:
+            if self.resampler is None:
+                logger.info(f"流式会话重采样音频从 {fs}Hz 到 16000Hz")
+                self.resampler = StreamingResampler(fs, 16000)
+            samples = self.resampler.accept(samples)
+        if head is not None and len(head):
+            samples = torch.cat((head, torch.as_tensor(samples, dtype=torch.float32)))
+        return samples
+
+    def _decode(self, feats, is_final):
+        with torch.no_grad():
+            res = self.model.inference_chunk(
+                feats,
+                self.cache,
+                tokenizer=self.kwargs["tokenizer"],
+                is_final=is_final,
+                device=self.kwargs["device"],
+            )
+        self.raw_text = res["text"]
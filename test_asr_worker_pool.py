@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试语音识别工作池的任务分发、进程退出处理与统计
+"""
+
+import os
+import signal
+import time
+
+import pytest
+
+from modules.asr_worker_pool import ASRWorkerPool
+
+
+class _EchoVoiceToText:
+    """代替 VoiceToTextModule，返回处理任务的进程号"""
+
+    model = object()
+    init_error = None
+    device = "cpu"
+    cpu_affinity = None
+    model_dir = "echo"
+
+    def transcribe(self, audio_path, language="auto"):
+        if audio_path == "slow":
+            time.sleep(3)
+        return {"success": True, "text": audio_path, "pid": os.getpid()}
+
+
+@pytest.fixture
+def pool():
+    pool = ASRWorkerPool(_EchoVoiceToText(), num_workers=2)
+    yield pool
+    pool.shutdown(timeout=1.0)
+
+
+def test_results_and_stats(pool):
+    futures = [pool.transcribe(f"audio_{i}") for i in range(20)]
+    results = [future.result(timeout=30) for future in futures]
+    assert [r["text"] for r in results] == [f"audio_{i}" for i in range(20)]
+    stats = pool.get_stats()
+    assert stats["submitted"] == stats["completed"] == 20
+    assert stats["pending"] == 0 and stats["workers"] == 2
+
+
+def test_dead_worker_fails_its_jobs_and_is_not_reforked(pool):
+    # 两个慢任务分别落在两个进程上，杀掉其中一个进程后只有它的任务失败
+    futures = [pool.transcribe("slow"), pool.transcribe("slow")]
+    time.sleep(0.5)
+    victim = pool._workers[0]
+    os.kill(victim.pid, signal.SIGKILL)
+
+    errors, results = [], []
+    for future in futures:
+        try:
+            results.append(future.result(timeout=30))
+        except RuntimeError as e:
+            errors.append(e)
+    assert len(errors) == 1 and len(results) == 1
+    assert results[0]["pid"] != victim.pid
+
+    assert pool.is_available()
+    assert pool.transcribe("after").result(timeout=30)["pid"] != victim.pid
+    stats = pool.get_stats()
+    assert stats["worker_deaths"] == 1 and stats["workers"] == 1
+    assert stats["failed"] == 1
+    assert not pool._workers[0].is_alive()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试批量 CTC 贪心解码与强制对齐和逐条参考实现一致
+"""
+
+from types import SimpleNamespace
+
+import torch
+import torchaudio
+import torch.nn.functional as F
+
+from model import SenseVoiceSmall
+from utils.ctc_alignment import ctc_forced_align
+
+# ctc_greedy_search 只用到 blank_id，无需加载完整模型
+MODEL = SimpleNamespace(blank_id=0, ignore_id=-1)
+
+
+def _batch(lengths, vocab=6, seed=0):
+    """随机生成补零后的 CTC 对数概率批次，blank 占多数使输出含重复与空白"""
+    torch.manual_seed(seed)
+    logits = torch.randn(len(lengths), max(lengths), vocab)
+    logits[:, :, 0] += 1.0
+    return F.log_softmax(logits, dim=-1), torch.tensor(lengths, dtype=torch.int32)
+
+
+def _reference_greedy(ctc_logits, lengths):
+    """逐条解码：截到有效长度，合并重复后去掉 blank"""
+    token_int_list = []
+    for i, length in enumerate(lengths.tolist()):
+        yseq = torch.unique_consecutive(ctc_logits[i, :length].argmax(dim=-1))
+        token_int_list.append(yseq[yseq != MODEL.blank_id].tolist())
+    return token_int_list
+
+
+def test_ctc_greedy_search_matches_reference():
+    """批量贪心解码与逐条解码结果一致，补零帧不产生 token"""
+    ctc_logits, lengths = _batch([40, 17, 1, 33])
+    # 补零帧的 argmax 不应泄漏到结果中
+    ctc_logits[1, 17:, 3] = 10.0
+    assert SenseVoiceSmall.ctc_greedy_search(MODEL, ctc_logits, lengths) == (
+        _reference_greedy(ctc_logits, lengths)
+    )
+
+
+def _align_inputs():
+    """补零的对数概率批次与以 ignore_id 补齐的目标序列"""
+    log_probs, lengths = _batch([50, 23, 38], vocab=8, seed=1)
+    token_lists = [[3, 3, 5, 1, 7], [2, 6], [4, 1, 4, 1]]
+    targets = torch.nn.utils.rnn.pad_sequence(
+        [torch.LongTensor(t) for t in token_lists], batch_first=True, padding_value=-1
+    )
+    target_lens = torch.LongTensor([len(t) for t in token_lists])
+    return log_probs, lengths.long(), targets, target_lens, token_lists
+
+
+def _reference_align(log_probs, lengths, token_lists, **kwargs):
+    """逐条、不补零地对齐，返回每条语句有效帧的对齐结果"""
+    alignments = []
+    for i, tokens in enumerate(token_lists):
+        length = int(lengths[i])
+        align = ctc_forced_align(
+            log_probs[i : i + 1, :length].clone(),
+            torch.LongTensor([tokens]),
+            torch.LongTensor([length]),
+            torch.LongTensor([len(tokens)]),
+            **kwargs,
+        )
+        alignments.append(align[0].tolist())
+    return alignments
+
+
+def test_forced_align_matches_torchaudio():
+    """单条语句的强制对齐与 torchaudio.functional.forced_align 一致"""
+    log_probs, lengths, _, _, token_lists = _align_inputs()
+    for i, tokens in enumerate(token_lists):
+        length = int(lengths[i])
+        expected, _ = torchaudio.functional.forced_align(
+            log_probs[i : i + 1, :length],
+            torch.tensor([tokens], dtype=torch.int32),
+            blank=0,
+        )
+        assert _reference_align(log_probs[i : i + 1], lengths[i : i + 1], [tokens]) == [
+            expected[0].tolist()
+        ]
+
+
+def test_batched_forced_align_matches_per_utterance():
+    """补零批次一次对齐的结果与逐条对齐一致"""
+    log_probs, lengths, targets, target_lens, token_lists = _align_inputs()
+    align = ctc_forced_align(log_probs.clone(), targets.clone(), lengths, target_lens)
+    expected = _reference_align(log_probs, lengths, token_lists)
+    for i, length in enumerate(lengths.tolist()):
+        assert align[i, :length].tolist() == expected[i]
+
+
+def test_batched_timestamps_match_per_utterance():
+    """整批一次计算的字级时间戳与逐条计算一致"""
+    ctc_logits, lengths = _batch([54, 27, 42], vocab=8, seed=2)
+    # 前 4 帧对应语言/事件/情感/ITN 查询，对应的 4 个 token 不参与对齐
+    token_int_list = [[1, 2, 3, 4, 3, 3, 5, 1, 7], [1, 2, 3, 4, 2, 6], [1, 2, 3, 4, 4, 1]]
+    text_list = [" ".join(map(str, token_int)) for token_int in token_int_list]
+    tokenizer = SimpleNamespace(text2tokens=str.split)
+
+    timestamps = SenseVoiceSmall.ctc_timestamps(
+        MODEL, ctc_logits.clone(), lengths, token_int_list, text_list, tokenizer
+    )
+    for i, length in enumerate(lengths.tolist()):
+        expected = SenseVoiceSmall.ctc_timestamps(
+            MODEL,
+            ctc_logits[i : i + 1, :length].clone(),
+            lengths[i : i + 1],
+            token_int_list[i : i + 1],
+            text_list[i : i + 1],
+            tokenizer,
+        )
+        assert timestamps[i] == expected[0]
+        assert [token for token, _, _ in timestamps[i]] == text_list[i].split()[4:]
+
+
+def test_checkpointed_forced_align_matches_full_backpointers():
+    """只保存检查点、回溯时分段重算的对齐结果与保存全部回溯指针一致"""
+    log_probs, lengths, targets, target_lens, _ = _align_inputs()
+    expected = ctc_forced_align(log_probs.clone(), targets.clone(), lengths, target_lens)
+    for interval in (1, 3, 7, 64):
+        align = ctc_forced_align(
+            log_probs.clone(),
+            targets.clone(),
+            lengths,
+            target_lens,
+            checkpoint_interval=interval,
+        )
+        assert torch.equal(align, expected)
+
+
+def test_jit_forced_align_matches_python():
+    """TorchScript 编译的 Viterbi 递推与 Python 参考实现结果一致"""
+    log_probs, lengths, targets, target_lens, _ = _align_inputs()
+    expected = ctc_forced_align(log_probs.clone(), targets.clone(), lengths, target_lens)
+    align = ctc_forced_align(
+        log_probs.clone(), targets.clone(), lengths, target_lens, backend="jit"
+    )
+    assert torch.equal(align, expected)
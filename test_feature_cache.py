@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试解码音频与 fbank 特征缓存的命中与按字节数淘汰
+"""
+
+import os
+import shutil
+
+import torch
+from funasr.frontends.wav_frontend import WavFrontend
+
+from model import SenseVoiceSmall
+from utils.feature_cache import AudioFeatureCache
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example", "zh.mp3")
+
+
+def test_eviction_by_bytes():
+    """总字节数超过上限时淘汰最久未访问的条目，超过上限的单条不缓存"""
+    cache = AudioFeatureCache(max_bytes=3 * 400)
+    for i in range(3):
+        cache.put(i, torch.zeros(100))
+    assert cache.get(0) is not None
+    cache.put(3, torch.zeros(100))
+    assert cache.get(1) is None
+    assert all(cache.get(i) is not None for i in (0, 2, 3))
+    cache.put("big", torch.zeros(1000))
+    assert cache.get("big") is None
+
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 3 and stats["nbytes"] == 1200
+
+
+def test_identify_changes_with_file_content(tmp_path):
+    path = str(tmp_path / "a.mp3")
+    shutil.copy(EXAMPLE, path)
+    first = AudioFeatureCache.identify(path)
+    assert AudioFeatureCache.identify(path) == first
+    with open(path, "ab") as f:
+        f.write(b"\0")
+    assert AudioFeatureCache.identify(path) != first
+    assert AudioFeatureCache.identify("https://example.com/a.mp3") is None
+    assert AudioFeatureCache.identify(torch.ones(3)) == AudioFeatureCache.identify(torch.ones(3))
+
+
+def test_extract_feats_hits_cache():
+    """同一文件第二次提取特征直接命中，结果与重新解码一致"""
+    model = SenseVoiceSmall(
+        encoder="SenseVoiceEncoderSmall",
+        encoder_conf={
+            "output_size": 16,
+            "attention_heads": 2,
+            "linear_units": 32,
+            "num_blocks": 2,
+            "tp_blocks": 1,
+        },
+        input_size=560,
+        vocab_size=40,
+    )
+    frontend = WavFrontend(lfr_m=7, lfr_n=6, dither=0.0)
+    expected = model._extract_feats(EXAMPLE, frontend, None, {})
+
+    cache = AudioFeatureCache()
+    model.set_feature_cache(cache)
+    model._extract_feats(EXAMPLE, frontend, None, {})
+    speech, speech_lengths = model._extract_feats(EXAMPLE, frontend, None, {})
+    torch.testing.assert_close(speech, expected[0])
+    assert torch.equal(speech_lengths, expected[1])
+    assert cache.get_stats()["hits"] == 1
+
+    # inference 会原地修改 speech_lengths，不能影响缓存中的值
+    speech_lengths += 4
+    _, cached_lengths = model._extract_feats(EXAMPLE, frontend, None, {})
+    assert torch.equal(cached_lengths, expected[1])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试导出的 ONNX 图与 torch 编码器 + CTC 输出一致
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from model import SenseVoiceSmall
+from utils.onnx_backend import compare_backends, create_onnx_session, onnx_model_path
+
+pytest.importorskip("onnxruntime")
+
+TOKENIZER = SimpleNamespace(decode=lambda ids: " ".join(map(str, ids)))
+
+
+def _model():
+    """随机初始化的小 SenseVoiceSmall，导出图的结构与真实模型相同"""
+    torch.manual_seed(0)
+    model = SenseVoiceSmall(
+        encoder="SenseVoiceEncoderSmall",
+        encoder_conf={
+            "output_size": 32,
+            "attention_heads": 2,
+            "linear_units": 64,
+            "num_blocks": 3,
+            "tp_blocks": 1,
+        },
+        input_size=16,
+        vocab_size=40,
+    )
+    return model.eval()
+
+
+def test_onnx_matches_torch_on_padded_batch(tmp_path):
+    """补零批次上两个后端的 CTC 对数概率在容差内一致，解码文本完全相同"""
+    model = _model()
+    model.set_onnx_session(create_onnx_session(model, str(tmp_path)))
+    speech = torch.randn(3, 57, 16)
+    speech_lengths = torch.tensor([57, 31, 44], dtype=torch.int32)
+    for language, textnorm in (("auto", "withitn"), ("zh", "woitn")):
+        stats = compare_backends(
+            model, speech, speech_lengths, TOKENIZER, language=language, textnorm=textnorm
+        )
+        assert stats["lengths_equal"]
+        assert stats["tokens_equal"] and stats["text_equal"]
+        assert stats["max_abs_diff"] < 1e-4
+
+
+def test_export_reused_and_inference_uses_onnx(tmp_path):
+    """已导出的图直接复用；inference 走 onnx 会话时结果与 torch 一致"""
+    model = _model()
+    session = create_onnx_session(model, str(tmp_path))
+    onnx_path = onnx_model_path(model, str(tmp_path))
+    mtime = os.stat(onnx_path).st_mtime_ns
+    create_onnx_session(model, str(tmp_path))
+    assert os.stat(onnx_path).st_mtime_ns == mtime
+    assert os.listdir(tmp_path) == [os.path.basename(onnx_path)]
+
+    speech = torch.randn(2, 40, 16)
+    speech_lengths = torch.tensor([40, 25], dtype=torch.int32)
+    kwargs = {"data_type": "fbank", "device": "cpu", "tokenizer": TOKENIZER}
+    with torch.no_grad():
+        expected, _ = model.inference(speech, speech_lengths.clone(), key=["a", "b"], **kwargs)
+    model.set_onnx_session(session)
+    results, _ = model.inference(speech, speech_lengths.clone(), key=["a", "b"], **kwargs)
+    assert results == expected
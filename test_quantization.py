@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试编码器 int8 量化缓存的命中与回退
+"""
+
+import torch
+import torch.ao.nn.quantized.dynamic as nnqd
+
+from model import SenseVoiceEncoderSmall
+from utils.quantization import quantize_encoder
+
+
+def _encoder(output_size=16, seed=0):
+    torch.manual_seed(seed)
+    encoder = SenseVoiceEncoderSmall(
+        input_size=16,
+        output_size=output_size,
+        attention_heads=2,
+        linear_units=32,
+        num_blocks=2,
+        tp_blocks=1,
+    )
+    return encoder.eval()
+
+
+def _encode(encoder, x):
+    with torch.no_grad():
+        return encoder(x.clone(), torch.tensor([x.size(1)]))[0]
+
+
+def _is_quantized(encoder):
+    linears = [m for m in encoder.modules() if isinstance(m, nnqd.Linear)]
+    return bool(linears) and not any(type(m) is torch.nn.Linear for m in encoder.modules())
+
+
+def test_cache_hit_matches_fresh_quantization(tmp_path):
+    """第二次启动从缓存加载，输出与重新量化一致，原编码器不被修改"""
+    cache_path = str(tmp_path / "encoder_int8.pt")
+    x = torch.randn(1, 21, 16)
+    first, hit = quantize_encoder(_encoder(), cache_path)
+    assert not hit
+
+    original = _encoder()
+    second, hit = quantize_encoder(original, cache_path)
+    assert hit and second is not original
+    assert _is_quantized(second)
+    assert not _is_quantized(original)
+    torch.testing.assert_close(_encode(second, x), _encode(first, x))
+
+
+def test_mismatched_cache_falls_back_to_quantizing(tmp_path):
+    """缓存可以读取但与当前结构不匹配时回退为重新量化，并覆盖写入缓存"""
+    cache_path = str(tmp_path / "encoder_int8.pt")
+    quantize_encoder(_encoder(output_size=32), cache_path)
+
+    encoder = _encoder()
+    expected, _ = quantize_encoder(_encoder(), None)
+    quantized, hit = quantize_encoder(encoder, cache_path)
+    assert not hit and quantized is encoder
+    assert _is_quantized(quantized)
+    x = torch.randn(1, 21, 16)
+    torch.testing.assert_close(_encode(quantized, x), _encode(expected, x))
+
+    # 缓存已被当前结构的结果覆盖，下一次启动可以命中
+    _, hit = quantize_encoder(_encoder(), cache_path)
+    assert hit
+
+
+def test_corrupt_cache_falls_back_to_quantizing(tmp_path):
+    cache_path = tmp_path / "encoder_int8.pt"
+    cache_path.write_bytes(b"not a checkpoint")
+    quantized, hit = quantize_encoder(_encoder(), str(cache_path))
+    assert not hit
+    assert _is_quantized(quantized)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试 LLM 接口重试策略的退避、重试预算、熔断器状态转换与重新配置
+"""
+
+import time
+
+import pytest
+
+from utils import retry_policy
+from utils.retry_policy import RetryPolicy, configure_retry_policy, get_retry_policy
+
+
+@pytest.fixture(autouse=True)
+def default_settings():
+    settings = dict(retry_policy._settings)
+    yield
+    retry_policy._settings.update(settings)
+    retry_policy._policies.clear()
+
+
+def test_backoff_is_bounded_and_stops_at_max_attempts():
+    policy = RetryPolicy("llm", max_attempts=4, base_delay=0.5, max_delay=1.0)
+    for attempt, bound in enumerate([0.5, 1.0, 1.0]):
+        assert 0 <= policy.next_delay(attempt) <= bound
+    assert policy.next_delay(3) is None
+
+
+def test_retry_after_honored_only_for_429_and_503():
+    policy = RetryPolicy("llm", base_delay=0.01, max_delay=5.0)
+    assert policy.next_delay(0, 429, "2") == 2.0
+    assert policy.next_delay(0, 502, "2") <= 0.01
+    # Retry-After 超过单次等待上限时放弃重试
+    assert policy.next_delay(0, 503, "60") is None
+
+
+def test_budget_limits_retries():
+    """令牌耗尽后不再重试，成功请求按 budget_ratio 补充令牌"""
+    policy = RetryPolicy(
+        "llm", max_attempts=10, budget_ratio=0.5, budget_max_tokens=2, base_delay=0
+    )
+    assert policy.next_delay(0) is not None
+    assert policy.next_delay(0) is not None
+    assert policy.next_delay(0) is None
+    policy.record_success()
+    policy.record_success()
+    assert policy.next_delay(0) is not None
+    assert policy.get_stats()["budget_exhausted"] == 1
+
+
+def test_circuit_opens_probes_and_closes():
+    policy = RetryPolicy("llm", failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        assert policy.allow_request()
+        policy.record_failure()
+    assert policy.state == RetryPolicy.OPEN
+    assert not policy.allow_request()
+    assert policy.next_delay(0) is None
+
+    # 超时后放行一个探测请求，探测期间其他请求仍被拒绝；探测失败重新打开
+    time.sleep(0.06)
+    assert policy.allow_request() and policy.state == RetryPolicy.HALF_OPEN
+    assert not policy.allow_request()
+    policy.record_failure()
+    assert policy.state == RetryPolicy.OPEN
+
+    time.sleep(0.06)
+    assert policy.allow_request()
+    policy.record_success()
+    assert policy.state == RetryPolicy.CLOSED and policy.allow_request()
+    stats = policy.get_stats()
+    assert stats["circuit_opened"] == 2 and stats["circuit_rejected"] == 2
+
+
+def test_max_attempts_validated():
+    with pytest.raises(ValueError):
+        RetryPolicy("llm", max_attempts=0)
+    with pytest.raises(ValueError):
+        configure_retry_policy(max_attempts=0)
+    with pytest.raises(ValueError):
+        configure_retry_policy(unknown=1)
+
+
+def test_reconfigure_keeps_breaker_and_budget():
+    """重新配置（如再次初始化应用）原地更新参数，不重置熔断器与预算"""
+    configure_retry_policy(failure_threshold=1, reset_timeout=60)
+    policy = get_retry_policy("https://api.example.com/v1/chat/completions")
+    policy.allow_request()
+    policy.record_failure()
+    policy.tokens = 3.0
+    assert policy.state == RetryPolicy.OPEN
+
+    configure_retry_policy(max_attempts=5, budget_max_tokens=2)
+    assert get_retry_policy("https://api.example.com/other") is policy
+    assert policy.state == RetryPolicy.OPEN and not policy.allow_request()
+    assert policy.max_attempts == 5
+    assert policy.tokens == 2
+    assert policy.get_stats()["failures"] == 1
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试 SSE 增量解码器的事件分帧与 chat/completions 内容增量解析
+"""
+
+import asyncio
+import json
+
+from utils.sse import SSEDecoder, aiter_sse_content, iter_sse_content, parse_delta
+
+
+def _event(content):
+    payload = {"choices": [{"delta": {"content": content}}]}
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def test_multiline_data_comments_and_crlf():
+    """多行 data 以换行拼接，注释行与其他字段被忽略，\\r\\n 行尾与 \\n 等价"""
+    decoder = SSEDecoder()
+    stream = (
+        b": keep-alive\r\n\r\n"
+        b"event: message\r\nid: 1\r\ndata: first\r\ndata:second\r\n\r\n"
+        b"data: third\n\n"
+    )
+    assert decoder.feed(stream) == [b"first\nsecond", b"third"]
+    assert decoder.flush() == []
+
+
+def test_events_split_at_every_byte():
+    """事件在任意字节处被切开（包括 UTF-8 多字节字符与 \\r\\n 之间）时结果不变"""
+    stream = b"data: \xe4\xbd\xa0\xe5\xa5\xbd\r\n\r\ndata: a\r\ndata: b\r\n\r\n"
+    decoder = SSEDecoder()
+    events = []
+    for i in range(len(stream)):
+        events.extend(decoder.feed(stream[i : i + 1]))
+    assert events == ["你好".encode("utf-8"), b"a\nb"]
+
+
+def test_flush_returns_unterminated_event():
+    decoder = SSEDecoder()
+    assert decoder.feed(b"data: one\n\ndata: tail") == [b"one"]
+    assert decoder.flush() == [b"tail"]
+    assert decoder.flush() == []
+
+
+def test_parse_delta_skips_bad_chunks():
+    assert parse_delta(b'{"choices": [{"delta": {"content": "x"}}]}') == "x"
+    assert parse_delta(b'{"choices": [{"delta": {}}]}') == ""
+    assert parse_delta(b"{not json") == ""
+    assert parse_delta(b'{"choices": []}') == ""
+
+
+def test_iter_content_stops_at_done_and_merges_reads():
+    """同一次读取中的多个事件合并产出，[DONE] 之后的数据不再读取"""
+    stream = _event("你") + _event("好")
+    reads = [stream[:7], stream[7:], b"data: {bad}\n\n" + _event("！"), b"data: [DONE]\n\n"]
+    consumed = []
+
+    def chunks():
+        for raw in reads + [_event("不应出现")]:
+            consumed.append(raw)
+            yield raw
+
+    assert list(iter_sse_content(chunks())) == ["你好", "！"]
+    assert len(consumed) == len(reads)
+
+
+def test_async_iter_content_matches_sync():
+    # 最后一个事件没有以空行结尾，流结束时由 flush 取出
+    raw = [_event("a")[:5], _event("a")[5:] + _event("b"), _event("c").rstrip(b"\n")]
+
+    async def chunks():
+        for chunk in raw:
+            yield chunk
+
+    async def collect():
+        return [content async for content in aiter_sse_content(chunks())]
+
+    assert asyncio.run(collect()) == list(iter_sse_content(iter(raw))) == ["ab", "c"]
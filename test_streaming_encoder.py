@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试流式编码 (forward_chunk) 与整段编码结果一致
+"""
+
+import math
+
+import torch
+import torchaudio
+
+from model import MultiHeadedAttentionSANM, SenseVoiceEncoderSmall
+from utils.online_frontend import StreamingResampler
+
+
+def _encoder():
+    """构建一个随机初始化的小编码器，结构与 SenseVoiceEncoderSmall 相同"""
+    torch.manual_seed(0)
+    encoder = SenseVoiceEncoderSmall(
+        input_size=16,
+        output_size=16,
+        attention_heads=2,
+        linear_units=32,
+        num_blocks=3,
+        tp_blocks=1,
+        kernel_size=11,
+    )
+    return encoder.eval()
+
+
+def test_single_chunk_matches_full_encode():
+    """整段音频作为一个无前瞻的分块送入 forward_chunk，输出与 forward 一致"""
+    encoder = _encoder()
+    x = torch.randn(1, 37, 16)
+    with torch.no_grad():
+        full, _ = encoder(x.clone(), torch.tensor([37]))
+        cache = encoder.init_cache()
+        chunk = encoder.forward_chunk(x.clone(), cache, [0, 37, 0], look_back=-1)
+    torch.testing.assert_close(chunk, full, rtol=1e-5, atol=1e-5)
+    assert cache["start_idx"] == 37
+
+
+def test_fsmn_chunk_carries_left_context():
+    """分块 FSMN 带 right_padding 帧前瞻时，已提交帧与整段 FSMN 输出一致"""
+    torch.manual_seed(0)
+    attn = MultiHeadedAttentionSANM(2, 16, 16, 0.0, kernel_size=11).eval()
+    left_padding, right_padding = attn.pad_fn.padding
+    v = torch.randn(1, 53, 16)
+    with torch.no_grad():
+        full = attn.forward_fsmn(v, None)
+        cache, outputs = None, []
+        for start in range(0, v.size(1), 7):
+            end = min(start + 7, v.size(1))
+            inputs = v[:, start : min(end + right_padding, v.size(1))]
+            out, cache = attn.forward_fsmn_chunk(inputs, cache, stride=end - start)
+            outputs.append(out[:, : end - start])
+            assert cache.size(1) == left_padding
+    torch.testing.assert_close(torch.cat(outputs, dim=1), full, rtol=1e-5, atol=1e-5)
+
+
+def _bounded_attention(attn, x, keys):
+    """参考实现：以 x 的第 keys 帧为 k/v 计算注意力（不含 FSMN）"""
+    q_h, k_h, v_h, _ = attn.forward_qkv(x)
+    k_h, v_h = k_h[:, :, keys], v_h[:, :, keys]
+    scores = torch.matmul(q_h * attn.d_k ** (-0.5), k_h.transpose(-2, -1))
+    return attn.forward_attention(v_h, scores, None)
+
+
+def test_ring_kv_cache_keeps_pinned_prefix_and_window():
+    """环形 k/v 缓存的注意力上下文为固定前缀 + 最近 look_back 个分块 + 当前分块"""
+    torch.manual_seed(0)
+    attn = MultiHeadedAttentionSANM(2, 16, 16, 0.0, kernel_size=11).eval()
+    pin, center, right, look_back = 4, 5, 3, 2
+    x = torch.randn(1, pin + center * 9 + right, 16)
+    cache = {"pin": pin}
+    fsmn_cache = None
+    committed = []
+    start, nbytes = 0, None
+    with torch.no_grad():
+        while start + center + right <= x.size(1):
+            stride = center + (pin if start == 0 else 0)
+            chunk = x[:, start : start + stride + right]
+            frames = list(range(start, start + stride + right))
+            out, cache = attn.forward_chunk(chunk, cache, [0, center, right], look_back)
+
+            _, _, _, v = attn.forward_qkv(chunk)
+            fsmn, fsmn_cache = attn.forward_fsmn_chunk(v, fsmn_cache, stride)
+            keys = committed[:pin] + committed[pin:][-look_back * center :] + frames
+            expected = _bounded_attention(attn, x[:, : frames[-1] + 1], keys)
+            expected = expected[:, frames[0] :] + fsmn
+            torch.testing.assert_close(out, expected, rtol=1e-5, atol=1e-5)
+
+            # 缓存在第一个分块时一次性分配，之后不再增长
+            if nbytes is None:
+                nbytes = cache["kv"].nbytes
+            assert cache["kv"].nbytes == nbytes
+            committed += frames[:stride]
+            start += stride
+
+
+def test_streaming_resampler_matches_one_shot():
+    """逐块重采样的拼接结果与整段 torchaudio 重采样一致"""
+    torch.manual_seed(0)
+    for orig_freq in (44100, 48000, 8000):
+        waveform = torch.randn(orig_freq // 2)
+        expected = torchaudio.functional.resample(waveform[None, :], orig_freq, 16000)[0]
+        resampler = StreamingResampler(orig_freq, 16000)
+        outputs = []
+        start = 0
+        for size in (1, 333, 1024, 7, 4000, 2048, 10000):
+            outputs.append(resampler.accept(waveform[start : start + size]))
+            start += size
+        outputs.append(resampler.accept(waveform[start:], is_final=True))
+        streamed = torch.cat(outputs)
+        assert streamed.size(0) == math.ceil(len(waveform) * 16000 / orig_freq)
+        torch.testing.assert_close(streamed, expected, rtol=1e-4, atol=1e-5)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试磁盘转录缓存在多个实例/进程间共享，以及按目录执行的 LRU 淘汰
+"""
+
+import os
+import multiprocessing
+
+import numpy as np
+
+from utils.transcription_cache import TranscriptionCache
+
+
+def _put_in_child(cache_dir, key):
+    TranscriptionCache(cache_dir, max_entries=10).put(key, {"text": "来自子进程"})
+
+
+def _key(i):
+    return TranscriptionCache.make_key(np.full(160, i, dtype=np.float32), language="auto")
+
+
+def test_hit_on_entry_written_by_other_process(tmp_path):
+    """先创建的实例能命中其他进程之后写入的记录"""
+    cache = TranscriptionCache(str(tmp_path), max_entries=10)
+    key = _key(0)
+    assert cache.get(key) is None
+
+    process = multiprocessing.get_context("fork").Process(
+        target=_put_in_child, args=(str(tmp_path), key)
+    )
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 0
+
+    assert cache.get(key) == {"text": "来自子进程"}
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+
+def test_eviction_bound_applies_to_directory(tmp_path):
+    """两个实例交替写入，目录中的记录数不超过上限，淘汰最久未访问的记录"""
+    first = TranscriptionCache(str(tmp_path), max_entries=3)
+    second = TranscriptionCache(str(tmp_path), max_entries=3)
+    keys = [_key(i) for i in range(5)]
+    for i, key in enumerate(keys[:3]):
+        (first if i % 2 == 0 else second).put(key, {"text": str(i)})
+        # 显式设置修改时间，避免文件系统时间精度造成并列
+        os.utime(first._path(key), ns=(i * 10**9, i * 10**9))
+
+    # 访问最早的记录后它变为最近使用，下一次写入淘汰的是 keys[1]
+    assert second.get(keys[0]) == {"text": "0"}
+    first.put(keys[3], {"text": "3"})
+    assert first.get_stats()["entries"] == 3
+    assert second.get(keys[1]) is None
+    assert first.get(keys[0]) == {"text": "0"}
+
+    second.put(keys[4], {"text": "4"})
+    names = sorted(os.listdir(tmp_path))
+    assert names == sorted(f"{key}.json" for key in (keys[0], keys[3], keys[4]))
+
+
+def test_corrupt_entry_is_dropped(tmp_path):
+    cache = TranscriptionCache(str(tmp_path), max_entries=3)
+    key = _key(0)
+    with open(cache._path(key), "w", encoding="utf-8") as f:
+        f.write("{")
+    assert cache.get(key) is None
+    assert not os.path.exists(cache._path(key))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+
+"""
+测试理解模块的异步流式接口：可重试错误后的退避重试与共享连接池设置
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules.understanding import UnderstandingModule, _get_async_client, aclose_async_client
+from utils.http_session import configure_http_session, get_http_settings
+from utils.retry_policy import configure_retry_policy
+
+
+class _FlakyLLMHandler(BaseHTTPRequestHandler):
+    """第一次请求返回 503，之后以 SSE 流式返回两个内容块"""
+
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).requests += 1
+        if type(self).requests == 1:
+            body = b"busy"
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        events = [
+            {"choices": [{"delta": {"content": "你好"}}]},
+            {"choices": [{"delta": {"content": "，世界"}}]},
+        ]
+        body = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def llm_url():
+    _FlakyLLMHandler.requests = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyLLMHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    configure_retry_policy(base_delay=0.01, max_delay=0.05)
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    configure_retry_policy(base_delay=0.5, max_delay=8.0)
+    server.shutdown()
+    server.server_close()
+
+
+def test_analyze_async_retries_after_retryable_status(llm_url):
+    module = UnderstandingModule(api_key="test", api_url=llm_url)
+
+    async def run():
+        chunks = [chunk async for chunk in module.analyze_async("测试")]
+        await aclose_async_client()
+        return chunks
+
+    chunks = asyncio.run(run())
+    assert _FlakyLLMHandler.requests == 2
+    assert "".join(c["response_chunk"] for c in chunks[:-1]) == "你好，世界"
+    assert chunks[-1]["is_final"] and chunks[-1]["full_response"] == "你好，世界"
+
+
+def test_async_client_follows_http_session_settings():
+    """连接池设置变化后创建新的异步客户端，设置不变时复用"""
+    original = get_http_settings()
+
+    async def run():
+        first = _get_async_client()
+        same = _get_async_client()
+        configure_http_session(pool_maxsize=original["pool_maxsize"] + 1)
+        changed = _get_async_client()
+        await first.aclose()
+        await aclose_async_client()
+        return first, same, changed
+
+    try:
+        first, same, changed = asyncio.run(run())
+    finally:
+        configure_http_session(pool_maxsize=original["pool_maxsize"])
+    assert same is first and changed is not first
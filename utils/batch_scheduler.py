@@ -0,0 +1,100 @@
+import threading
+
+import torch
+from torch.nn.utils.rnn import pad_sequence
+
+
+class LengthBucketScheduler:
+    """按 fbank 帧长对待推理语句排序并组成补零批次
+
+    编码器在补零后的长度上做注意力，长短差异大的语句混在一个批次里会浪费
+    大量计算。调度器先按帧长排序，再贪心地把相邻语句放进同一批次，直到
+    补零后的总帧数超过 max_frames，或补零占比超过 max_padding_ratio。
+
+    Args:
+        max_frames (int): 单个批次补零后的帧数上限 (batch_size * max_len)，
+            单条超过上限的语句独占一个批次
+        max_padding_ratio (float): 单个批次中补零帧所占比例的上限
+        max_batch_size (int, optional): 单个批次的语句条数上限
+    """
+
+    def __init__(self, max_frames=1000, max_padding_ratio=0.2, max_batch_size=None):
+        self.max_frames = max_frames
+        self.max_padding_ratio = max_padding_ratio
+        self.max_batch_size = max_batch_size
+        # 多个请求线程共用一个调度器，统计计数器的更新需要加锁
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {
+                "utterances": 0,
+                "batches": 0,
+                "frames": 0,
+                "padded_frames": 0,
+            }
+
+    def get_stats(self):
+        """返回累计统计信息，padding_fraction 为补零帧占全部计算帧的比例"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["padding_fraction"] = (
+            1.0 - stats["frames"] / stats["padded_frames"]
+            if stats["padded_frames"]
+            else 0.0
+        )
+        stats["avg_batch_size"] = (
+            stats["utterances"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        return stats
+
+    def _fits(self, batch_lengths, length):
+        count = len(batch_lengths) + 1
+        if self.max_batch_size is not None and count > self.max_batch_size:
+            return False
+        # 已按长度升序排列，新加入的语句就是批次内最长的一条
+        padded = length * count
+        if padded > self.max_frames:
+            return False
+        waste = 1.0 - (sum(batch_lengths) + length) / padded if padded else 0.0
+        return waste <= self.max_padding_ratio
+
+    def _record(self, batch_lengths):
+        with self._lock:
+            self.stats["utterances"] += len(batch_lengths)
+            self.stats["batches"] += 1
+            self.stats["frames"] += sum(batch_lengths)
+            self.stats["padded_frames"] += max(batch_lengths) * len(batch_lengths)
+
+    def schedule(self, lengths):
+        """根据语句帧长划分批次
+
+        Args:
+            lengths: 每条语句的 fbank 帧数
+
+        Returns:
+            list: 批次列表，每个批次为 lengths 中的下标列表，批次内按帧长升序
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches = []
+        current, current_lengths = [], []
+        for i in order:
+            length = int(lengths[i])
+            if current and not self._fits(current_lengths, length):
+                batches.append(current)
+                self._record(current_lengths)
+                current, current_lengths = [], []
+            current.append(i)
+            current_lengths.append(length)
+        if current:
+            batches.append(current)
+            self._record(current_lengths)
+        return batches
+
+    @staticmethod
+    def collate(feats, indices):
+        """把一个批次的 (T, D) 特征补零拼接为 (B, T_max, D) 与长度张量"""
+        batch = [feats[i] for i in indices]
+        lengths = torch.tensor([f.size(0) for f in batch], dtype=torch.int32)
+        return pad_sequence(batch, batch_first=True, padding_value=0.0), lengths
@@ -0,0 +1,45 @@
+import os
+import glob
+import hashlib
+import inspect
+import logging
+
+logger = logging.getLogger('VoiceToTextModule')
+
+
+def checkpoint_file(model_path, init_param=None):
+    """返回模型权重文件路径：优先使用 funasr 的 init_param，否则为 model_path/model.pt"""
+    return init_param or os.path.join(model_path, "model.pt")
+
+
+def checkpoint_fingerprint(path):
+    """以权重文件的修改时间与大小生成短标识，权重被替换或微调后随之变化
+
+    不对文件内容做哈希，避免每次启动都读一遍数百 MB 的权重；文件不存在时返回 "none"。
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "none"
+    return f"{stat.st_mtime_ns:x}{stat.st_size:x}"
+
+
+def source_fingerprint(obj):
+    """以定义 obj 的源文件内容哈希生成短标识，导出代码修改后随之变化"""
+    try:
+        with open(inspect.getsourcefile(obj), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except (OSError, TypeError):
+        return "none"
+
+
+def remove_stale_artifacts(pattern, keep):
+    """删除与 pattern 匹配、但不是 keep 的旧派生文件（旧权重对应的缓存）"""
+    for path in glob.glob(pattern):
+        if os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+            logger.info(f"已删除过期的派生文件: {path}")
+        except OSError as e:
+            logger.warning(f"删除过期的派生文件失败: {path}: {e}")
@@ -1,5 +1,62 @@
 import torch
 
+_scripted_viterbi = None
+
+
+def _viterbi(
+    log_probs: torch.Tensor,
+    ext_targets: torch.Tensor,
+    diff_labels: torch.Tensor,
+    input_lengths: torch.Tensor,
+    target_lengths: torch.Tensor,
+    blank: int,
+) -> torch.Tensor:
+    # 与 ctc_forced_align 的参考实现逐步等价，供 torch.jit.script 编译整个递推与回溯
+    padding_num = 2
+    batch_size = log_probs.size(0)
+    input_time_size = log_probs.size(1)
+    padded_t = padding_num + ext_targets.size(-1)
+    bsz_indices = torch.arange(batch_size, device=log_probs.device)
+    input_lengths = input_lengths.to(log_probs.device)
+    target_lengths = target_lengths.to(log_probs.device)
+
+    neg_inf = torch.full((1,), float("-inf"), device=log_probs.device, dtype=log_probs.dtype)
+    best_score = torch.full((batch_size, padded_t), float("-inf"), device=log_probs.device, dtype=log_probs.dtype)
+    best_score[:, padding_num + 0] = log_probs[:, 0, blank]
+    best_score[:, padding_num + 1] = log_probs[bsz_indices, 0, ext_targets[:, 1]]
+
+    backpointers = torch.zeros((batch_size, input_time_size, padded_t), device=log_probs.device, dtype=torch.int8)
+    for t in range(1, input_time_size):
+        prev = torch.stack(
+            (best_score[:, 2:], best_score[:, 1:-1], torch.where(diff_labels, best_score[:, :-2], neg_inf))
+        )
+        prev_max_value, prev_max_idx = prev.max(dim=0)
+        score = log_probs[:, t].gather(-1, ext_targets) + prev_max_value
+        active = (input_lengths > t).unsqueeze(1)
+        best_score[:, padding_num:] = torch.where(active, score, best_score[:, padding_num:])
+        backpointers[:, t, padding_num:] = prev_max_idx.to(torch.int8)
+
+    l1l2 = best_score.gather(
+        -1, torch.stack((padding_num + target_lengths * 2 - 1, padding_num + target_lengths * 2), dim=-1)
+    )
+
+    path = torch.zeros((batch_size, input_time_size), device=log_probs.device, dtype=torch.long)
+    path[bsz_indices, input_lengths - 1] = padding_num + target_lengths * 2 - 1 + l1l2.argmax(dim=-1)
+
+    for t in range(input_time_size - 1, 0, -1):
+        target_indices = path[:, t]
+        prev_max_idx = backpointers[bsz_indices, t, target_indices].long()
+        path[:, t - 1] += target_indices - prev_max_idx
+    return path
+
+
+def _get_scripted_viterbi():
+    global _scripted_viterbi
+    if _scripted_viterbi is None:
+        _scripted_viterbi = torch.jit.script(_viterbi)
+    return _scripted_viterbi
+
+
 def ctc_forced_align(
     log_probs: torch.Tensor,
     targets: torch.Tensor,
@@ -7,7 +64,15 @@ def ctc_forced_align(
     target_lengths: torch.Tensor,
     blank: int = 0,
     ignore_id: int = -1,
+    checkpoint_interval: int = 0,
+    backend: str = "python",
 ) -> torch.Tensor:
+    # checkpoint_interval > 0 时只每隔 checkpoint_interval 帧保存一次 best_score，
+    # 回溯时再逐段重算回溯指针，用约一倍的计算量换取与 T 无关的回溯指针显存
+    # backend="jit" 时由 TorchScript 编译后的 _viterbi 执行逐帧递推，省去每帧的
+    # Python 调度开销；"python" 为参考实现
+    if backend not in ("python", "jit"):
+        raise ValueError(f"不支持的对齐后端: {backend}")
 
     targets[targets == ignore_id] = blank
 
@@ -29,6 +94,12 @@ def ctc_forced_align(
         dim=1,
     )
 
+    if backend == "jit" and checkpoint_interval <= 0:
+        path = _get_scripted_viterbi()(
+            log_probs, _t_a_r_g_e_t_s_, diff_labels, input_lengths, target_lengths, blank
+        )
+        return _t_a_r_g_e_t_s_.gather(dim=-1, index=(path - 2).clamp(min=0))
+
     neg_inf = torch.tensor(float("-inf"), device=log_probs.device, dtype=log_probs.dtype)
     padding_num = 2
     padded_t = padding_num + _t_a_r_g_e_t_s_.size(-1)
@@ -36,15 +107,31 @@ def ctc_forced_align(
     best_score[:, padding_num + 0] = log_probs[:, 0, blank]
     best_score[:, padding_num + 1] = log_probs[bsz_indices, 0, _t_a_r_g_e_t_s_[:, 1]]
 
-    backpointers = torch.zeros((batch_size, input_time_size, padded_t), device=log_probs.device, dtype=targets.dtype)
-
-    for t in range(1, input_time_size):
+    def step(t, backpointers_t):
+        # 三种转移（停留 / 前进一格 / 跳过 blank）只需 int8 记录所选分支
         prev = torch.stack(
             (best_score[:, 2:], best_score[:, 1:-1], torch.where(diff_labels, best_score[:, :-2], neg_inf))
         )
         prev_max_value, prev_max_idx = prev.max(dim=0)
-        best_score[:, padding_num:] = log_probs[:, t].gather(-1, _t_a_r_g_e_t_s_) + prev_max_value
-        backpointers[:, t, padding_num:] = prev_max_idx
+        score = log_probs[:, t].gather(-1, _t_a_r_g_e_t_s_) + prev_max_value
+        # 补零帧不参与动态规划，使每条语句的终止得分停留在 input_lengths - 1
+        active = (t < input_lengths).to(best_score.device)[:, None]
+        best_score[:, padding_num:] = torch.where(active, score, best_score[:, padding_num:])
+        backpointers_t[:, padding_num:] = prev_max_idx
+
+    if checkpoint_interval > 0:
+        checkpoints = {}
+        scratch = torch.zeros((batch_size, padded_t), device=log_probs.device, dtype=torch.int8)
+        for t in range(1, input_time_size):
+            if (t - 1) % checkpoint_interval == 0:
+                checkpoints[t] = best_score.clone()
+            step(t, scratch)
+    else:
+        backpointers = torch.zeros(
+            (batch_size, input_time_size, padded_t), device=log_probs.device, dtype=torch.int8
+        )
+        for t in range(1, input_time_size):
+            step(t, backpointers[:, t])
 
     l1l2 = best_score.gather(
         -1, torch.stack((padding_num + target_lengths * 2 - 1, padding_num + target_lengths * 2), dim=-1)
@@ -53,10 +140,24 @@ def ctc_forced_align(
     path = torch.zeros((batch_size, input_time_size), device=best_score.device, dtype=torch.long)
     path[bsz_indices, input_lengths - 1] = padding_num + target_lengths * 2 - 1 + l1l2.argmax(dim=-1)
 
-    for t in range(input_time_size - 1, 0, -1):
-        target_indices = path[:, t]
-        prev_max_idx = backpointers[bsz_indices, t, target_indices]
-        path[:, t - 1] += target_indices - prev_max_idx
+    if checkpoint_interval > 0:
+        segment = torch.zeros(
+            (batch_size, checkpoint_interval, padded_t), device=log_probs.device, dtype=torch.int8
+        )
+        for start in sorted(checkpoints, reverse=True):
+            end = min(start + checkpoint_interval, input_time_size)
+            best_score.copy_(checkpoints.pop(start))
+            for t in range(start, end):
+                step(t, segment[:, t - start])
+            for t in range(end - 1, start - 1, -1):
+                target_indices = path[:, t]
+                prev_max_idx = segment[bsz_indices, t - start, target_indices]
+                path[:, t - 1] += target_indices - prev_max_idx
+    else:
+        for t in range(input_time_size - 1, 0, -1):
+            target_indices = path[:, t]
+            prev_max_idx = backpointers[bsz_indices, t, target_indices]
+            path[:, t - 1] += target_indices - prev_max_idx
 
     alignments = _t_a_r_g_e_t_s_.gather(dim=-1, index=(path - padding_num).clamp(min=0))
     return alignments
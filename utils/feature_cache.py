@@ -0,0 +1,92 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import torch
+
+
+class AudioFeatureCache:
+    """解码后 PCM 与 fbank 特征的内存 LRU 缓存，按字节数限制总占用
+
+    同一音频切换语言或 ITN 设置重新识别时，前端（解码 + fbank）的结果不变，
+    命中缓存即可跳过 load_audio_text_image_video 与 extract_fbank。
+    文件输入以 (绝对路径, mtime, 大小) 标识，数组/张量输入以内容哈希标识。
+
+    Args:
+        max_bytes (int): 缓存张量的总字节数上限，超出后淘汰最久未访问的条目
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def identify(cls, data_in):
+        """返回输入音频的标识，无法标识的输入（如文本、URL）返回 None"""
+        if isinstance(data_in, (list, tuple)):
+            keys = tuple(cls.identify(item) for item in data_in)
+            return None if None in keys else keys
+        if isinstance(data_in, str):
+            if not os.path.isfile(data_in):
+                return None
+            stat = os.stat(data_in)
+            return ("file", os.path.abspath(data_in), stat.st_mtime_ns, stat.st_size)
+        if isinstance(data_in, torch.Tensor) or hasattr(data_in, "__array__"):
+            tensor = torch.as_tensor(data_in).detach().cpu().contiguous()
+            digest = hashlib.sha256(tensor.numpy().tobytes()).hexdigest()
+            return ("sha256", digest, str(tensor.dtype), tuple(tensor.shape))
+        return None
+
+    @staticmethod
+    def _nbytes(value):
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (list, tuple)):
+            return sum(AudioFeatureCache._nbytes(v) for v in value)
+        return getattr(value, "nbytes", 0)
+
+    def get(self, key):
+        """返回缓存的值，未命中时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """写入一条记录；单条超过 max_bytes 时不缓存"""
+        nbytes = self._nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def get_stats(self):
+        """返回命中/未命中/淘汰次数、命中率、条目数与占用字节数"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["nbytes"] = self.nbytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,120 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('HTTPSession')
+
+# 默认设置，可由 configure_http_session 按 config.py 覆盖
+_settings = {
+    "pool_connections": 4,  # 缓存连接池的主机数
+    "pool_maxsize": 32,  # 每个主机保持的最大连接数
+    "connect_timeout": 5,  # 建立连接的超时（秒）
+}
+_session = None
+_lock = threading.Lock()
+
+
+def configure_http_session(pool_connections=None, pool_maxsize=None, connect_timeout=None):
+    """更新连接池与超时设置；连接池设置变化时，下次使用会创建新的共享会话
+
+    旧会话不会被主动关闭：其他线程可能仍在读取它上面的流式响应，
+    这些请求结束、不再被引用后旧会话随垃圾回收释放连接。设置未变化时什么也不做。
+
+    Args:
+        pool_connections (int, optional): 缓存连接池的主机数
+        pool_maxsize (int, optional): 每个主机保持的最大 keep-alive 连接数，
+            应不小于同时进行的 LLM 流式请求数
+        connect_timeout (float, optional): 建立连接的超时（秒）
+    """
+    global _session
+    updates = {
+        "pool_connections": pool_connections,
+        "pool_maxsize": pool_maxsize,
+        "connect_timeout": connect_timeout,
+    }
+    with _lock:
+        updates = {
+            k: v for k, v in updates.items() if v is not None and _settings[k] != v
+        }
+        if not updates:
+            return
+        _settings.update(updates)
+        # 连接超时在每次请求时读取，只有连接池大小变化才需要新会话
+        if _session is not None and set(updates) - {"connect_timeout"}:
+            _session = None
+
+
+def get_http_session():
+    """返回进程内共享的 requests.Session，各模块的 LLM 调用复用其 keep-alive 连接"""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            # 重试由调用方按自身策略处理，适配器本身不重试
+            adapter = HTTPAdapter(
+                pool_connections=_settings["pool_connections"],
+                pool_maxsize=_settings["pool_maxsize"],
+                max_retries=0,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get_http_settings():
+    """返回当前连接池与超时设置的副本，异步客户端据此配置自己的连接池"""
+    with _lock:
+        return dict(_settings)
+
+
+def http_timeout(read_timeout):
+    """返回 (连接超时, 读取超时) 元组，连接超时取共享设置"""
+    return (_settings["connect_timeout"], read_timeout)
+
+
+def release_response(response, drain=True):
+    """读完并关闭响应，使底层连接回到连接池
+
+    流式响应在收到 [DONE] 后通常只剩分块编码的结束标记，读完后连接即可复用；
+    直接 close 一个未读完的响应会断开连接，下一轮对话又要重新握手。
+    消费方中途放弃的流（如被取消的推测请求）应传 drain=False 直接断开，
+    否则要等上游把剩余内容全部生成完。
+    """
+    if response is None:
+        return
+    try:
+        drain_conn = getattr(response.raw, "drain_conn", None) if drain else None
+        if drain_conn is not None:
+            drain_conn()
+    except Exception as e:
+        logger.debug(f"读取响应剩余内容失败，连接将被丢弃: {e}")
+    finally:
+        response.close()
+
+
+def get_http_stats():
+    """返回共享会话的连接统计：请求数、新建连接数与复用次数"""
+    with _lock:
+        session = _session
+    stats = {"requests": 0, "connections": 0}
+    if session is not None:
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats["requests"] += pool.num_requests
+                stats["connections"] += pool.num_connections
+    stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+    stats["reuse_rate"] = (
+        stats["reused"] / stats["requests"] if stats["requests"] else 0.0
+    )
+    return stats
@@ -0,0 +1,153 @@
+import math
+
+import torch
+from funasr.frontends.wav_frontend import apply_cmvn
+
+
+class OnlineFbankExtractor:
+    """增量版 WavFrontend：逐块接收 PCM，输出与整段提取一致的 LFR+CMVN 特征
+
+    kaldi fbank 在 snip_edges 模式下各帧相互独立，只需保留不足一帧的尾部
+    采样点；LFR 以 lfr_n 为步长拼接 lfr_m 帧，只需保留尚未被完全消费的
+    fbank 帧。首帧左侧的重复填充与末帧右侧的重复填充与 apply_lfr 保持一致。
+
+    Args:
+        frontend: 模型加载时构建的 WavFrontend 实例
+    """
+
+    def __init__(self, frontend):
+        self.frontend = frontend
+        self.frame_length = int(frontend.fs * frontend.frame_length / 1000)
+        self.frame_shift = int(frontend.fs * frontend.frame_shift / 1000)
+        self.lfr_m = frontend.lfr_m
+        self.lfr_n = frontend.lfr_n
+        self.reset()
+
+    def reset(self):
+        self.samples = torch.zeros(0)
+        # 待拼接的 fbank 帧（已包含首帧左侧填充）
+        self.fbank = None
+        self.num_fbank_frames = 0
+        self.num_lfr_frames = 0
+
+    def accept(self, samples, is_final=False):
+        """输入一段 16kHz 浮点波形，返回新产生的特征帧 (T, D)
+
+        Args:
+            samples: 一维波形，取值范围 [-1, 1]
+            is_final: 是否为最后一块音频，为 True 时输出剩余的所有 LFR 帧
+
+        Returns:
+            torch.Tensor: 新产生的特征帧，可能为 0 帧
+        """
+        if samples is not None and len(samples):
+            samples = torch.as_tensor(samples, dtype=torch.float32).reshape(-1)
+            self.samples = torch.cat((self.samples, samples))
+
+        num_frames = 0
+        if len(self.samples) >= self.frame_length:
+            num_frames = (len(self.samples) - self.frame_length) // self.frame_shift + 1
+        if num_frames > 0:
+            used = (num_frames - 1) * self.frame_shift + self.frame_length
+            fbank, _ = self.frontend.forward_fbank(self.samples[None, :used], [used])
+            fbank = fbank[0]
+            self.samples = self.samples[num_frames * self.frame_shift :]
+            if self.fbank is None:
+                left_padding = fbank[0].repeat((self.lfr_m - 1) // 2, 1)
+                fbank = torch.cat((left_padding, fbank))
+                self.fbank = fbank
+            else:
+                self.fbank = torch.cat((self.fbank, fbank))
+            self.num_fbank_frames += num_frames
+
+        return self._lfr_cmvn(is_final)
+
+    def _lfr_cmvn(self, is_final):
+        outputs = []
+        if self.fbank is not None:
+            if is_final:
+                total = -(-self.num_fbank_frames // self.lfr_n)
+                while self.num_lfr_frames < total:
+                    frame = self.fbank[: self.lfr_m]
+                    if frame.size(0) < self.lfr_m:
+                        pad = frame[-1:].repeat(self.lfr_m - frame.size(0), 1)
+                        frame = torch.cat((frame, pad))
+                    outputs.append(frame.reshape(1, -1))
+                    self.fbank = self.fbank[self.lfr_n :]
+                    self.num_lfr_frames += 1
+            else:
+                while self.fbank.size(0) >= self.lfr_m:
+                    outputs.append(self.fbank[: self.lfr_m].reshape(1, -1))
+                    self.fbank = self.fbank[self.lfr_n :]
+                    self.num_lfr_frames += 1
+
+        dim = self.frontend.n_mels * self.lfr_m
+        if not outputs:
+            return torch.zeros(0, dim)
+        feats = torch.cat(outputs)
+        if self.frontend.cmvn is not None:
+            feats = apply_cmvn(feats, self.frontend.cmvn)
+        return feats
+
+
+class StreamingResampler:
+    """增量重采样：逐块接收 PCM，输出与整段 torchaudio 重采样一致的波形
+
+    torchaudio 的 sinc 重采样把约分后的每 orig 个输入样本映射为 new 个输出样本，
+    输出只依赖前后 width 个输入样本。每次只对起点与 orig 对齐的窗口重采样：
+    窗口左侧保留 margin 个已处理的历史样本，右侧扣留 margin 个样本等待下一块，
+    只输出窗口中段，因此块边界处没有滤波边缘效应，也无需为每块重建滤波器。
+
+    Args:
+        orig_freq (int): 输入采样率
+        new_freq (int): 输出采样率
+    """
+
+    # 与 torchaudio.transforms.Resample 的默认参数一致
+    lowpass_filter_width = 6
+    rolloff = 0.99
+
+    def __init__(self, orig_freq, new_freq=16000):
+        import torchaudio.functional
+
+        self._resample = torchaudio.functional.resample
+        self.orig_freq = orig_freq
+        self.new_freq = new_freq
+        gcd = math.gcd(orig_freq, new_freq)
+        self.orig = orig_freq // gcd
+        self.new = new_freq // gcd
+        width = math.ceil(
+            self.lowpass_filter_width * self.orig / (min(self.orig, self.new) * self.rolloff)
+        )
+        self.margin = self.orig * math.ceil((width + 1) / self.orig)
+        self.samples = torch.zeros(0)
+        # samples 开头已经输出过、仅作为左侧上下文的样本数
+        self.context = 0
+
+    def accept(self, samples, is_final=False):
+        """输入一段 orig_freq 波形，返回新产生的 new_freq 波形（一维张量）"""
+        if samples is not None and len(samples):
+            samples = torch.as_tensor(samples, dtype=torch.float32).reshape(-1)
+            self.samples = torch.cat((self.samples, samples))
+
+        total = len(self.samples)
+        if is_final:
+            end = total
+            window = self.samples
+            out_end = -(-end * self.new // self.orig)
+        else:
+            end = (total - self.margin) // self.orig * self.orig
+            if end <= self.context:
+                return torch.zeros(0)
+            window = self.samples[: end + self.margin]
+            out_end = end * self.new // self.orig
+        if end <= self.context:
+            return torch.zeros(0)
+
+        out = self._resample(window[None, :], self.orig, self.new)[0]
+        out = out[self.context * self.new // self.orig : out_end]
+        # 新的窗口起点 end - margin 仍与 orig 对齐
+        start = max(end - self.margin, 0)
+        self.samples = self.samples[start:]
+        self.context = end - start
+        return out
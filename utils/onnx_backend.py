@@ -0,0 +1,156 @@
+import os
+import glob
+import argparse
+
+import torch
+
+from utils.checkpoint import (
+    checkpoint_file,
+    checkpoint_fingerprint,
+    remove_stale_artifacts,
+    source_fingerprint,
+)
+
+
+def onnx_model_path(model, model_path, init_param=None):
+    """返回导出的 ONNX 文件路径
+
+    文件名包含权重文件的修改时间/大小与模型定义源码（导出代码）的哈希，
+    权重或导出代码变化后会重新导出，而不是沿用旧图。
+    """
+    stem, ext = os.path.splitext(model.export_name)
+    weights = checkpoint_fingerprint(checkpoint_file(model_path, init_param))
+    code = source_fingerprint(type(model))
+    return os.path.join(model_path, f"{stem}_{weights}_{code}{ext}")
+
+
+def create_onnx_session(
+    model, model_path, intra_op_threads=0, inter_op_threads=0, init_param=None
+):
+    """为 SenseVoiceSmall 创建 onnxruntime 推理会话
+
+    模型目录下没有与当前权重、导出代码对应的 ONNX 文件时先调用
+    SenseVoiceSmall.export 导出一次，之后的启动直接加载该文件。
+
+    Args:
+        model: float32 的 SenseVoiceSmall
+        model_path: 存放 ONNX 文件的模型目录
+        intra_op_threads (int): 单个算子内部的并行线程数，0 表示由 onnxruntime 决定
+        inter_op_threads (int): 算子之间的并行线程数，0 表示由 onnxruntime 决定
+        init_param (str, optional): 权重文件路径，默认为 model_path/model.pt
+
+    Returns:
+        onnxruntime.InferenceSession: 使用 CPUExecutionProvider 的会话
+    """
+    import onnxruntime as ort
+
+    onnx_path = onnx_model_path(model, model_path, init_param)
+    if not os.path.exists(onnx_path):
+        os.replace(model.export(output_dir=model_path), onnx_path)
+        stem, ext = os.path.splitext(model.export_name)
+        remove_stale_artifacts(os.path.join(model_path, f"{stem}_*{ext}"), onnx_path)
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    return ort.InferenceSession(
+        onnx_path, options, providers=["CPUExecutionProvider"]
+    )
+
+
+def compare_backends(
+    model, speech, speech_lengths, tokenizer, language="auto", textnorm="withitn"
+):
+    """同一批特征分别经 torch 与 onnxruntime 计算编码器 + CTC，比较两者的输出
+
+    Args:
+        model: 已通过 set_onnx_session 挂上会话的 float32 SenseVoiceSmall
+        speech: (B, T, D) float32 LFR+CMVN 特征
+        speech_lengths: (B,) 有效帧数
+        tokenizer: 模型的 tokenizer，用于把 token 解码为文本
+        language: 语言代码，同 SenseVoiceSmall.inference
+        textnorm: "withitn" 或 "woitn"
+
+    Returns:
+        dict: 有效帧上 CTC 对数概率的最大绝对误差、有效长度/token 序列/文本是否
+            一致，以及两个后端的逐条文本
+    """
+    with torch.no_grad():
+        ref, ref_lens = model._forward_torch(
+            speech, speech_lengths.clone(), language, textnorm
+        )
+    out, out_lens = model._forward_onnx(speech, speech_lengths.clone(), language, textnorm)
+    ref_tokens = model.ctc_greedy_search(ref, ref_lens)
+    onnx_tokens = model.ctc_greedy_search(out, out_lens)
+    torch_text = [tokenizer.decode(tokens) for tokens in ref_tokens]
+    onnx_text = [tokenizer.decode(tokens) for tokens in onnx_tokens]
+    max_abs_diff = max(
+        (out[i, :length] - ref[i, :length]).abs().max().item()
+        for i, length in enumerate(ref_lens.tolist())
+    )
+    return {
+        "max_abs_diff": max_abs_diff,
+        "lengths_equal": torch.equal(ref_lens.int(), out_lens.int()),
+        "tokens_equal": ref_tokens == onnx_tokens,
+        "text_equal": torch_text == onnx_text,
+        "torch_text": torch_text,
+        "onnx_text": onnx_text,
+    }
+
+
+def main():
+    # 在仓库根目录运行: python -m utils.onnx_backend
+    # 同一段音频的特征分别经 torch 与 onnxruntime 计算，检查 CTC 对数概率误差与
+    # 解码文本是否一致；任一条不一致时以非零状态退出
+    from funasr.utils.load_utils import extract_fbank
+    from modules.voice_to_text import VoiceToTextModule
+
+    parser = argparse.ArgumentParser(description="SenseVoice ONNX 后端一致性检查")
+    parser.add_argument("--model_dir", default="iic/SenseVoiceSmall")
+    parser.add_argument("--audio", nargs="*", default=None)
+    parser.add_argument("--language", default="auto")
+    parser.add_argument("--atol", type=float, default=1e-3)
+    parser.add_argument("--intra_op_threads", type=int, default=0)
+    parser.add_argument("--inter_op_threads", type=int, default=0)
+    args = parser.parse_args()
+
+    module = VoiceToTextModule(
+        model_dir=args.model_dir,
+        device="cpu",
+        backend="onnx",
+        onnx_intra_op_threads=args.intra_op_threads,
+        onnx_inter_op_threads=args.inter_op_threads,
+    )
+    if module.model is None:
+        print(f"模型初始化失败: {module.init_error}")
+        raise SystemExit(1)
+    model, kwargs = module.model.model, module.model.kwargs
+
+    audio_list = args.audio or sorted(glob.glob("example/*.mp3"))
+    failures = 0
+    for path in audio_list:
+        speech, speech_lengths = extract_fbank(
+            module._load_audio(path), data_type="sound", frontend=kwargs["frontend"]
+        )
+        stats = compare_backends(
+            model, speech, speech_lengths, kwargs["tokenizer"], language=args.language
+        )
+        ok = (
+            stats["text_equal"]
+            and stats["lengths_equal"]
+            and stats["max_abs_diff"] <= args.atol
+        )
+        failures += not ok
+        print(
+            f"{os.path.basename(path)}: {'一致' if ok else '不一致'}，"
+            f"最大对数概率误差 {stats['max_abs_diff']:.2e}"
+        )
+        if not stats["text_equal"]:
+            print(f"  torch: {stats['torch_text'][0]}")
+            print(f"  onnx:  {stats['onnx_text'][0]}")
+    print(f"{len(audio_list) - failures}/{len(audio_list)} 条结果一致")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import copy
+import glob
+import time
+import argparse
+
+import torch
+
+from utils.quantization import char_error_rate
+
+
+def _run_ctc(model, speech, speech_lengths, language, textnorm, repeats):
+    # _forward_torch 会原地修改 speech_lengths，每次都传入副本
+    with torch.no_grad():
+        model._forward_torch(speech, speech_lengths.clone(), language, textnorm)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            ctc_logits, lengths = model._forward_torch(
+                speech, speech_lengths.clone(), language, textnorm
+            )
+        elapsed = (time.perf_counter() - start) / repeats
+    return ctc_logits, lengths, elapsed
+
+
+def compare_model_precision(
+    model,
+    speech,
+    speech_lengths,
+    tokenizer,
+    dtype=torch.bfloat16,
+    language="auto",
+    textnorm="withitn",
+    repeats=3,
+):
+    """以 float32 为基准比较 SenseVoiceSmall 在低精度下的 CTC 识别结果与耗时
+
+    对同一段真实音频的 fbank 特征分别以两种精度运行编码器 + CTC，比较逐帧
+    argmax token、贪心解码的 token 序列与文本，以及 CTC 对数概率的误差。
+
+    Args:
+        model: 加载了真实权重的 float32 SenseVoiceSmall，不会被修改
+        speech: (1, T, D) float32 LFR+CMVN 特征
+        speech_lengths: (1,) 有效帧数
+        tokenizer: 模型的 tokenizer，用于把 token 解码为文本
+        dtype: 待比较的推理精度
+        language: 语言代码，同 SenseVoiceSmall.inference
+        textnorm: "withitn" 或 "woitn"
+        repeats: 计时重复次数（另有一次预热）
+
+    Returns:
+        dict: 逐帧 argmax 一致率、token 序列/文本是否一致、文本 CER、
+            对数概率最大绝对误差、两种精度的平均耗时与加速比，以及两种精度的文本
+    """
+    model = model.eval()
+    ref, ref_lens, ref_time = _run_ctc(
+        model, speech, speech_lengths, language, textnorm, repeats
+    )
+    low = copy.deepcopy(model).to(dtype)
+    out, _, low_time = _run_ctc(
+        low, speech.to(dtype), speech_lengths, language, textnorm, repeats
+    )
+
+    length = int(ref_lens[0])
+    ref_tokens = model.ctc_greedy_search(ref, ref_lens)[0]
+    low_tokens = model.ctc_greedy_search(out, ref_lens)[0]
+    ref_text = tokenizer.decode(ref_tokens)
+    low_text = tokenizer.decode(low_tokens)
+    agree = (out[0, :length].argmax(-1) == ref[0, :length].argmax(-1)).float().mean()
+    return {
+        "dtype": str(dtype).replace("torch.", ""),
+        "argmax_agreement": agree.item(),
+        "tokens_equal": ref_tokens == low_tokens,
+        "text_equal": ref_text == low_text,
+        "cer": char_error_rate(ref_text, low_text),
+        "max_abs_logprob_diff": (out[0, :length] - ref[0, :length]).abs().max().item(),
+        "float32_s": ref_time,
+        "low_precision_s": low_time,
+        "speedup": ref_time / low_time if low_time else 0.0,
+        "float32_text": ref_text,
+        "low_precision_text": low_text,
+    }
+
+
+def main():
+    # 在仓库根目录运行: python -m utils.precision_benchmark --dtype bfloat16
+    # 加载真实权重，以 float32 的识别结果为参考，统计低精度在示例音频上的差异
+    from funasr import AutoModel
+    from funasr.utils.load_utils import load_audio_text_image_video, extract_fbank
+
+    parser = argparse.ArgumentParser(description="SenseVoiceSmall 低精度推理对比")
+    parser.add_argument("--model_dir", default="iic/SenseVoiceSmall")
+    parser.add_argument("--audio", nargs="*", default=None)
+    parser.add_argument("--dtype", default="bfloat16", choices=["bfloat16", "float16"])
+    parser.add_argument("--language", default="auto")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    auto_model = AutoModel(
+        model=args.model_dir,
+        trust_remote_code=True,
+        remote_code="./model.py",
+        device="cpu",
+    )
+    model, kwargs = auto_model.model, auto_model.kwargs
+    frontend = kwargs["frontend"]
+
+    audio_list = args.audio or sorted(glob.glob("example/*.mp3"))
+    total_errors, total_chars, mismatches = 0.0, 0, 0
+    for path in audio_list:
+        waveform = load_audio_text_image_video(path, fs=frontend.fs)
+        speech, speech_lengths = extract_fbank(
+            waveform, data_type="sound", frontend=frontend
+        )
+        stats = compare_model_precision(
+            model,
+            speech,
+            speech_lengths,
+            kwargs["tokenizer"],
+            getattr(torch, args.dtype),
+            language=args.language,
+            repeats=args.repeats,
+        )
+        chars = len(stats["float32_text"].replace(" ", ""))
+        total_errors += stats["cer"] * chars
+        total_chars += chars
+        mismatches += not stats["tokens_equal"]
+        print(
+            f"{os.path.basename(path)}: argmax 一致率 {stats['argmax_agreement']:.4f}，"
+            f"token 序列{'一致' if stats['tokens_equal'] else '不一致'}，"
+            f"CER {stats['cer']:.4f}，最大对数概率误差 {stats['max_abs_logprob_diff']:.4f}，"
+            f"加速比 {stats['speedup']:.2f}"
+        )
+        if not stats["text_equal"]:
+            print(f"  float32:    {stats['float32_text']}")
+            print(f"  {args.dtype}: {stats['low_precision_text']}")
+    print(f"{len(audio_list) - mismatches}/{len(audio_list)} 条 token 序列一致")
+    print(f"overall CER: {total_errors / max(total_chars, 1):.4f}")
+
+
+if __name__ == "__main__":
+    main()
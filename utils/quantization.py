@@ -0,0 +1,203 @@
+import os
+import copy
+import time
+import glob
+import logging
+import argparse
+
+import torch
+from torch import nn
+import torch.ao.nn.quantized.dynamic as nnqd
+
+from utils.checkpoint import checkpoint_file, checkpoint_fingerprint
+
+logger = logging.getLogger('VoiceToTextModule')
+
+
+def _quantized_copy(module):
+    # 复制 module，其中的浮点 Linear 直接换成空的动态量化 Linear（权重随后由
+    # load_state_dict 填入），不复制浮点权重，也不修改原 module
+    memo = {}
+    for child in module.modules():
+        if type(child) is nn.Linear:
+            memo[id(child)] = nnqd.Linear(
+                child.in_features,
+                child.out_features,
+                bias_=child.bias is not None,
+                dtype=torch.qint8,
+            )
+    return copy.deepcopy(module, memo)
+
+
+def quantize_encoder(encoder, cache_path=None):
+    """对编码器中的全部 nn.Linear 做动态 int8 量化
+
+    覆盖 MultiHeadedAttentionSANM 的 linear_q_k_v / linear_out 与
+    PositionwiseFeedForward 的 w_1 / w_2；LayerNorm、FSMN 卷积保持 float32。
+    cache_path 存在时把已量化的 state dict 加载到编码器的副本中，跳过逐层量化；
+    缓存无法读取或与当前结构不匹配时丢弃副本，对原编码器重新量化并覆盖写入缓存。
+
+    Args:
+        encoder: float32 的 SenseVoiceEncoderSmall，需位于 CPU
+        cache_path (str, optional): 量化 state dict 的缓存文件路径
+
+    Returns:
+        tuple: (量化后的编码器, 是否命中了磁盘缓存)。命中缓存时返回新的编码器，
+            原编码器不变；否则原编码器被原地量化后返回
+    """
+    if cache_path and os.path.exists(cache_path):
+        try:
+            state_dict = torch.load(cache_path, map_location="cpu")
+            quantized = _quantized_copy(encoder)
+            quantized.load_state_dict(state_dict)
+        except Exception as e:
+            # 缓存文件损坏或与当前权重/结构不匹配时回退为重新量化，并在下方覆盖写入
+            logger.warning(f"量化缓存加载失败，将重新量化: {e}")
+        else:
+            return quantized, True
+
+    torch.ao.quantization.quantize_dynamic(
+        encoder, {nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            torch.save(encoder.state_dict(), cache_path)
+        except OSError as e:
+            logger.warning(f"量化缓存写入失败，下次启动将重新量化: {e}")
+    return encoder, False
+
+
+# 量化缓存文件名前缀，quantized_cache_path 在其后追加 torch 版本与权重标识
+QUANTIZED_CACHE_PREFIX = "encoder_int8_"
+
+
+def quantized_cache_path(model_path, init_param=None):
+    """返回模型目录下的量化缓存文件名
+
+    文件名包含 torch 版本（打包格式随版本变化）与权重文件的修改时间/大小，
+    权重被替换或微调后不会再加载旧的量化结果。
+
+    Args:
+        model_path (str): 模型目录
+        init_param (str, optional): 权重文件路径，默认为 model_path/model.pt
+    """
+    fingerprint = checkpoint_fingerprint(checkpoint_file(model_path, init_param))
+    return os.path.join(
+        model_path,
+        f"{QUANTIZED_CACHE_PREFIX}torch{torch.__version__}_{fingerprint}.pt",
+    )
+
+
+def char_error_rate(ref, hyp):
+    """以字符为单位的编辑距离 / 参考文本长度"""
+    import editdistance
+
+    ref = ref.replace(" ", "")
+    hyp = hyp.replace(" ", "")
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    return editdistance.eval(ref, hyp) / len(ref)
+
+
+def _load_references(path):
+    """读取参考文本文件，每行为 "音频文件名<TAB>参考文本"，返回 {文件名: 文本}"""
+    references = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            name, _, text = line.rstrip("\n").partition("\t")
+            if name:
+                references[name] = text
+    return references
+
+
+def compare_quantization_cer(results, audio_list, references=None):
+    """汇总 float32 与 int8 转录结果的 CER
+
+    Args:
+        results: {None: float32 结果列表, "int8": int8 结果列表}，格式同 transcribe
+        audio_list: 与结果一一对应的音频路径
+        references (dict, optional): {音频文件名: 参考文本}；提供时分别计算两种
+            模式相对参考文本的 CER，否则只计算 int8 相对 float32 的差异
+
+    Returns:
+        dict: 逐条与整体的 CER，键为 "float32"、"int8"（需参考文本）与 "int8_vs_float32"
+    """
+    report = {"files": [], "overall": {}}
+    totals = {}
+    for path, ref, hyp in zip(audio_list, results[None], results["int8"]):
+        name = os.path.basename(path)
+        entry = {
+            "file": name,
+            "float32_text": ref.get("basic_text", ""),
+            "int8_text": hyp.get("basic_text", ""),
+        }
+        # 每种模式对应 (参考文本, 待评估文本)
+        pairs = {"int8_vs_float32": (entry["float32_text"], entry["int8_text"])}
+        if references and name in references:
+            pairs["float32"] = (references[name], entry["float32_text"])
+            pairs["int8"] = (references[name], entry["int8_text"])
+        for mode, (truth, text) in pairs.items():
+            cer = char_error_rate(truth, text)
+            chars = len(truth.replace(" ", ""))
+            entry[mode] = cer
+            errors, total = totals.get(mode, (0.0, 0))
+            totals[mode] = (errors + cer * chars, total + chars)
+        report["files"].append(entry)
+    for mode, (errors, chars) in totals.items():
+        report["overall"][mode] = errors / max(chars, 1)
+    return report
+
+
+def main():
+    # 在仓库根目录运行: python -m utils.quantization --ref_text refs.tsv --output cer.json
+    # 统计 float32 与 int8 模式在示例音频上的 CER 与耗时；不提供参考文本时以
+    # float32 的转录结果为参考
+    import json
+
+    from modules.voice_to_text import VoiceToTextModule
+
+    parser = argparse.ArgumentParser(description="SenseVoice int8 动态量化 CER 对比")
+    parser.add_argument("--model_dir", default="iic/SenseVoiceSmall")
+    parser.add_argument("--audio", nargs="*", default=None)
+    parser.add_argument(
+        "--ref_text", default=None, help="参考文本文件，每行为 音频文件名<TAB>参考文本"
+    )
+    parser.add_argument("--output", default=None, help="把 CER 报告写入该 JSON 文件")
+    args = parser.parse_args()
+
+    audio_list = args.audio or sorted(glob.glob("example/*.mp3"))
+    results, elapsed = {}, {}
+    for quantize in (None, "int8"):
+        module = VoiceToTextModule(
+            model_dir=args.model_dir, device="cpu", quantize=quantize
+        )
+        if module.model is None:
+            print(f"模型初始化失败: {module.init_error}")
+            return
+        start = time.perf_counter()
+        results[quantize] = [module.transcribe(path) for path in audio_list]
+        elapsed[quantize or "float32"] = time.perf_counter() - start
+        print(f"quantize={quantize}: {elapsed[quantize or 'float32']:.3f}s")
+
+    references = _load_references(args.ref_text) if args.ref_text else None
+    report = compare_quantization_cer(results, audio_list, references)
+    report["elapsed_s"] = elapsed
+    for entry in report["files"]:
+        cers = "，".join(
+            f"{mode} CER {entry[mode]:.4f}"
+            for mode in ("float32", "int8", "int8_vs_float32")
+            if mode in entry
+        )
+        print(f"{entry['file']}: {cers}")
+        print(f"  float32: {entry['float32_text']}")
+        print(f"  int8:    {entry['int8_text']}")
+    for mode, cer in report["overall"].items():
+        print(f"overall {mode} CER: {cer:.4f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
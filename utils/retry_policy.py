@@ -0,0 +1,222 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+logger = logging.getLogger('RetryPolicy')
+
+# 值得重试的状态码：限流与网关/服务暂不可用；其余 5xx（如 501）重试也不会成功
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# 只有这两种状态码的 Retry-After 会被采纳
+RETRY_AFTER_STATUS_CODES = frozenset({429, 503})
+
+# 默认设置，可由 configure_retry_policy 按 config.py 覆盖
+_settings = {
+    "max_attempts": 3,  # 包含首次请求在内的最大尝试次数
+    "base_delay": 0.5,  # 指数退避的初始等待（秒）
+    "max_delay": 8.0,  # 单次等待上限（秒），Retry-After 超过此值时放弃重试
+    "budget_ratio": 0.2,  # 每次成功请求存入的重试令牌数
+    "budget_max_tokens": 10.0,  # 重试令牌上限
+    "failure_threshold": 5,  # 连续失败多少次后熔断
+    "reset_timeout": 30.0,  # 熔断后多久放行一个探测请求（秒）
+}
+_policies = {}
+_lock = threading.Lock()
+
+
+class RetryPolicy:
+    """一个上游主机的重试策略：带抖动的指数退避、重试令牌预算与熔断器
+
+    - 退避采用 full jitter（在 [0, base * 2^n] 内均匀取值），避免所有会话同步重试；
+      429/503 响应带 Retry-After 时按其等待。
+    - 每次重试消耗一个令牌，每次成功请求存入 budget_ratio 个令牌，上游大面积
+      出错时重试总量被限制在正常流量的一定比例内，不会把故障放大。
+    - 连续失败达到 failure_threshold 后熔断器打开，reset_timeout 内的请求直接失败；
+      之后放行一个探测请求，成功则关闭熔断器，失败则重新计时。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, **settings):
+        self.name = name
+        options = dict(_settings)
+        options.update(settings)
+        _validate(options)
+        self._lock = threading.Lock()
+        self.budget_max_tokens = options["budget_max_tokens"]
+        self.tokens = self.budget_max_tokens
+        self.apply_settings(**options)
+
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.stats = {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "budget_exhausted": 0,
+            "circuit_rejected": 0,
+            "circuit_opened": 0,
+        }
+
+    def apply_settings(self, **settings):
+        """原地更新重试参数，保留熔断器状态、剩余令牌与统计
+
+        剩余令牌超过新的上限时截断到上限。
+        """
+        with self._lock:
+            for key in _settings:
+                if key in settings:
+                    setattr(self, key, settings[key])
+            self.tokens = min(self.tokens, self.budget_max_tokens)
+
+    @staticmethod
+    def is_retryable_status(status_code):
+        return status_code in RETRYABLE_STATUS_CODES
+
+    def allow_request(self):
+        """发起一次尝试前调用；熔断器打开时返回 False，调用方应直接失败"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                # 打开状态等待 reset_timeout；半开状态只放行一个探测请求，
+                # 探测请求没有结果（调用方未记录）超过 reset_timeout 时再放行一个
+                if (self.state == self.OPEN or self._probing) and (
+                    time.monotonic() - self._opened_at < self.reset_timeout
+                ):
+                    self.stats["circuit_rejected"] += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = True
+                self._opened_at = time.monotonic()
+            self.stats["requests"] += 1
+            return True
+
+    def record_success(self):
+        """上游给出了非可重试的响应（2xx 或 4xx）时调用"""
+        with self._lock:
+            self.stats["successes"] += 1
+            self.tokens = min(self.budget_max_tokens, self.tokens + self.budget_ratio)
+            self._consecutive_failures = 0
+            if self.state != self.CLOSED:
+                logger.info(f"上游 {self.name} 已恢复，熔断器关闭")
+            self.state = self.CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        """一次尝试因超时、连接错误或可重试状态码失败时调用"""
+        with self._lock:
+            self.stats["failures"] += 1
+            self._consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                if self.state == self.CLOSED:
+                    logger.warning(
+                        f"上游 {self.name} 连续失败 {self._consecutive_failures} 次，熔断 {self.reset_timeout} 秒"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.stats["circuit_opened"] += 1
+
+    def next_delay(self, attempt, status_code=None, retry_after=None):
+        """返回第 attempt 次（从 0 计）尝试失败后的等待秒数；不应再重试时返回 None
+
+        Args:
+            attempt (int): 刚失败的尝试序号
+            status_code (int, optional): 失败响应的状态码，超时/连接错误时为 None
+            retry_after (str, optional): 响应的 Retry-After 头
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        delay = None
+        if retry_after and status_code in RETRY_AFTER_STATUS_CODES:
+            delay = parse_retry_after(retry_after)
+            if delay is not None and delay > self.max_delay:
+                logger.warning(
+                    f"上游 {self.name} 要求 {delay:.1f} 秒后重试，超过上限 {self.max_delay} 秒，放弃重试"
+                )
+                return None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+        with self._lock:
+            if self.state == self.OPEN:
+                return None
+            if self.tokens < 1:
+                self.stats["budget_exhausted"] += 1
+                logger.warning(f"上游 {self.name} 的重试预算已用尽，放弃重试")
+                return None
+            self.tokens -= 1
+            self.stats["retries"] += 1
+        return delay
+
+    def get_stats(self):
+        """返回计数器、熔断器状态与剩余重试令牌"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["state"] = self.state
+            stats["tokens"] = round(self.tokens, 2)
+            stats["consecutive_failures"] = self._consecutive_failures
+        return stats
+
+
+def parse_retry_after(value):
+    """把 Retry-After（秒数或 HTTP 日期）解析为等待秒数，无法解析时返回 None"""
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def _validate(options):
+    if options["max_attempts"] < 1:
+        raise ValueError(f"max_attempts 至少为 1（包含首次请求）: {options['max_attempts']}")
+
+
+def configure_retry_policy(**settings):
+    """更新默认重试设置（None 值忽略），并原地应用到已创建的策略
+
+    应用每次初始化都会调用；已有策略的熔断器状态、重试预算与统计保持不变。
+    """
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(f"未知的重试设置: {sorted(unknown)}")
+    updates = {k: v for k, v in settings.items() if v is not None}
+    _validate({**_settings, **updates})
+    with _lock:
+        _settings.update(updates)
+        for policy in _policies.values():
+            policy.apply_settings(**updates)
+
+
+def get_retry_policy(url):
+    """返回 url 所在主机共享的 RetryPolicy，同一上游的各模块共用预算与熔断状态"""
+    name = urlsplit(url).netloc or url
+    with _lock:
+        policy = _policies.get(name)
+        if policy is None:
+            policy = RetryPolicy(name)
+            _policies[name] = policy
+        return policy
+
+
+def get_retry_stats():
+    """返回各上游主机的重试与熔断统计"""
+    with _lock:
+        policies = dict(_policies)
+    return {name: policy.get_stats() for name, policy in policies.items()}
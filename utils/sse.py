@@ -0,0 +1,133 @@
+import json
+import logging
+
+try:
+    # orjson 直接解析 bytes，比 json.loads 快数倍；未安装时退回标准库
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+logger = logging.getLogger('SSEDecoder')
+
+# 每次从连接读取的字节数；分块传输时到达的数据会立即返回，不会等满这个大小
+SSE_READ_SIZE = 16 * 1024
+
+
+class SSEDecoder:
+    """增量 Server-Sent Events 解码器，按字节块喂入，返回完整事件的 data 字段
+
+    支持一个事件由多行 data: 组成（按规范以换行拼接）、以冒号开头的
+    keep-alive 注释行以及 \\r\\n 行尾；event/id/retry 等字段被忽略。
+    不完整的行留在缓冲区，等下一块数据到达后再处理。
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._data = []
+
+    def feed(self, chunk):
+        """喂入一块原始字节，返回本块中完成的事件 data 列表（bytes）"""
+        if self._buffer:
+            chunk = self._buffer + chunk
+        lines = chunk.split(b"\n")
+        self._buffer = lines.pop()
+        events = []
+        for line in lines:
+            if line[-1:] == b"\r":
+                line = line[:-1]
+            if not line:
+                # 空行结束一个事件
+                if self._data:
+                    events.append(b"\n".join(self._data))
+                    self._data = []
+                continue
+            if line[:1] == b":":
+                continue  # keep-alive 注释
+            field, _, value = line.partition(b":")
+            if field == b"data":
+                if value[:1] == b" ":
+                    value = value[1:]
+                self._data.append(value)
+        return events
+
+    def flush(self):
+        """流结束时调用，返回缓冲区中未以空行结尾的最后一个事件"""
+        events = self.feed(b"\n\n") if (self._buffer or self._data) else []
+        self._buffer = b""
+        return events
+
+
+def parse_delta(data, log=logger):
+    """解析一个 chat/completions 流式事件，返回内容增量；无内容或解析失败返回空串"""
+    try:
+        chunk_data = _loads(data)
+        delta = chunk_data['choices'][0].get('delta') or {}
+        return delta.get('content') or ""
+    except ValueError as e:  # json.JSONDecodeError 与 orjson.JSONDecodeError 均为 ValueError
+        log.warning(f"跳过无法解析的流式响应块: {data[:100]!r}. 错误: {e}")
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        log.warning(f"跳过结构错误的流式响应块: {data[:100]!r}. 错误: {e}")
+    return ""
+
+
+def _decode_chunk(decoder, raw, log):
+    """解码一块原始字节，返回 (合并后的内容增量, 是否遇到 [DONE])"""
+    parts = []
+    for data in decoder.feed(raw) if raw is not None else decoder.flush():
+        if data == b"[DONE]":
+            return "".join(parts), True
+        content = parse_delta(data, log)
+        if content:
+            parts.append(content)
+    return "".join(parts), False
+
+
+def iter_sse_content(byte_chunks, log=logger):
+    """从原始字节块迭代器中产出内容增量，遇到 [DONE] 即停止
+
+    同一次读取中到达的多个事件合并为一个增量产出，减少下游的逐块开销。
+    """
+    decoder = SSEDecoder()
+    for raw in byte_chunks:
+        content, done = _decode_chunk(decoder, raw, log)
+        if content:
+            yield content
+        if done:
+            return
+    content, _ = _decode_chunk(decoder, None, log)
+    if content:
+        yield content
+
+
+async def aiter_sse_content(byte_chunks, log=logger):
+    """iter_sse_content 的异步版本，byte_chunks 为异步字节块迭代器"""
+    decoder = SSEDecoder()
+    async for raw in byte_chunks:
+        content, done = _decode_chunk(decoder, raw, log)
+        if content:
+            yield content
+        if done:
+            return
+    content, _ = _decode_chunk(decoder, None, log)
+    if content:
+        yield content
+
+
+def iter_response_bytes(response, chunk_size=SSE_READ_SIZE):
+    """以大块读取 requests 流式响应的原始字节
+
+    分块传输编码（SSE 的常见情形）下 iter_content 每收到一个分块就返回；
+    非分块响应的 read(n) 会等满 n 字节，改用 read1 按到达的数据返回。
+    requests 以 decode_content=False 打开原始流，read1 需显式解压 gzip/deflate。
+    """
+    raw = response.raw
+    if getattr(raw, "chunked", True) or not hasattr(raw, "read1"):
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    while True:
+        data = raw.read1(chunk_size, decode_content=True)
+        if not data:
+            break
+        yield data
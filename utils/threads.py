@@ -0,0 +1,96 @@
+import os
+import glob
+import time
+import logging
+import argparse
+
+import torch
+
+logger = logging.getLogger('VoiceToTextModule')
+
+
+def parse_cpu_list(cpus):
+    """把 "0-3,8,10-11" 形式的核心列表解析为整数列表，列表/元组原样返回"""
+    if cpus is None or isinstance(cpus, (list, tuple)):
+        return list(cpus) if cpus is not None else None
+    result = []
+    for part in str(cpus).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            result.extend(range(int(start), int(end) + 1))
+        else:
+            result.append(int(part))
+    return result
+
+
+def apply_thread_settings(intra_op_threads=None, inter_op_threads=None, cpu_affinity=None):
+    """设置当前进程的 torch 线程数与 CPU 亲和性，None 表示保持默认
+
+    inter-op 线程数只能在首次并行计算之前设置一次，之后的设置会被忽略并记录警告。
+    cpu_affinity 仅在支持 os.sched_setaffinity 的平台（Linux）上生效。
+
+    Args:
+        intra_op_threads (int, optional): 单个算子内部的并行线程数
+        inter_op_threads (int, optional): 算子之间的并行线程数
+        cpu_affinity (list or str, optional): 绑定的核心列表，如 [0, 1] 或 "0-3"
+    """
+    cpus = parse_cpu_list(cpu_affinity)
+    if cpus:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        else:
+            logger.warning("当前平台不支持设置 CPU 亲和性，已忽略 cpu_affinity")
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"inter-op 线程数已固定，无法修改为 {inter_op_threads}: {e}")
+
+
+def main():
+    # 在仓库根目录运行: python -m utils.threads --threads 1 2 4 8
+    # 依次设置 intra-op 线程数，转录示例音频并打印实时率（处理耗时 / 音频时长）
+    from funasr.utils.load_utils import load_audio_text_image_video
+    from modules.voice_to_text import VoiceToTextModule
+
+    parser = argparse.ArgumentParser(description="SenseVoice 线程数扫描")
+    parser.add_argument("--model_dir", default="iic/SenseVoiceSmall")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--audio", nargs="*", default=None)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--inter_op_threads", type=int, default=None)
+    parser.add_argument("--cpu_affinity", default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    audio_list = args.audio or sorted(glob.glob("example/*.mp3"))
+    duration = sum(len(load_audio_text_image_video(path, fs=16000)) / 16000 for path in audio_list)
+    module = VoiceToTextModule(
+        model_dir=args.model_dir,
+        device=args.device,
+        inter_op_threads=args.inter_op_threads,
+        cpu_affinity=args.cpu_affinity,
+    )
+    if module.model is None:
+        print(f"模型初始化失败: {module.init_error}")
+        return
+
+    print(f"音频 {len(audio_list)} 条，共 {duration:.2f}s")
+    for num_threads in args.threads:
+        torch.set_num_threads(num_threads)
+        module.transcribe(audio_list[0])  # 预热
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            for path in audio_list:
+                module.transcribe(path)
+        elapsed = (time.perf_counter() - start) / args.repeats
+        print(f"threads={num_threads}: {elapsed:.3f}s, RTF={elapsed / duration:.4f}")
+
+
+if __name__ == "__main__":
+    main()
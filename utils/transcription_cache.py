@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger('VoiceToTextModule')
+
+
+class TranscriptionCache:
+    """以解码后 16kHz PCM 内容哈希为键的磁盘转录缓存，按 LRU 淘汰
+
+    每条记录是 cache_dir 下的一个 JSON 文件，文件修改时间即最近访问时间。
+    查找与淘汰都直接以目录为准，不维护进程内索引，因此多个进程（如语音识别
+    工作池的各个子进程）共用同一目录时能命中彼此写入的记录，条数上限也对
+    整个目录生效。写入先落到临时文件再原子替换，不会读到半个文件。
+
+    Args:
+        cache_dir (str): 缓存目录，不存在时自动创建
+        max_entries (int): 最多保留的记录数，超出后淘汰修改时间最早的记录
+    """
+
+    def __init__(self, cache_dir, max_entries=500):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(pcm, **options):
+        """由 PCM 内容与影响结果的选项（语言、ITN、模型版本等）计算缓存键"""
+        digest = hashlib.sha256(np.ascontiguousarray(pcm, dtype=np.float32).tobytes())
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _entries(self):
+        """返回目录中的记录 [(mtime, 路径)]，按修改时间从早到晚排序"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime_ns, path))
+            except OSError:
+                # 已被其他进程淘汰
+                continue
+        entries.sort()
+        return entries
+
+    def get(self, key):
+        """返回缓存的转录结果字典，未命中时返回 None"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+                os.utime(path)
+            except FileNotFoundError:
+                self.stats["misses"] += 1
+                return None
+            except (OSError, ValueError) as e:
+                logger.warning(f"转录缓存记录读取失败，已丢弃: {e}")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return result
+
+    def put(self, key, result):
+        """写入一条转录结果，必要时淘汰最久未访问的记录"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(result, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"转录缓存写入失败: {e}")
+                return
+            self._evict()
+
+    def _evict(self):
+        entries = self._entries()
+        for _, path in entries[: max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                # 其他进程已经淘汰了同一条记录
+                continue
+            self.stats["evictions"] += 1
+
+    def get_stats(self):
+        """返回本实例的命中/未命中/淘汰次数、命中率与目录中的当前记录数"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["entries"] = len(self._entries())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats